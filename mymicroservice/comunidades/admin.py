@@ -1,8 +1,9 @@
 from django.contrib import admin
-from .models import Comunidad, ComunidadMiembros, Publicacion, PublicacionMeGusta, PersonasVetadas
+from .models import Comunidad, ComunidadMiembros, Publicacion, PublicacionMeGusta, PersonasVetadas, PalabraVetada
 
 admin.site.register(Comunidad)
 admin.site.register(ComunidadMiembros)
 admin.site.register(Publicacion)
 admin.site.register(PublicacionMeGusta)
 admin.site.register(PersonasVetadas)
+admin.site.register(PalabraVetada)
@@ -0,0 +1,304 @@
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Iterable, Optional, Tuple
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from comunidades.cache import TTLCache
+from comunidades.models import Comunidad, ComunidadMiembros, PersonasVetadas, Publicacion
+
+# Caché de admisión (se activa con ADMISION_CACHE): miembros y vetados de cada comunidad en memoria,
+# para comprobar sin consultar la base de datos si un usuario puede unirse a una comunidad o dar me gusta.
+# Cada comunidad tiene una versión en el backend de caché (settings.CACHES) que sube al confirmarse cada alta,
+# baja o veto. Los cambios del propio proceso se aplican al confirmarse sobre los conjuntos guardados, sin recargarlos.
+# La versión no se consulta en cada comprobación, solo cuando caducan los datos de la comunidad (ADMISION_CACHE_TTL
+# segundos después de cargarlos o de la última consulta): con un backend compartido (file o redis), si nadie la ha
+# cambiado se renuevan y si no se recargan; con locmem la versión es de cada proceso y se recargan siempre.
+# Así que un cambio hecho por otro proceso tarda como mucho ADMISION_CACHE_TTL segundos en verse, con cualquier backend.
+# Por eso la caché solo sirve para rechazar rápido: lo que deja pasar se confirma en la base de datos al escribir
+# (los vetos, con una consulta en la transacción que añade al miembro; los me gusta, en la propia sentencia que inserta).
+
+
+class ConjuntoIds:
+    """
+    Conjunto de ids de usuario guardado como un array ordenado de enteros de 64 bits:
+    ocupa 8 bytes por id (un set de Python, unas diez veces más) y la pertenencia es una búsqueda binaria.
+    """
+    __slots__ = ('_ids',)
+
+    # A partir de este número de ids, añadir o quitar reconstruye el array en vez de insertar uno a uno
+    LOTE_RECONSTRUIR = 32
+
+    def __init__(self, ordenados: Iterable[int] = ()):
+        """
+        'ordenados' deben llegar ya ordenados y sin repetir (por ejemplo, de un ORDER BY sobre un índice único).
+        """
+        self._ids = array('q', ordenados)
+
+    def __contains__(self, id_usuario: int) -> bool:
+        i = bisect_left(self._ids, id_usuario)
+        return i < len(self._ids) and self._ids[i] == id_usuario
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __iter__(self):
+        return iter(self._ids)
+
+    def añadir(self, ids: Iterable[int]):
+        ids = list(ids)
+        if len(ids) > ConjuntoIds.LOTE_RECONSTRUIR:
+            self._ids = array('q', sorted(set(self._ids).union(ids)))
+            return
+        for id_usuario in ids:
+            i = bisect_left(self._ids, id_usuario)
+            if i == len(self._ids) or self._ids[i] != id_usuario:
+                self._ids.insert(i, id_usuario)
+
+    def quitar(self, ids: Iterable[int]):
+        ids = list(ids)
+        if len(ids) > ConjuntoIds.LOTE_RECONSTRUIR:
+            quitados = set(ids)
+            self._ids = array('q', (i for i in self._ids if i not in quitados))
+            return
+        for id_usuario in ids:
+            i = bisect_left(self._ids, id_usuario)
+            if i < len(self._ids) and self._ids[i] == id_usuario:
+                del self._ids[i]
+
+
+@dataclass(slots=True)
+class AdmisionComunidad:
+    """
+    Datos de admisión de una comunidad: su creador, sus miembros y sus vetados,
+    con la versión con la que se cargaron y el instante en que caducan.
+    """
+    idArtista: int
+    miembros: ConjuntoIds
+    vetados: ConjuntoIds
+    version: int
+    caduca: float
+
+    def comprobar(self, usuario: int) -> Tuple[bool, bool, bool]:
+        """
+        Devuelve (ya es miembro, es el creador, está vetado) para el usuario.
+        """
+        return usuario in self.miembros, usuario == self.idArtista, usuario in self.vetados
+
+    def __len__(self):
+        return len(self.miembros) + len(self.vetados)
+
+
+class CacheAdmision:
+    """
+    Datos de admisión de las comunidades usadas más recientemente.
+    La memoria está acotada por el total de ids guardados (ADMISION_CACHE_MAX_IDS): al superarlo se expulsan
+    las comunidades usadas hace más tiempo (LRU). Es segura para usarse desde varios hilos.
+    """
+
+    # Comunidad de cada publicación (no cambia nunca), para las comprobaciones de los me gusta
+    PUBLICACIONES_MAXSIZE = 100_000
+
+    def __init__(self, max_ids: int, ttl: float):
+        self.max_ids = max_ids
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._datos = OrderedDict() # idComunidad -> AdmisionComunidad
+        self._total = 0 # ids guardados entre todas las comunidades
+        self._lock = threading.Lock()
+        self.publicaciones = TTLCache(maxsize=CacheAdmision.PUBLICACIONES_MAXSIZE, ttl=float('inf'))
+
+    @staticmethod
+    def _clave(idComunidad: int) -> str:
+        return f'comunidades:admision:{idComunidad}'
+
+    @staticmethod
+    def version(idComunidad: int) -> int:
+        """
+        Versión de los miembros y vetados de la comunidad en el backend de caché
+        (si no existe se crea a partir de la hora actual, como la versión del catálogo).
+        """
+        clave = CacheAdmision._clave(idComunidad)
+        version = cache.get(clave)
+        if version is None:
+            cache.add(clave, time.time_ns(), timeout=None)
+            version = cache.get(clave, time.time_ns())
+        return version
+
+    @staticmethod
+    def _version_compartida() -> bool:
+        """
+        Indica si la versión del backend de caché la comparten todos los procesos (con locmem cada uno tiene la suya).
+        """
+        return not isinstance(caches['default'], LocMemCache)
+
+    def get(self, idComunidad: int) -> Optional[AdmisionComunidad]:
+        """
+        Devuelve los datos de admisión de la comunidad, cargándolos si no están o, tras caducar, si han cambiado.
+        Devuelve None si la caché está desactivada o la comunidad no existe (hay que consultar la base de datos).
+        Lo cargado dentro de una transacción solo se guarda si se confirma.
+        """
+        if not settings.ADMISION_CACHE:
+            return None
+        idComunidad = int(idComunidad)
+        with self._lock:
+            entrada = self._datos.get(idComunidad)
+            if entrada is not None and entrada.caduca > time.monotonic():
+                self._datos.move_to_end(idComunidad)
+                self.hits += 1
+                return entrada
+
+        # Solo al caducar (o si no está) se consulta la versión en el backend de caché
+        version = CacheAdmision.version(idComunidad)
+        caduca = time.monotonic() + self.ttl
+        with self._lock:
+            if (entrada is not None and entrada.version == version and self._datos.get(idComunidad) is entrada
+                    and CacheAdmision._version_compartida()):
+                # Nadie la ha cambiado: se renueva sin recargarla
+                entrada.caduca = caduca
+                self._datos.move_to_end(idComunidad)
+                self.hits += 1
+                return entrada
+            self.misses += 1
+
+        entrada = CacheAdmision._cargar(idComunidad, version, caduca)
+        if entrada is not None:
+            transaction.on_commit(lambda: self._guardar(idComunidad, entrada))
+        return entrada
+
+    @staticmethod
+    def _cargar(idComunidad: int, version: int, caduca: float) -> Optional[AdmisionComunidad]:
+        """
+        Lee de la base de datos el creador, los miembros y los vetados de la comunidad
+        (ya ordenados por los índices únicos (idComunidad, idUsuario)).
+        """
+        idArtista = Comunidad.objects.filter(pk=idComunidad).values_list('idArtista', flat=True).first()
+        if idArtista is None:
+            return None
+        def ids(modelo):
+            return ConjuntoIds(modelo.objects.filter(idComunidad_id=idComunidad).order_by('idUsuario')
+                               .values_list('idUsuario', flat=True).iterator())
+        return AdmisionComunidad(idArtista, ids(ComunidadMiembros), ids(PersonasVetadas), version, caduca)
+
+    def _guardar(self, idComunidad: int, entrada: AdmisionComunidad):
+        """
+        Guarda los datos de una comunidad, expulsando las usadas hace más tiempo si se supera el máximo de ids.
+        Las comunidades que no caben solas en la caché no se guardan.
+        """
+        if len(entrada) > self.max_ids:
+            return
+        with self._lock:
+            anterior = self._datos.pop(idComunidad, None)
+            if anterior is not None:
+                self._total -= len(anterior)
+            self._datos[idComunidad] = entrada
+            self._total += len(entrada)
+            self._expulsar()
+
+    def _expulsar(self):
+        # Con el lock adquirido
+        while self._total > self.max_ids:
+            _, expulsada = self._datos.popitem(last=False)
+            self._total -= len(expulsada)
+
+    def comunidad_de_publicacion(self, idPublicacion: int) -> Optional[int]:
+        """
+        Devuelve la comunidad de la publicación (None si no existe).
+        """
+        idPublicacion = int(idPublicacion)
+        idComunidad = self.publicaciones.get(idPublicacion)
+        if idComunidad is None:
+            idComunidad = Publicacion.objects.filter(pk=idPublicacion).values_list('idComunidad_id', flat=True).first()
+            if idComunidad is not None:
+                self.publicaciones.set(idPublicacion, idComunidad)
+        return idComunidad
+
+    def es_miembro_publicacion(self, idPublicacion: int, usuario: int) -> Optional[bool]:
+        """
+        Indica si el usuario es miembro de la comunidad de la publicación, o None si no se sabe
+        (caché desactivada o publicación inexistente).
+        """
+        if not settings.ADMISION_CACHE:
+            return None
+        idComunidad = self.comunidad_de_publicacion(idPublicacion)
+        entrada = None if idComunidad is None else self.get(idComunidad)
+        return None if entrada is None else int(usuario) in entrada.miembros
+
+    def cambio(self, idComunidad: int, miembros_añadidos: Iterable[int] = (), miembros_quitados: Iterable[int] = (),
+               vetados_añadidos: Iterable[int] = (), vetados_quitados: Iterable[int] = ()):
+        """
+        Registra un cambio en los miembros o vetados de la comunidad. Debe llamarse dentro de la misma transacción
+        que la escritura: al confirmarse sube la versión de la comunidad y aplica el cambio a los datos guardados
+        (si estaban al día; si no, se descartan y se cargarán de nuevo).
+        """
+        if not settings.ADMISION_CACHE:
+            return
+        cambios = tuple(tuple(int(u) for u in ids) for ids in (miembros_añadidos, miembros_quitados, vetados_añadidos, vetados_quitados))
+        transaction.on_commit(lambda: self._aplicar(int(idComunidad), *cambios))
+
+    def invalidar(self, idComunidad: int):
+        """
+        Descarta los datos de la comunidad en todos los procesos (al confirmarse la transacción).
+        """
+        if not settings.ADMISION_CACHE:
+            return
+        transaction.on_commit(lambda: self._aplicar(int(idComunidad), None))
+
+    @staticmethod
+    def _subir_version(idComunidad: int) -> int:
+        clave = CacheAdmision._clave(idComunidad)
+        try:
+            return cache.incr(clave)
+        except ValueError:
+            # La clave no existía: cualquier versión nueva sirve
+            version = time.time_ns()
+            cache.set(clave, version, timeout=None)
+            return version
+
+    def _aplicar(self, idComunidad: int, miembros_añadidos, miembros_quitados=(), vetados_añadidos=(), vetados_quitados=()):
+        nueva = CacheAdmision._subir_version(idComunidad)
+        with self._lock:
+            entrada = self._datos.pop(idComunidad, None)
+            if entrada is None:
+                return
+            self._total -= len(entrada)
+            # Solo se actualiza si nadie más ha cambiado la comunidad desde que se cargó (y no se invalida entera)
+            if miembros_añadidos is None or entrada.version != nueva - 1:
+                return
+            entrada.miembros.quitar(miembros_quitados)
+            entrada.miembros.añadir(miembros_añadidos)
+            entrada.vetados.quitar(vetados_quitados)
+            entrada.vetados.añadir(vetados_añadidos)
+            entrada.version = nueva
+            self._datos[idComunidad] = entrada
+            self._total += len(entrada)
+            self._expulsar()
+
+    def clear(self):
+        """
+        Vacía la caché y reinicia los contadores.
+        """
+        with self._lock:
+            self._datos.clear()
+            self._total = 0
+            self.hits = 0
+            self.misses = 0
+        self.publicaciones.clear()
+
+    def stats(self) -> dict:
+        """
+        Devuelve los contadores de la caché.
+        """
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "comunidades": len(self._datos),
+                    "ids": self._total, "max_ids": self.max_ids}
+
+
+# Caché compartida por todas las peticiones del proceso
+admision = CacheAdmision(max_ids=settings.ADMISION_CACHE_MAX_IDS, ttl=settings.ADMISION_CACHE_TTL)
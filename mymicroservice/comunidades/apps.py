@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class ComunidadesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'comunidades'
+
+    def ready(self):
+        from django.core import checks
+        from comunidades import basedatos
+        checks.register(basedatos.comprobar_version_sqlite)
@@ -0,0 +1,94 @@
+import sqlite3
+from contextlib import contextmanager
+from typing import Iterable, List, Sequence
+from django.conf import settings
+from django.core import checks
+from django.db import connection, transaction
+
+# Utilidades de acceso a la base de datos compartidas por los DAO.
+# Las sentencias escritas a mano (INSERT ... ON CONFLICT DO NOTHING RETURNING, UPDATE ... RETURNING)
+# necesitan PostgreSQL o SQLite 3.35 o posterior (RETURNING); Django 5.2 admite desde SQLite 3.31,
+# así que la versión se comprueba al arrancar (ver comprobar_version_sqlite).
+
+SQLITE_MINIMO = (3, 35, 0)
+
+
+@contextmanager
+def escritura(using: str = None):
+    """
+    transaction.atomic() para las transacciones que escriben (normalmente tras leer lo que van a cambiar).
+    En SQLite, si es la transacción de fuera, empieza con BEGIN IMMEDIATE: toma el bloqueo de escritura
+    al empezar, esperando por él con busy_timeout, en vez de fallar con 'database is locked' al pasar de leer
+    a escribir. Las transacciones de solo lectura siguen siendo DEFERRED y no bloquean a nadie.
+    """
+    conexion = transaction.get_connection(using)
+    if conexion.vendor != 'sqlite' or conexion.in_atomic_block:
+        with transaction.atomic(using=using):
+            yield
+        return
+
+    # transaction_mode se lee de settings al conectar: hay que conectar antes de cambiarlo
+    conexion.ensure_connection()
+    anterior = conexion.transaction_mode
+    conexion.transaction_mode = 'IMMEDIATE'
+    try:
+        with transaction.atomic(using=using):
+            conexion.transaction_mode = anterior
+            yield
+    finally:
+        conexion.transaction_mode = anterior
+
+
+def tabla(modelo) -> str:
+    """
+    Nombre de la tabla del modelo, entrecomillado para la base de datos en uso.
+    """
+    return connection.ops.quote_name(modelo._meta.db_table)
+
+
+def columna(modelo, campo: str) -> str:
+    """
+    Nombre de la columna del campo del modelo (la de la clave ajena en los ForeignKey), entrecomillado.
+    """
+    return connection.ops.quote_name(modelo._meta.get_field(campo).column)
+
+
+def insertar_ignorando_conflictos(modelo, campos: Sequence[str], filas: Iterable[Sequence], conflicto: Sequence[str],
+                                  devolver: str) -> List:
+    """
+    Inserta las filas (valores de 'campos', en ese orden) con INSERT ... ON CONFLICT (conflicto) DO NOTHING
+    y devuelve el valor de 'devolver' de cada fila insertada de verdad: las que ya existían (por ejemplo,
+    porque otra petición las ha insertado a la vez) se saltan sin error y no se devuelven.
+    Los trozos se parten si superan el máximo de parámetros por sentencia de la base de datos.
+    """
+    filas = list(filas)
+    if not filas:
+        return []
+    preparar = [modelo._meta.get_field(campo).get_db_prep_save for campo in campos]
+    columnas = ', '.join(columna(modelo, campo) for campo in campos)
+    fila_sql = f"({', '.join(['%s'] * len(campos))})"
+    final = (f"ON CONFLICT ({', '.join(columna(modelo, campo) for campo in conflicto)}) DO NOTHING "
+             f"RETURNING {columna(modelo, devolver)}")
+    insertados = []
+    tamano = connection.ops.bulk_batch_size(list(campos), filas)
+    with connection.cursor() as cursor:
+        for i in range(0, len(filas), tamano):
+            parte = filas[i:i + tamano]
+            cursor.execute(
+                f"INSERT INTO {tabla(modelo)} ({columnas}) VALUES {', '.join([fila_sql] * len(parte))} {final}",
+                [prep(valor, connection) for fila in parte for prep, valor in zip(preparar, fila)]
+            )
+            insertados.extend(fila[0] for fila in cursor.fetchall())
+    return insertados
+
+
+def comprobar_version_sqlite(app_configs=None, **kwargs) -> list:
+    """
+    Comprobación de arranque (system check): con SQLite, la biblioteca debe admitir RETURNING.
+    """
+    if settings.DATABASES['default']['ENGINE'] != 'django.db.backends.sqlite3' or sqlite3.sqlite_version_info >= SQLITE_MINIMO:
+        return []
+    return [checks.Error(
+        f"Se necesita SQLite {'.'.join(map(str, SQLITE_MINIMO))} o posterior (RETURNING); la instalada es {sqlite3.sqlite_version}.",
+        id='comunidades.E001',
+    )]
@@ -0,0 +1,185 @@
+import atexit
+import logging
+import threading
+from collections import Counter, defaultdict
+from typing import Callable, Dict, Tuple
+from django.conf import settings
+from django.db import connection
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from comunidades import basedatos
+from comunidades.models import Publicacion, PublicacionMeGusta
+
+# Buffer de escritura diferida (write-behind) de los me gusta (se activa con MEGUSTA_BUFFER).
+# Dar y quitar me gusta solo hace una lectura y anota la operación en memoria; las operaciones pendientes
+# se escriben en la base de datos por lotes (un INSERT por trozo y un DELETE por publicación) al llegar a
+# MEGUSTA_BUFFER_TAMANO o cada MEGUSTA_BUFFER_INTERVALO segundos, así que las publicaciones muy populares
+# no hacen cola en el bloqueo de escritura con una transacción por cada me gusta.
+# Las lecturas de los me gusta superponen las operaciones pendientes del proceso, para que cada usuario
+# vea su me gusta al instante (las de otros procesos se ven al volcarse).
+
+# (idPublicacion, idUsuario) -> (le gusta, fecha de la operación)
+Pendientes = Dict[Tuple[int, int], Tuple[bool, object]]
+
+logger = logging.getLogger(__name__)
+
+
+class BufferMeGusta:
+    """
+    Operaciones de me gusta pendientes de escribir, una por (publicación, usuario):
+    solo se guarda la última, y solo si cambia lo que hay en la base de datos
+    (dar y quitar antes del volcado se anulan). Es seguro usarlo desde varios hilos.
+    """
+
+    def __init__(self):
+        self._pendientes: Pendientes = {}
+        self._version = 0 # aumenta con cada volcado
+        self._volcando = False
+        self._cambio = threading.Condition()
+        self._un_volcado = threading.Lock()
+        self._despertar = threading.Event()
+        self._hilo = None
+
+    def __len__(self):
+        with self._cambio:
+            return len(self._pendientes)
+
+    def consultar(self, consulta: Callable, combinar: Callable):
+        """
+        Ejecuta consulta() en la base de datos y devuelve combinar(resultado, pendientes).
+        Se repite si mientras tanto se ha volcado el buffer, para no contar dos veces (ni ninguna)
+        las operaciones que se estaban escribiendo. 'combinar' se llama con el buffer bloqueado
+        y puede modificar las operaciones pendientes.
+        """
+        while True:
+            with self._cambio:
+                while self._volcando:
+                    self._cambio.wait()
+                version = self._version
+            resultado = consulta()
+            with self._cambio:
+                if self._version == version and not self._volcando:
+                    return combinar(resultado, self._pendientes)
+
+    @staticmethod
+    def anotar(pendientes: Pendientes, clave: Tuple[int, int], le_gusta: bool, guardado: bool):
+        """
+        Anota en 'pendientes' que el usuario quiere dejar el me gusta en el estado 'le_gusta',
+        sabiendo si está 'guardado' en la base de datos.
+        """
+        if le_gusta == guardado:
+            pendientes.pop(clave, None)
+        else:
+            pendientes[clave] = (le_gusta, timezone.now())
+
+    @staticmethod
+    def diferencia(pendientes: Pendientes, id_publicacion: int) -> int:
+        """
+        Lo que cambiará el contador de me gustas de la publicación al volcar sus operaciones pendientes.
+        """
+        return sum(1 if le_gusta else -1 for (p, _), (le_gusta, _) in pendientes.items() if p == id_publicacion)
+
+    @staticmethod
+    def de_publicacion(pendientes: Pendientes, id_publicacion: int) -> Dict[int, Tuple[bool, object]]:
+        """
+        Operaciones pendientes de una publicación: idUsuario -> (le gusta, fecha).
+        """
+        return {u: operacion for (p, u), operacion in pendientes.items() if p == id_publicacion}
+
+    def avisar(self):
+        """
+        Se llama tras anotar operaciones: vuelca el buffer si ha llegado a MEGUSTA_BUFFER_TAMANO
+        (en el hilo de volcado, o aquí mismo si no hay volcado periódico) y arranca el hilo si hace falta.
+        """
+        lleno = len(self) >= settings.MEGUSTA_BUFFER_TAMANO
+        if settings.MEGUSTA_BUFFER_INTERVALO <= 0:
+            if lleno:
+                self.volcar()
+            return
+        self._arrancar()
+        if lleno:
+            self._despertar.set()
+
+    def _arrancar(self):
+        with self._cambio:
+            if self._hilo is None or not self._hilo.is_alive():
+                self._hilo = threading.Thread(target=self._volcar_periodicamente, name='buffer-megusta', daemon=True)
+                self._hilo.start()
+
+    def _volcar_periodicamente(self):
+        while True:
+            self._despertar.wait(settings.MEGUSTA_BUFFER_INTERVALO)
+            self._despertar.clear()
+            # El hilo no pasa por el ciclo de peticiones de Django: cierra su conexión tras cada volcado
+            try:
+                self.volcar()
+            finally:
+                connection.close()
+
+    def volcar(self) -> int:
+        """
+        Escribe en la base de datos las operaciones pendientes (en una transacción) y devuelve cuántas eran.
+        Si falla, las operaciones vuelven al buffer para el siguiente volcado.
+        """
+        with self._un_volcado:
+            with self._cambio:
+                if not self._pendientes:
+                    return 0
+                lote, self._pendientes = self._pendientes, {}
+                self._volcando = True
+            try:
+                BufferMeGusta._escribir(lote)
+            except Exception:
+                logger.exception('No se han podido volcar %d me gusta pendientes; se reintentará', len(lote))
+                # Mientras se volcaba no se ha podido anotar nada nuevo: se recupera el lote tal cual
+                with self._cambio:
+                    self._pendientes.update(lote)
+            finally:
+                with self._cambio:
+                    self._volcando = False
+                    self._version += 1
+                    self._cambio.notify_all()
+            return len(lote)
+
+    @staticmethod
+    def _escribir(lote: Pendientes):
+        """
+        Aplica un lote de operaciones: inserta los me gusta nuevos, borra los quitados y ajusta
+        el contador de cada publicación con lo que realmente ha cambiado (las filas insertadas y borradas,
+        no las operaciones: un me gusta que ya estaba guardado, o que otro proceso ha guardado a la vez, no cuenta).
+        Se ignoran las operaciones de publicaciones que ya no existen.
+        """
+        with basedatos.escritura():
+            existen = set(Publicacion.objects.filter(pk__in={p for p, _ in lote}).values_list('pk', flat=True))
+            lote = {clave: operacion for clave, operacion in lote.items() if clave[0] in existen}
+            if not lote:
+                return
+
+            quitados = defaultdict(list)
+            for (p, u), (le_gusta, _) in lote.items():
+                if not le_gusta:
+                    quitados[p].append(u)
+
+            cambios = BufferMeGusta._insertar([(p, u, fecha) for (p, u), (le_gusta, fecha) in lote.items() if le_gusta])
+            for p, usuarios in quitados.items():
+                borrados, _ = PublicacionMeGusta.objects.filter(idPublicacion_id=p, idUsuario__in=usuarios).delete()
+                cambios[p] -= borrados
+            for p, cantidad in cambios.items():
+                if cantidad:
+                    Publicacion.objects.filter(pk=p).update(meGusta=Greatest(F('meGusta') + cantidad, 0))
+
+    @staticmethod
+    def _insertar(filas) -> Counter:
+        """
+        Inserta los me gusta (idPublicacion, idUsuario, fecha) con la fecha en que se dieron, no la del volcado
+        (INSERT ... ON CONFLICT DO NOTHING RETURNING), y devuelve cuántos se han insertado de verdad en cada publicación.
+        """
+        return Counter(basedatos.insertar_ignorando_conflictos(
+            PublicacionMeGusta, ('idPublicacion', 'idUsuario', 'fechaMeGusta'), filas,
+            conflicto=('idPublicacion', 'idUsuario'), devolver='idPublicacion'))
+
+
+# Buffer compartido por todas las peticiones del proceso; lo pendiente se vuelca también al terminar
+buffer = BufferMeGusta()
+atexit.register(buffer.volcar)
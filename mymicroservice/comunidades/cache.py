@@ -0,0 +1,163 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+# Cachés en memoria del microservicio de comunidades
+
+class TTLCache:
+    """
+    Caché en memoria acotada en tamaño y con caducidad (TTL) por entrada.
+    - Cuando se supera 'maxsize' se expulsa la entrada usada hace más tiempo (LRU).
+    - Las entradas caducadas no se devuelven.
+    - Lleva contadores de aciertos (hits) y fallos (misses) consultables con stats().
+    Es segura para usarse desde varios hilos.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._datos = OrderedDict() # clave -> (instante de caducidad, valor)
+        self._lock = threading.Lock()
+
+    def get(self, clave, default=None):
+        """
+        Devuelve el valor guardado para la clave o 'default' si no existe o ha caducado.
+        """
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is None or entrada[0] <= time.monotonic():
+                self.misses += 1
+                return default
+            # La marcamos como usada recientemente
+            self._datos.move_to_end(clave)
+            self.hits += 1
+            return entrada[1]
+
+    def get_obsoleto(self, clave, default=None):
+        """
+        Devuelve el valor guardado para la clave aunque haya caducado (o 'default' si no existe).
+        Se usa como último recurso cuando no se puede obtener un valor actualizado; no cuenta en las estadísticas.
+        """
+        with self._lock:
+            entrada = self._datos.get(clave)
+            return default if entrada is None else entrada[1]
+
+    def set(self, clave, valor):
+        """
+        Guarda un valor con la caducidad configurada, expulsando las entradas más antiguas si hace falta.
+        """
+        with self._lock:
+            self._datos[clave] = (time.monotonic() + self.ttl, valor)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.maxsize:
+                self._datos.popitem(last=False)
+
+    def delete(self, clave):
+        with self._lock:
+            self._datos.pop(clave, None)
+
+    def clear(self):
+        """
+        Vacía la caché y reinicia los contadores.
+        """
+        with self._lock:
+            self._datos.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        """
+        Devuelve los contadores de la caché.
+        """
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._datos), "maxsize": self.maxsize}
+
+    def __len__(self):
+        with self._lock:
+            return len(self._datos)
+
+
+class CatalogoCache:
+    """
+    Caché de las respuestas del catálogo de comunidades (listado, detalle y comunidades de un usuario)
+    en el backend de caché configurado en settings.CACHES.
+    Todas las claves llevan la versión actual del catálogo: al modificar comunidades o sus miembros,
+    publicaciones o palabras vetadas se sube la versión y las respuestas anteriores dejan de usarse.
+    """
+
+    CLAVE_VERSION = 'comunidades:catalogo:version'
+
+    @staticmethod
+    def version() -> int:
+        """
+        Devuelve la versión actual del catálogo.
+        Si no existe (primera vez o el backend la ha expulsado) se crea a partir de la hora actual,
+        para no reutilizar nunca una versión anterior.
+        """
+        version = cache.get(CatalogoCache.CLAVE_VERSION)
+        if version is None:
+            cache.add(CatalogoCache.CLAVE_VERSION, time.time_ns(), timeout=None)
+            version = cache.get(CatalogoCache.CLAVE_VERSION, time.time_ns())
+        return version
+
+    @staticmethod
+    async def aversion() -> int:
+        """
+        Versión asíncrona de version() (para las vistas async).
+        """
+        version = await cache.aget(CatalogoCache.CLAVE_VERSION)
+        if version is None:
+            await cache.aadd(CatalogoCache.CLAVE_VERSION, time.time_ns(), timeout=None)
+            version = await cache.aget(CatalogoCache.CLAVE_VERSION, time.time_ns())
+        return version
+
+    @staticmethod
+    def _subir_version():
+        try:
+            cache.incr(CatalogoCache.CLAVE_VERSION)
+        except ValueError:
+            # La clave no existía: cualquier versión nueva sirve
+            cache.set(CatalogoCache.CLAVE_VERSION, time.time_ns(), timeout=None)
+
+    @staticmethod
+    def invalidar():
+        """
+        Invalida todas las respuestas cacheadas del catálogo.
+        Se hace al confirmarse la transacción, para que nadie vuelva a cachear los datos antiguos mientras tanto.
+        """
+        transaction.on_commit(CatalogoCache._subir_version)
+
+    @staticmethod
+    def get_o_calcular(nombre: str, calcular: Callable, cachear: Callable = None):
+        """
+        Devuelve la respuesta cacheada con ese nombre para la versión actual del catálogo,
+        o la calcula con 'calcular()' y la guarda durante RESPUESTAS_CACHE_TTL segundos.
+        Si se indica 'cachear', solo se guardan las respuestas para las que cachear(datos) es True
+        (por ejemplo, para no guardar respuestas incompletas).
+        """
+        clave = f'comunidades:catalogo:{CatalogoCache.version()}:{nombre}'
+        datos = cache.get(clave)
+        if datos is None:
+            datos = calcular()
+            if cachear is None or cachear(datos):
+                cache.set(clave, datos, timeout=settings.RESPUESTAS_CACHE_TTL)
+        return datos
+
+    @staticmethod
+    async def aget_o_calcular(nombre: str, calcular: Callable, cachear: Callable = None):
+        """
+        Versión asíncrona de get_o_calcular(): 'calcular()' devuelve una corrutina.
+        """
+        clave = f'comunidades:catalogo:{await CatalogoCache.aversion()}:{nombre}'
+        datos = await cache.aget(clave)
+        if datos is None:
+            datos = await calcular()
+            if cachear is None or cachear(datos):
+                await cache.aset(clave, datos, timeout=settings.RESPUESTAS_CACHE_TTL)
+        return datos
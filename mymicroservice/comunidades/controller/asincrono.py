@@ -0,0 +1,37 @@
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.utils.decorators import classonlymethod
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from comunidades.renderizado import serializar
+
+# Base de los controladores asíncronos (perfil ASGI, ver CONTROLADORES_ASYNC en settings)
+
+def respuesta_json(data, status: int = 200, headers: dict = None) -> HttpResponse:
+    """
+    Respuesta JSON con el mismo formato que las de los controladores de DRF (mismo renderizado de los DTO).
+    """
+    return HttpResponse(serializar(data), status=status, content_type='application/json', headers=headers)
+
+
+class ControladorAsync(View):
+    """
+    Controlador con el GET asíncrono (async def get en cada subclase), para las rutas que esperan
+    al servicio de usuarios: mientras esperan no ocupan el proceso y este puede atender otras peticiones.
+    El resto de métodos (POST, PUT, PATCH, DELETE) se delegan en el controlador síncrono de DRF
+    indicado en 'controlador_sincrono', así que la ruta se comporta igual que antes.
+    """
+    controlador_sincrono = None
+
+    @classonlymethod
+    def as_view(cls, **initkwargs):
+        # Igual que las vistas de DRF, no usan la protección CSRF de las sesiones
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    async def delegar(self, request, *args, **kwargs):
+        """
+        Atiende la petición con el controlador síncrono (en un hilo aparte).
+        """
+        return await sync_to_async(self.controlador_sincrono.as_view())(request, *args, **kwargs)
+
+    post = put = patch = delete = delegar
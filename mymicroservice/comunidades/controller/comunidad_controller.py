@@ -2,30 +2,40 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from comunidades.dao.comunidad_dao import ComunidadDAO
-import dataclasses 
+from comunidades.cache import CatalogoCache
+from comunidades.controller.asincrono import ControladorAsync, respuesta_json
 import traceback # Para ver errores completos
 from rest_framework.permissions import IsAuthenticated # para proteger rutas con autenticación por token
 
+def _completo(comunidades) -> bool:
+    """
+    Indica si ningún artista del listado se ha devuelto en modo degradado (solo esas respuestas se cachean).
+    """
+    return not any(c.artista.partial for c in comunidades)
+
+
 class ComunidadController(APIView):
     
     def get(self, request, idComunidad=None):
         """
         GET comunidad/ (lista de todas las comunidades) 
         GET comunidad/{idComunidad} (comunidad especifica)
+        Las respuestas se guardan en la caché del catálogo (se invalida con cada escritura).
         """
         if idComunidad:
             try:
-                # 1. Pide al DAO UN objeto
-                comunidad_dto = ComunidadDAO.get_comunidad_especifica(idComunidad)
-                return Response(dataclasses.asdict(comunidad_dto), status=status.HTTP_200_OK)
+                # 1. Pide al DAO UN objeto (o lo saca de la caché)
+                data = CatalogoCache.get_o_calcular(
+                    f'comunidad:{idComunidad}',
+                    lambda: ComunidadDAO.get_comunidad_especifica(idComunidad)
+                )
+                return Response(data, status=status.HTTP_200_OK)
             except Exception as e:
                 return Response({"error": f"Comunidad no encontrada: {e}"}, status=status.HTTP_404_NOT_FOUND)
         else:
-            # 1. Pide al DAO
-            comunidades_dtos = ComunidadDAO.get_all_comunidades()
-            # 2. Convierte DTOs a diccionarios para el JSON
-            data = [dataclasses.asdict(dto) for dto in comunidades_dtos]
-            # 3. Responde
+            # 1. Pide al DAO (o a la caché) los DTOs; el renderizador JSON los convierte al responder
+            data = CatalogoCache.get_o_calcular('comunidades', ComunidadDAO.get_all_comunidades, cachear=_completo)
+            # 2. Responde
             return Response(data, status=status.HTTP_200_OK)
 
     def post(self, request, idComunidad=None):
@@ -45,7 +55,7 @@ class ComunidadController(APIView):
             nuevo_dto = ComunidadDAO.crear_comunidad(datos_entrada)
             
             # 3. Responde con el DTO completo
-            return Response(dataclasses.asdict(nuevo_dto), status=status.HTTP_201_CREATED)
+            return Response(nuevo_dto, status=status.HTTP_201_CREATED)
         
         except Exception as e:
             traceback.print_exc() # Muestra el error real en tu consola
@@ -67,7 +77,7 @@ class ComunidadController(APIView):
         try:
             # llama al método del DAO para actualizar la comunidad
             comunidad_actualizada = ComunidadDAO.actualizar_comunidad(idComunidad, datos_entrada)
-            return Response(dataclasses.asdict(comunidad_actualizada), status=status.HTTP_200_OK)
+            return Response(comunidad_actualizada, status=status.HTTP_200_OK)
         except Exception as e:
             traceback.print_exc()
             return Response({"error": str(e)}, status=status.HTTP_404_NOT_FOUND)
@@ -98,13 +108,64 @@ class ComunidadesUsuarioController(APIView):
              return Response({"error": "Se requiere el ID del usuario"}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
-            # Llamamos al DAO con el ID que viene en la URL
-            comunidades_dto = ComunidadDAO.get_comunidades_usuario(idUsuario)
-            
-            data = [dataclasses.asdict(c) for c in comunidades_dto]
+            # Llamamos al DAO con el ID que viene en la URL (o lo sacamos de la caché del catálogo)
+            data = CatalogoCache.get_o_calcular(
+                f'mis-comunidades:{idUsuario}',
+                lambda: ComunidadDAO.get_comunidades_usuario(idUsuario),
+                cachear=_completo
+            )
             # Devolvemos la lista (vacía o con datos) y status 200 OK
             return Response(data, status=status.HTTP_200_OK)
             
         except Exception as e:
             traceback.print_exc()
-            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
+            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+# --- Versiones asíncronas (perfil ASGI) ---
+class ComunidadAsyncController(ControladorAsync):
+    """
+    Versión asíncrona de ComunidadController: el GET resuelve los artistas sin bloquear el proceso;
+    el resto de métodos los atiende ComunidadController.
+    """
+    controlador_sincrono = ComunidadController
+
+    async def get(self, request, idComunidad=None):
+        """
+        GET comunidad/ (lista de todas las comunidades)
+        GET comunidad/{idComunidad} (comunidad especifica)
+        """
+        if idComunidad:
+            try:
+                data = await CatalogoCache.aget_o_calcular(
+                    f'comunidad:{idComunidad}',
+                    lambda: ComunidadDAO.aget_comunidad_especifica(idComunidad)
+                )
+                return respuesta_json(data)
+            except Exception as e:
+                return respuesta_json({"error": f"Comunidad no encontrada: {e}"}, status=status.HTTP_404_NOT_FOUND)
+        else:
+            data = await CatalogoCache.aget_o_calcular('comunidades', ComunidadDAO.aget_all_comunidades, cachear=_completo)
+            return respuesta_json(data)
+
+
+class ComunidadesUsuarioAsyncController(ControladorAsync):
+    """
+    Versión asíncrona de ComunidadesUsuarioController.
+    """
+    controlador_sincrono = ComunidadesUsuarioController
+
+    async def get(self, request, idUsuario=None):
+        """
+        GET comunidad/mis-comunidades/{idUsuario}
+        """
+        try:
+            data = await CatalogoCache.aget_o_calcular(
+                f'mis-comunidades:{idUsuario}',
+                lambda: ComunidadDAO.aget_comunidades_usuario(idUsuario),
+                cachear=_completo
+            )
+            return respuesta_json(data)
+        except Exception as e:
+            traceback.print_exc()
+            return respuesta_json({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
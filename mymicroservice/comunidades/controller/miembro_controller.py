@@ -1,29 +1,80 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
+from rest_framework.exceptions import NotAcceptable
+from rest_framework.settings import api_settings
+from django.utils.decorators import method_decorator
+from django.utils.cache import get_conditional_response, patch_vary_headers, quote_etag
+from comunidades.controller.asincrono import ControladorAsync, respuesta_json
 from comunidades.dao.miembro_dao import MiembroDAO
-import dataclasses 
+from comunidades.dto.miembro_dto import MiembroDTO
+from comunidades.exceptions import InvalidParameterError, NotFoundError
+from comunidades import etags, paginacion, renderizado
+import dataclasses
+import json
 import traceback
 
+def _completo(miembros) -> bool:
+    """
+    Indica si ningún miembro del listado se ha devuelto en modo degradado (solo esas respuestas llevan ETag).
+    """
+    return not any(getattr(m, 'partial', False) for m in miembros)
+
+
+def _exportar_miembros(request, idComunidad, formato: str, asincrona: bool = False):
+    """
+    Exportación en streaming (ndjson o csv) de todos los miembros de la comunidad, o solo de sus ids con ?ids_only=true.
+    """
+    solo_ids = paginacion.leer_booleano(request.GET.get('ids_only'))
+    campos = ['idUsuario', 'fechaUnion'] if solo_ids else [f.name for f in dataclasses.fields(MiembroDTO)]
+    respuesta = renderizado.respuesta_streaming(
+        MiembroDAO.iterar_miembros(idComunidad, solo_ids), formato, campos,
+        nombre=f'miembros-comunidad-{idComunidad}', asincrona=asincrona
+    )
+    # Las cabeceras se envían antes de consultar a los usuarios: si alguno sale degradado ya no se puede quitar el ETag
+    return respuesta if solo_ids else etags.sin_validador(respuesta)
+
+
 class MiembroController(APIView):
 
+    # Además de JSON, el listado se puede exportar entero en streaming con ?format=ndjson o ?format=csv
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, renderizado.RenderizadorNDJSON, renderizado.RenderizadorCSV]
+
+    # ETag del listado: si el cliente ya lo tiene (If-None-Match) se responde 304 sin consultar el DAO
+    @method_decorator(etags.condicion_listado('miembros'))
     def get(self, request, idComunidad=None, idMiembro=None):
         """
-        GET /comunidad/miembros/<idComunidad>/ (Todos los miembros de la comunidad)
+        GET /comunidad/miembros/<idComunidad>/?limit=<n>&cursor=<cursor> (Miembros de la comunidad, paginados)
+        GET /comunidad/miembros/<idComunidad>/?ids_only=true (Solo idUsuario y fechaUnion, sin consultar el servicio de usuarios)
+        GET /comunidad/miembros/<idComunidad>/?format=ndjson|csv[&ids_only=true] (Todos los miembros, exportados en streaming)
         GET /comunidad/miembros/<idComunidad>/<idMiembro>/ (Miembro específico)
         """
+        formato = renderizado.negociar(request, self.renderer_classes)[0].format
+        if not idMiembro and formato in renderizado.FORMATOS_STREAMING:
+            return _exportar_miembros(request, idComunidad, formato)
+
         try:
             if idMiembro:
                 # --- CASO 1: Miembro específico ---
                 miembro_dto = MiembroDAO.get_miembro_especifico(idComunidad, idMiembro)
-                return Response(dataclasses.asdict(miembro_dto), status=status.HTTP_200_OK)
+                return Response(miembro_dto, status=status.HTTP_200_OK)
             
             else:
-                # --- CASO 2: Todos los miembros de la comunidad ---
-                miembros_dtos = MiembroDAO.get_miembros_comunidad(idComunidad)
-                data = [dataclasses.asdict(dto) for dto in miembros_dtos]
-                return Response(data, status=status.HTTP_200_OK)
+                # --- CASO 2: Página de miembros de la comunidad ---
+                limite = paginacion.leer_limite(request.query_params.get('limit'))
+                cursor = request.query_params.get('cursor')
                 
+                if paginacion.leer_booleano(request.query_params.get('ids_only')):
+                    # Solo los ids: no se llama al servicio de usuarios
+                    data, siguiente = MiembroDAO.get_ids_miembros(idComunidad, limite, cursor)
+                else:
+                    data, siguiente = MiembroDAO.get_miembros_paginados(idComunidad, limite, cursor)
+                respuesta = Response(data, status=status.HTTP_200_OK, headers=paginacion.cabeceras_paginacion(request, siguiente))
+                # Con miembros en modo degradado no hay ETag: el cliente no debe revalidar datos incompletos
+                return respuesta if _completo(data) else etags.sin_validador(respuesta)
+                
+        except InvalidParameterError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
             return Response({"error": str(e)}, status=status.HTTP_404_NOT_FOUND)
 
@@ -41,7 +92,7 @@ class MiembroController(APIView):
             # Llama al DAO 
             nuevo_miembro_dto = MiembroDAO.add_miembro(idComunidad, idUsuario)
             # Devuelve el DTO del miembro añadido 
-            return Response(dataclasses.asdict(nuevo_miembro_dto), status=status.HTTP_201_CREATED)
+            return Response(nuevo_miembro_dto, status=status.HTTP_201_CREATED)
         except Exception as e:
             # Captura error si ya existe (restricción unique_together, id único para cada miembro en la comunidad)
             return Response({"error": f"Error: {e}"}, status=status.HTTP_409_CONFLICT)
@@ -60,4 +111,122 @@ class MiembroController(APIView):
             return Response(status=status.HTTP_204_NO_CONTENT) # Éxito, sin respuesta
         except Exception as e:
             traceback.print_exc()
-            return Response({"error": str(e)}, status=status.HTTP_404_NOT_FOUND)
\ No newline at end of file
+            return Response({"error": str(e)}, status=status.HTTP_404_NOT_FOUND)
+
+
+class MiembrosLoteController(APIView):
+
+    def _leer_ids(self, request):
+        """
+        Lee la lista de ids de usuario del body. Acepta:
+        - Un array JSON: [1, 2, 3] o un objeto {"idsUsuario": [1, 2, 3]}
+        - NDJSON (Content-Type: application/x-ndjson): un id (o {"idUsuario": n}) por línea, que se lee poco a poco
+        """
+        if request.content_type.startswith('application/x-ndjson'):
+            return self._lineas_ndjson(request.stream)
+        
+        datos = request.data
+        if isinstance(datos, dict):
+            datos = datos.get('idsUsuario')
+        if not isinstance(datos, list):
+            raise InvalidParameterError("Se espera una lista de ids de usuario (o el campo 'idsUsuario').")
+        return datos
+
+    @staticmethod
+    def _lineas_ndjson(stream):
+        """
+        Recorre el body NDJSON línea a línea sin cargarlo entero en memoria.
+        """
+        if stream is None:
+            return
+        for linea in stream:
+            linea = linea.strip()
+            if not linea:
+                continue
+            try:
+                yield json.loads(linea)
+            except ValueError:
+                yield linea.decode(errors='replace')
+
+    def post(self, request, idComunidad=None):
+        """
+        POST /comunidad/miembros/<idComunidad>/lote/
+        (Añade muchos usuarios a la comunidad y devuelve el resultado para cada id)
+        """
+        try:
+            resultado = MiembroDAO.add_miembros_lote(idComunidad, self._leer_ids(request))
+            return Response(resultado, status=status.HTTP_200_OK)
+        except InvalidParameterError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except NotFoundError as e:
+            return Response({"error": str(e)}, status=status.HTTP_404_NOT_FOUND)
+
+    def delete(self, request, idComunidad=None):
+        """
+        DELETE /comunidad/miembros/<idComunidad>/lote/
+        (Elimina muchos miembros de la comunidad y devuelve el resultado para cada id)
+        """
+        try:
+            resultado = MiembroDAO.eliminar_miembros_lote(idComunidad, self._leer_ids(request))
+            return Response(resultado, status=status.HTTP_200_OK)
+        except InvalidParameterError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except NotFoundError as e:
+            return Response({"error": str(e)}, status=status.HTTP_404_NOT_FOUND)
+
+
+# --- Versión asíncrona (perfil ASGI) ---
+class MiembroAsyncController(ControladorAsync):
+    """
+    Versión asíncrona de MiembroController: el listado de miembros se consulta con el ORM asíncrono y
+    los usuarios se piden sin bloquear el proceso; el resto de peticiones las atiende MiembroController.
+    """
+    controlador_sincrono = MiembroController
+
+    async def get(self, request, idComunidad=None, idMiembro=None):
+        """
+        GET /comunidad/miembros/<idComunidad>/?limit=<n>&cursor=<cursor>[&ids_only=true]
+        GET /comunidad/miembros/<idComunidad>/?format=ndjson|csv[&ids_only=true] (o con la cabecera Accept)
+        """
+        if idMiembro:
+            return await self.delegar(request, idComunidad=idComunidad, idMiembro=idMiembro)
+        respuesta = await self._listado(request, idComunidad)
+        # La respuesta (y su ETag) depende del formato pedido con Accept, como en condicion_listado
+        patch_vary_headers(respuesta, ('Accept',))
+        return respuesta
+
+    async def _listado(self, request, idComunidad):
+        # Formato negociado igual que en MiembroController (?format= o Accept)
+        try:
+            renderizador, tipo = renderizado.negociar(request, MiembroController.renderer_classes)
+        except NotAcceptable as e:
+            return respuesta_json({"detail": str(e.detail)}, status=status.HTTP_406_NOT_ACCEPTABLE)
+        formato = renderizador.format
+
+        # ETag del listado: si el cliente ya lo tiene (If-None-Match) se responde 304 sin consultar el DAO
+        etag = await etags.aetag_listado('miembros', request, idComunidad, tipo)
+        if etag:
+            etag = quote_etag(etag)
+            no_modificado = get_conditional_response(request, etag=etag)
+            if no_modificado is not None:
+                return no_modificado
+
+        if formato in renderizado.FORMATOS_STREAMING:
+            return etags.poner_etag(_exportar_miembros(request, idComunidad, formato, asincrona=True), etag)
+
+        try:
+            limite = paginacion.leer_limite(request.GET.get('limit'))
+            cursor = request.GET.get('cursor')
+            if paginacion.leer_booleano(request.GET.get('ids_only')):
+                data, siguiente = await MiembroDAO.aget_ids_miembros(idComunidad, limite, cursor)
+            else:
+                data, siguiente = await MiembroDAO.aget_miembros_paginados(idComunidad, limite, cursor)
+            respuesta = respuesta_json(data, headers=paginacion.cabeceras_paginacion(request, siguiente))
+            if not _completo(data):
+                etags.sin_validador(respuesta)
+        except InvalidParameterError as e:
+            respuesta = respuesta_json({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            respuesta = respuesta_json({"error": str(e)}, status=status.HTTP_404_NOT_FOUND)
+
+        return etags.poner_etag(respuesta, etag)
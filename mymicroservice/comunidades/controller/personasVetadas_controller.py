@@ -1,12 +1,15 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
+from django.utils.decorators import method_decorator
+from comunidades import etags
 from comunidades.dao.personasVetadas_dao import PersonasVetadasDAO
-import dataclasses
 import traceback
 
 class PersonasVetadasController(APIView):
 
+    # ETag del listado: si el cliente ya lo tiene (If-None-Match) se responde 304 sin consultar el DAO
+    @method_decorator(etags.condicion_listado('vetados'))
     def get(self, request, idComunidad=None):
         """ 
         GET /comunidad/vetados/{idComunidad} 
@@ -18,8 +21,7 @@ class PersonasVetadasController(APIView):
         try:
             # Obtener la lista de vetados desde el DAO
             dtos = PersonasVetadasDAO.get_vetados(idComunidad)
-            data = [dataclasses.asdict(d) for d in dtos]
-            return Response(data, status=status.HTTP_200_OK)
+            return Response(dtos, status=status.HTTP_200_OK)
         except Exception as e:
             return Response({"error": str(e)}, status=status.HTTP_404_NOT_FOUND)
 
@@ -40,7 +42,7 @@ class PersonasVetadasController(APIView):
 
         try:
             nuevo_dto = PersonasVetadasDAO.vetar_miembro(idComunidad, idUsuario)
-            return Response(dataclasses.asdict(nuevo_dto), status=status.HTTP_201_CREATED)
+            return Response(nuevo_dto, status=status.HTTP_201_CREATED)
         except Exception as e:
             return Response({"error": str(e)}, status=status.HTTP_409_CONFLICT)
 
@@ -1,15 +1,22 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
+from rest_framework.settings import api_settings
+from comunidades import renderizado
 from comunidades.dao.publicacionMeGusta_dao import PublicacionMeGustaDAO
-import traceback
+from comunidades.dto.publicacionMeGusta_dto import PublicacionMeGustaDTO
+from comunidades.exceptions import InvalidParameterError, MissingParameterError, NotFoundError
 import dataclasses
+import traceback
 
 class PublicacionMeGustaController(APIView):
 
     errIdPubli = "Falta idPublicacion en la URL"
     errIdUs = "Falta idUsuario en el body"
 
+    # Además de JSON, la lista de likes se puede exportar en streaming con ?format=ndjson o ?format=csv
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, renderizado.RenderizadorNDJSON, renderizado.RenderizadorCSV]
+
     def post(self, request, idPublicacion=None):
         """
         POST /comunidad/publicaciones/megusta/{idPublicacion}/
@@ -23,35 +30,38 @@ class PublicacionMeGustaController(APIView):
             return Response({"error": self.errIdUs}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
-            # 1. Dar Like
-            PublicacionMeGustaDAO.dar_megusta(idPublicacion, idUsuario)
-            
-            # 2. Obtener nuevo contador para devolverlo
-            nuevo_total = PublicacionMeGustaDAO.contar_likes(idPublicacion)
+            # Dar Like (si ya lo tenía no cambia nada) y devolver el contador nuevo en la misma operación
+            nuevo_total = PublicacionMeGustaDAO.dar_megusta(idPublicacion, idUsuario)
             
             # Devuelve { "meGusta": <numero> }
             return Response({"meGusta": nuevo_total}, status=status.HTTP_200_OK)
             
+        except NotFoundError as e:
+            return Response({"error": str(e)}, status=status.HTTP_404_NOT_FOUND)
         except Exception as e:
-            # Si ya existe (error de integridad), devolvemos conflicto
+            # Si no es miembro de la comunidad, devolvemos conflicto
             return Response({"error": f"No se pudo dar like: {str(e)}"}, status=status.HTTP_409_CONFLICT)
         
     def get(self, request, idPublicacion=None):
         """
-        Maneja GET /comunidad/publicaciones/megusta/{idPublicacion}/
-        (Ver quién le dio like)
+        Maneja GET /comunidad/publicaciones/megusta/{idPublicacion}/[?format=ndjson|csv]
+        (Ver quién le dio like; con ndjson o csv se exporta en streaming, sin cargar la lista en memoria)
         """
         if not idPublicacion:
             return Response({"error": self.errIdPubli}, status=status.HTTP_400_BAD_REQUEST)
 
+        formato = request.accepted_renderer.format
+        if formato in renderizado.FORMATOS_STREAMING:
+            return renderizado.respuesta_streaming(
+                PublicacionMeGustaDAO.iterar_likes_de_publicacion(idPublicacion), formato,
+                campos=[f.name for f in dataclasses.fields(PublicacionMeGustaDTO)],
+                nombre=f'megusta-publicacion-{idPublicacion}'
+            )
+
         try:
-            # 1. Pide la lista al DAO
+            # Pide la lista al DAO (el renderizador JSON convierte los DTO al responder)
             lista_likes_dtos = PublicacionMeGustaDAO.get_likes_de_publicacion(idPublicacion)
-            
-            # 2. Convierte a JSON
-            data = [dataclasses.asdict(dto) for dto in lista_likes_dtos]
-            
-            return Response(data, status=status.HTTP_200_OK)
+            return Response(lista_likes_dtos, status=status.HTTP_200_OK)
             
         except Exception as e:
             return Response({"error": str(e)}, status=status.HTTP_404_NOT_FOUND)
@@ -69,13 +79,40 @@ class PublicacionMeGustaController(APIView):
             return Response({"error": self.errIdUs}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
-            # 1. Quitar Like
-            PublicacionMeGustaDAO.quitar_megusta(idPublicacion, idUsuario)
-            
-            # 2. Obtener nuevo contador
-            nuevo_total = PublicacionMeGustaDAO.contar_likes(idPublicacion)
+            # Quitar Like (si no lo tenía no cambia nada) y obtener el contador nuevo
+            nuevo_total = PublicacionMeGustaDAO.quitar_megusta(idPublicacion, idUsuario)
             
             return Response({"meGusta": nuevo_total}, status=status.HTTP_200_OK)
             
         except Exception as e:
-            return Response({"error": str(e)}, status=status.HTTP_404_NOT_FOUND)
\ No newline at end of file
+            return Response({"error": str(e)}, status=status.HTTP_404_NOT_FOUND)
+
+
+class PublicacionMeGustaEstadoController(APIView):
+
+    @staticmethod
+    def _leer_ids(request):
+        """
+        Lee los ids de publicación de la query: ?ids=1,2,3 (o ?ids=1&ids=2&ids=3)
+        """
+        try:
+            return [int(i) for valor in request.GET.getlist('ids') for i in valor.split(',') if i.strip()]
+        except ValueError:
+            raise InvalidParameterError("Los ids de publicación deben ser números enteros.")
+
+    def get(self, request):
+        """
+        GET /comunidad/publicaciones/megusta/estado/?idUsuario=<id>&ids=<id1>,<id2>,...
+        (A cuáles de esas publicaciones ha dado me gusta el usuario y cuántos me gusta tiene cada una,
+        en una sola petición en lugar de una por publicación)
+        """
+        try:
+            idUsuario = int(request.GET.get('idUsuario') or 0)
+        except ValueError:
+            return Response({"error": "idUsuario debe ser un número entero"}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            data = PublicacionMeGustaDAO.get_estado_megusta(idUsuario, self._leer_ids(request))
+            return Response(data, status=status.HTTP_200_OK)
+        except (MissingParameterError, InvalidParameterError) as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
@@ -1,18 +1,34 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
+from django.utils.decorators import method_decorator
 from comunidades.dao.publicacion_dao import PublicacionDAO
-import dataclasses
+from comunidades.exceptions import ContenidoVetadoError, InvalidParameterError
+from comunidades import etags, paginacion
 import traceback
 
+def _huella_feed(request, idComunidad):
+    """
+    Contadores de me gusta de la página pedida, para el ETag del feed (None si los parámetros no son válidos).
+    """
+    try:
+        limite = paginacion.leer_limite(request.GET.get('limit'))
+        return PublicacionDAO.huella_pagina(idComunidad, limite, request.GET.get('cursor'))
+    except InvalidParameterError:
+        return None
+
+
 class PublicacionController(APIView):
 
     errIdPubli = "Falta idPublicacion en la URL"
     errIdCom = "Falta idComunidad en la URL"
         
+    # ETag del listado (versión de la comunidad y contadores de me gusta de la página):
+    # si el cliente ya lo tiene (If-None-Match) se responde 304 sin construir la respuesta
+    @method_decorator(etags.condicion_listado('publicaciones', huella=_huella_feed))
     def get(self, request, idComunidad=None, idPublicacion=None):
         """
-        GET /comunidad/publicaciones/{idComunidad}/ (Lista)
+        GET /comunidad/publicaciones/{idComunidad}/?limit=<n>&cursor=<cursor> (Lista paginada)
         GET /comunidad/publicaciones/{idComunidad}/{idPublicacion}/ (Detalle)
         """
         
@@ -20,14 +36,16 @@ class PublicacionController(APIView):
             if idPublicacion:
                 # Detalle de una publicación
                 dto = PublicacionDAO.get_publicacion_especifica(idPublicacion)
-                return Response(dataclasses.asdict(dto), status=status.HTTP_200_OK)
+                return Response(dto, status=status.HTTP_200_OK)
             elif idComunidad:
-                # Lista de publicaciones de la comunidad
-                dtos = PublicacionDAO.get_publicaciones_comunidad(idComunidad)
-                data = [dataclasses.asdict(d) for d in dtos]
-                return Response(data, status=status.HTTP_200_OK)
+                # Página de publicaciones de la comunidad (la siguiente página va en la cabecera Link)
+                limite = paginacion.leer_limite(request.query_params.get('limit'))
+                dtos, siguiente = PublicacionDAO.get_publicaciones_paginadas(idComunidad, limite, request.query_params.get('cursor'))
+                return Response(dtos, status=status.HTTP_200_OK, headers=paginacion.cabeceras_paginacion(request, siguiente))
             else:
                 return Response({"error": self.errIdCom}, status=status.HTTP_400_BAD_REQUEST)
+        except InvalidParameterError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
             return Response({"error": str(e)}, status=status.HTTP_404_NOT_FOUND)
 
@@ -45,7 +63,7 @@ class PublicacionController(APIView):
 
         try:
             nuevo_dto = PublicacionDAO.crear_publicacion(datos, idComunidad)
-            return Response(dataclasses.asdict(nuevo_dto), status=status.HTTP_201_CREATED)
+            return Response(nuevo_dto, status=status.HTTP_201_CREATED)
         except Exception as e:
             traceback.print_exc()
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
@@ -64,8 +82,10 @@ class PublicacionController(APIView):
             # Llamamos al DAO para actualizar
             publicacion_actualizada_dto = PublicacionDAO.actualizar_publicacion(idPublicacion, datos_entrada)
             
-            return Response(dataclasses.asdict(publicacion_actualizada_dto), status=status.HTTP_200_OK)
+            return Response(publicacion_actualizada_dto, status=status.HTTP_200_OK)
             
+        except ContenidoVetadoError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
             traceback.print_exc()
             return Response({"error": str(e)}, status=status.HTTP_404_NOT_FOUND)
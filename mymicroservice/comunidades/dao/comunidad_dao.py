@@ -1,17 +1,103 @@
 from django.conf import settings
+import dataclasses
+import httpx
 import requests
-from comunidades.models import Comunidad
+from comunidades import basedatos, usuarios_client
+from django.db.models import Prefetch
+from comunidades.models import Comunidad, PalabraVetada
 from comunidades.dto.comunidad_dto import ComunidadDTO
-from typing import List
+from typing import Dict, Iterable, List
 from comunidades.dto.artista_dto import ArtistaDTO
+from comunidades.cache import CatalogoCache, TTLCache
+from comunidades.moderacion import MotorModeracion
+from comunidades.admision import admision
+from comunidades.dao.palabrasVetadas_dao import PalabrasVetadasDAO
 from comunidades.exceptions import ExternalServiceError, NotFoundError, AlreadyExistsError, MissingParameterError, BusinessRuleError
 
 USER_SERVICE_URL = settings.USER_MICROSERVICE_URL
 
 class ComunidadDAO:
-       
+
+    # Caché de artistas (ArtistaDTO) compartida por todas las peticiones del proceso
+    artistas_cache = TTLCache(maxsize=settings.ARTISTAS_CACHE_MAXSIZE, ttl=settings.ARTISTAS_CACHE_TTL)
+
     @staticmethod 
     def get_artista(artista: int) -> ArtistaDTO:
+        """
+        Obtiene el artista con el id especificado, primero desde la caché y si no está, del microservicio de usuarios.
+        Si falla o no encuentra al artista, LANZA UNA EXCEPCIÓN.
+        """
+        return ComunidadDAO.get_artistas([artista])[artista]
+
+    @staticmethod
+    def get_artistas(artistas: Iterable[int], degradar: bool = False) -> Dict[int, ArtistaDTO]:
+        """
+        Resuelve de una sola pasada todos los artistas indicados (diccionario idArtista -> ArtistaDTO).
+        - Los que están en la caché no generan ninguna llamada al servicio de usuarios.
+        - Los que faltan se piden en paralelo (con un número máximo de hilos) y se guardan en la caché.
+        Si falla alguna de las llamadas, LANZA UNA EXCEPCIÓN, salvo con 'degradar': entonces los artistas
+        que fallen o no lleguen a tiempo se devuelven marcados como parciales (ver _artista_degradado).
+        """
+        resultado = {}
+        pendientes = []
+        
+        # 1. Quitamos duplicados y buscamos en la caché
+        for id_artista in dict.fromkeys(artistas):
+            artista_dto = ComunidadDAO.artistas_cache.get(id_artista)
+            if artista_dto is None:
+                pendientes.append(id_artista)
+            else:
+                resultado[id_artista] = artista_dto
+
+        # 2. Pedimos los que faltan en paralelo al servicio de usuarios
+        alternativa = ComunidadDAO._artista_degradado if degradar else None
+        encontrados = usuarios_client.map_concurrente(ComunidadDAO._fetch_artista, pendientes, alternativa=alternativa)
+
+        # 3. Guardamos los nuevos artistas en la caché (los parciales no)
+        for id_artista, artista_dto in zip(pendientes, encontrados):
+            if not artista_dto.partial:
+                ComunidadDAO.artistas_cache.set(id_artista, artista_dto)
+            resultado[id_artista] = artista_dto
+
+        return resultado
+
+    @staticmethod
+    async def aget_artistas(artistas: Iterable[int], degradar: bool = False) -> Dict[int, ArtistaDTO]:
+        """
+        Versión asíncrona de get_artistas() (para las vistas async): los artistas que no están en la caché
+        se piden a la vez sin bloquear el bucle de eventos.
+        """
+        resultado = {}
+        pendientes = []
+        for id_artista in dict.fromkeys(artistas):
+            artista_dto = ComunidadDAO.artistas_cache.get(id_artista)
+            if artista_dto is None:
+                pendientes.append(id_artista)
+            else:
+                resultado[id_artista] = artista_dto
+
+        alternativa = ComunidadDAO._artista_degradado if degradar else None
+        encontrados = await usuarios_client.amap_concurrente(ComunidadDAO._afetch_artista, pendientes, alternativa=alternativa)
+
+        for id_artista, artista_dto in zip(pendientes, encontrados):
+            if not artista_dto.partial:
+                ComunidadDAO.artistas_cache.set(id_artista, artista_dto)
+            resultado[id_artista] = artista_dto
+        return resultado
+
+    @staticmethod
+    def _artista_degradado(artista: int) -> ArtistaDTO:
+        """
+        Artista para cuando el servicio de usuarios falla o tarda demasiado (modo degradado):
+        el último valor conocido aunque haya caducado o, si no lo hay, solo el id. Siempre marcado como parcial.
+        """
+        anterior = ComunidadDAO.artistas_cache.get_obsoleto(artista)
+        if anterior is not None:
+            return dataclasses.replace(anterior, partial=True)
+        return ArtistaDTO(idArtista=artista, nombreUsuario=None, rutaFoto=None, esNovedad=None, oyentes=None, genero=None, partial=True)
+
+    @staticmethod
+    def _fetch_artista(artista: int) -> ArtistaDTO:
         """
         # Esta función realiza la llamada al microservicio de usuarios para obtener al artista con el id especificado.
         Si falla o no encuentra al artista, LANZA UNA EXCEPCIÓN.
@@ -20,46 +106,61 @@ class ComunidadDAO:
         url_destino = f"{settings.USER_MICROSERVICE_URL}artistas/{artista}"      
         
         try:
-            # 2. Hacemos la petición GET
-            response = requests.get(url_destino, timeout=5) # timeout es buena práctica
-            
-            # 3. Si la respuesta es OK (200)
-            if response.status_code == 200:
-                data = response.json()
-                
-                # Mapeamos el JSON recibido al ArtistaDTO
-                return ArtistaDTO(
-                    idArtista=data.get('id'),
-                    nombreUsuario=data.get('nombreusuario'),
-                    rutaFoto=data.get('rutafoto'),
-                    esNovedad=data.get('esnovedad'),
-                    oyentes=data.get('oyentes' ),
-                    genero=data.get('genero', None) # Puede ser nulo
-                )
-            else:
-                # Si el artista no existe o hay error 404/500
-                raise ExternalServiceError(f"Error al obtener artista {artista}: El servicio respondió {response.status_code}")
-                
+            # Hacemos la petición GET
+            response = usuarios_client.get(url_destino) # timeouts de conexión y lectura configurados en settings
         except requests.RequestException as e:
             # Si el servidor está caído o no hay conexión
             raise ExternalServiceError(f"Error de conexión con el microservicio de usuarios: {str(e)}")
+        return ComunidadDAO._artista_de_respuesta(artista, response)
+
+    @staticmethod
+    async def _afetch_artista(artista: int) -> ArtistaDTO:
+        """
+        Versión asíncrona de _fetch_artista() (con el cliente asíncrono del servicio de usuarios).
+        """
+        url_destino = f"{settings.USER_MICROSERVICE_URL}artistas/{artista}"
+        try:
+            response = await usuarios_client.aget(url_destino)
+        except httpx.TransportError as e:
+            raise ExternalServiceError(f"Error de conexión con el microservicio de usuarios: {str(e)}")
+        return ComunidadDAO._artista_de_respuesta(artista, response)
+
+    @staticmethod
+    def _artista_de_respuesta(artista: int, response) -> ArtistaDTO:
+        """
+        Convierte la respuesta del servicio de usuarios (síncrona o asíncrona) en el ArtistaDTO.
+        Si el servicio no respondió 200, LANZA UNA EXCEPCIÓN.
+        """
+        # Si la respuesta es OK (200)
+        if response.status_code == 200:
+            data = response.json()
+            
+            # Mapeamos el JSON recibido al ArtistaDTO
+            return ArtistaDTO(
+                idArtista=data.get('id'),
+                nombreUsuario=data.get('nombreusuario'),
+                rutaFoto=data.get('rutafoto'),
+                esNovedad=data.get('esnovedad'),
+                oyentes=data.get('oyentes' ),
+                genero=data.get('genero', None) # Puede ser nulo
+            )
+        # Si el artista no existe o hay error 404/500
+        raise ExternalServiceError(f"Error al obtener artista {artista}: El servicio respondió {response.status_code}")
         
     @staticmethod
-    def _to_dto(modelo: Comunidad) -> ComunidadDTO:
+    def _to_dto(modelo: Comunidad, artista_dto: ArtistaDTO = None) -> ComunidadDTO:
         """
         Traductor que convierte el Modelo -> DTO
+        Si ya se ha resuelto el artista (listados), se pasa en 'artista_dto' para no volver a pedirlo.
         """
-        # 1. SIMULAMOS la llamada al servicio de usuarios
-        artista_dto = ComunidadDAO.get_artista(modelo.idArtista) # Llamada al servicio de Usuarios para obtener el artista
+        # 1. Llamada al servicio de Usuarios (o a la caché) para obtener el artista
+        if artista_dto is None:
+            artista_dto = ComunidadDAO.get_artista(modelo.idArtista)
         
-        # 2. Calcular los contadores 
-        num_publi = modelo.publicacion_set.count() # Contar publicaciones
-        num_miem = modelo.comunidadmiembros_set.count() # Contar miembros
-
-        # 3. Convertimos palabras vetadas de string -> lista
-        palabras = modelo.palabrasVetadas.split(',') if modelo.palabrasVetadas else []
+        # 2. Palabras vetadas (precargadas en los listados, en el orden en que se añadieron)
+        palabras = [p.palabra for p in modelo.palabravetada_set.all()]
         
-        # 4. Construimos el DTO final
+        # 3. Construimos el DTO final (los contadores están guardados en la comunidad)
         return ComunidadDTO(
             idComunidad=modelo.idComunidad,
             artista=artista_dto,
@@ -67,8 +168,8 @@ class ComunidadDAO:
             descComunidad=modelo.descComunidad,
             rutaImagen=modelo.rutaImagen,
             fechaCreacion=modelo.fechaCreacion,
-            numPublicaciones=num_publi,
-            numUsuarios=num_miem,   
+            numPublicaciones=modelo.numPublicaciones,
+            numUsuarios=modelo.numUsuarios,   
             palabrasVetadas=palabras 
         )
         
@@ -79,18 +180,66 @@ class ComunidadDAO:
         """
         # Filtramos las comunidades que tengan miembros con ese id de usuario. 
         # (__ para relacionar la tabla comunidad con comunidadmiembros, utiliza la relación inversa de Django, al ser Comunidad una ForeignKey en ComunidadMiembros)
-        comunidades = Comunidad.objects.filter(comunidadmiembros__idUsuario=usuario)
+        comunidades = ComunidadDAO._preparar_consulta(Comunidad.objects.filter(comunidadmiembros__idUsuario=usuario))
         
         # Convertimos cada modelo encontrado a DTO y lo devolvemos
-        return [ComunidadDAO._to_dto(c) for c in comunidades]
+        return ComunidadDAO._to_dtos(comunidades)
     
     @staticmethod
     def get_all_comunidades() -> List[ComunidadDTO]:
         # Pide los modelos a la BD
-        comunidades_models = Comunidad.objects.all()
+        comunidades_models = ComunidadDAO._preparar_consulta(Comunidad.objects.all())
         
         # Convierte los modelos en DTOs
-        return [ComunidadDAO._to_dto(c) for c in comunidades_models]
+        return ComunidadDAO._to_dtos(comunidades_models)
+
+    @staticmethod
+    def _preparar_consulta(comunidades):
+        """
+        Precarga las palabras vetadas de todas las comunidades de la consulta en una única consulta adicional.
+        (Los contadores de miembros y publicaciones ya están guardados en cada comunidad)
+        """
+        return comunidades.prefetch_related(Prefetch('palabravetada_set', queryset=PalabraVetada.objects.order_by('id')))
+
+    @staticmethod
+    def _to_dtos(comunidades) -> List[ComunidadDTO]:
+        """
+        Convierte una lista de modelos en DTOs resolviendo todos los artistas de una sola pasada.
+        Si USER_SERVICE_DEGRADAR está activo, un fallo del servicio de usuarios no impide devolver el listado.
+        """
+        comunidades = list(comunidades)
+        artistas = ComunidadDAO.get_artistas((c.idArtista for c in comunidades), degradar=settings.USER_SERVICE_DEGRADAR)
+        return [ComunidadDAO._to_dto(c, artistas[c.idArtista]) for c in comunidades]
+
+    @staticmethod
+    async def _ato_dtos(comunidades) -> List[ComunidadDTO]:
+        """
+        Versión asíncrona de _to_dtos(): la consulta se hace con el ORM asíncrono (con sus palabras vetadas
+        precargadas) y los artistas se resuelven sin bloquear el bucle de eventos.
+        """
+        comunidades = [c async for c in ComunidadDAO._preparar_consulta(comunidades)]
+        artistas = await ComunidadDAO.aget_artistas((c.idArtista for c in comunidades), degradar=settings.USER_SERVICE_DEGRADAR)
+        return [ComunidadDAO._to_dto(c, artistas[c.idArtista]) for c in comunidades]
+
+    @staticmethod
+    async def aget_all_comunidades() -> List[ComunidadDTO]:
+        return await ComunidadDAO._ato_dtos(Comunidad.objects.all())
+
+    @staticmethod
+    async def aget_comunidades_usuario(usuario: int) -> List[ComunidadDTO]:
+        return await ComunidadDAO._ato_dtos(Comunidad.objects.filter(comunidadmiembros__idUsuario=usuario))
+
+    @staticmethod
+    async def aget_comunidad_especifica(comunidad: int) -> ComunidadDTO:
+        """
+        Versión asíncrona de get_comunidad_especifica().
+        """
+        try:
+            modelo = await ComunidadDAO._preparar_consulta(Comunidad.objects).aget(idComunidad=comunidad)
+        except Comunidad.DoesNotExist:
+            raise NotFoundError(f"Comunidad con id {comunidad} no encontrada.")
+        artistas = await ComunidadDAO.aget_artistas([modelo.idArtista])
+        return ComunidadDAO._to_dto(modelo, artistas[modelo.idArtista])
 
     @staticmethod
     def crear_comunidad(datos: dict) -> ComunidadDTO:
@@ -99,15 +248,20 @@ class ComunidadDAO:
         'nombreComunidad': datos.get('nombreComunidad'),
         'descComunidad': datos.get('descComunidad'),
         'rutaImagen': datos.get('rutaImagen'),
-        'palabrasVetadas': ','.join(datos.get('palabrasVetadas', [])) 
         }
         
         if Comunidad.objects.filter(idArtista=datos.get('idArtista')).exists():
             raise AlreadyExistsError("Este artista ya tiene una comunidad creada.")
         
-        # Crea el modelo en la BD
-        # **datos es un truco para "desempaquetar" un diccionario
-        nueva_comunidad = Comunidad.objects.create(**datosModelo)
+        with basedatos.escritura():
+            # Crea el modelo en la BD
+            # **datos es un truco para "desempaquetar" un diccionario
+            nueva_comunidad = Comunidad.objects.create(**datosModelo)
+            
+            # Guarda sus palabras vetadas (si las hay)
+            if datos.get('palabrasVetadas'):
+                PalabrasVetadasDAO.add_palabras_vetadas(nueva_comunidad.idComunidad, datos.get('palabrasVetadas'))
+            CatalogoCache.invalidar()
         
         # Convierte el nuevo modelo en un DTO para devolverlo
         return ComunidadDAO._to_dto(nueva_comunidad)
@@ -119,7 +273,7 @@ class ComunidadDAO:
         """
         try:
             # 1. Busca en la BD
-            modelo = Comunidad.objects.get(idComunidad=comunidad)
+            modelo = ComunidadDAO._preparar_consulta(Comunidad.objects).get(idComunidad=comunidad)
             
             # 2. Traduce y devuelve el DTO
             return ComunidadDAO._to_dto(modelo)
@@ -141,11 +295,14 @@ class ComunidadDAO:
             comunidad.descComunidad = datos.get('descComunidad', comunidad.descComunidad)
             comunidad.rutaImagen = datos.get('rutaImagen', comunidad.rutaImagen)
             
-            if 'palabrasVetadas' in datos:
-                comunidad.palabrasVetadas = ','.join(datos.get('palabrasVetadas', []))
+            with basedatos.escritura():
+                # 3. Guarda en la BD (solo los campos editables, para no pisar los contadores ni la versión de las palabras vetadas)
+                comunidad.save(update_fields=['nombreComunidad', 'descComunidad', 'rutaImagen'])
 
-            # 3. Guarda en la BD
-            comunidad.save()
+                
+                if 'palabrasVetadas' in datos:
+                    PalabrasVetadasDAO.modificar_palabras_vetadas(comunidad.idComunidad, datos.get('palabrasVetadas') or [])
+                CatalogoCache.invalidar()
             
             # 4. Devuelve el DTO actualizado
             return ComunidadDAO._to_dto(comunidad)
@@ -160,7 +317,10 @@ class ComunidadDAO:
         try:
             # Se obteniene el modelo de la comunidad especificada y se elimina de la base de datos
             comunidad = Comunidad.objects.get(idComunidad=comunidad)
+            MotorModeracion.invalidar(comunidad.idComunidad)
+            admision.invalidar(comunidad.idComunidad)
             comunidad.delete()
+            CatalogoCache.invalidar()
             # No se devuelve nada, el Controller dará un 204
         except Comunidad.DoesNotExist: # Si no existe la comunidad, habrá una excepción
             raise NotFoundError(f"Comunidad con id {comunidad} no encontrada.")
\ No newline at end of file
@@ -1,14 +1,30 @@
+import dataclasses
+from itertools import islice
 from django.conf import settings
+from django.db import IntegrityError
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
 from comunidades.models import ComunidadMiembros, PersonasVetadas, Comunidad
 from comunidades.dto.miembro_dto import MiembroDTO
-from typing import List
-from pyexpat import model
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+import httpx
 import requests
+from comunidades import basedatos, paginacion, usuarios_client
+from comunidades.admision import admision
+from comunidades.cache import CatalogoCache, TTLCache
 from comunidades.exceptions import ExternalServiceError, NotFoundError, AlreadyExistsError, MissingParameterError, BusinessRuleError
 
 USER_SERVICE_URL = settings.USER_MICROSERVICE_URL
 
 class MiembroDAO:
+
+    # Miembros que se leen de la BD (y se piden al servicio de usuarios) en cada bloque de las exportaciones
+    TAM_BLOQUE = 500
+
+    # Último valor conocido de cada usuario, solo para el modo degradado (nunca se usa si el servicio responde)
+    usuarios_respaldo = TTLCache(maxsize=settings.USUARIOS_RESPALDO_MAXSIZE, ttl=0)
+
     @staticmethod
     def get_miembros(usuario: int) -> MiembroDTO:
         """
@@ -25,25 +41,46 @@ class MiembroDAO:
         
         try:
             # Hacemos la petición con timeout
-            response = requests.get(url_destino, timeout=5)
-            
-            if response.status_code == 200:
-                data = response.json()
-                
-                # Mapeamos el JSON recibido al MiembroDTO
-                return MiembroDTO(
-                    idUsuario=data.get('id'),
-                    nombreUsuario=data.get('nombreusuario'),
-                    esArtista=data.get('esartista'),
-                    rutaFoto=data.get('rutafoto', None)
-                )
-            else:
-                # Si devuelve 404 o 500, lanzamos excepción.
-                raise ExternalServiceError(f"Error al obtener usuario {usuario}: El servicio respondió {response.status_code}")
-                
+            response = usuarios_client.get(url_destino) # timeouts de conexión y lectura configurados en settings
         except requests.RequestException as e:
             # Si el servidor está caído o hay error de red
             raise ExternalServiceError(f"Error de conexión con el microservicio de usuarios: {str(e)}")
+        return MiembroDAO._miembro_de_respuesta(usuario, response)
+
+    @staticmethod
+    async def aget_miembros(usuario: int) -> MiembroDTO:
+        """
+        Versión asíncrona de get_miembros() (con el cliente asíncrono del servicio de usuarios).
+        """
+        if not usuario:
+            raise MissingParameterError("Error: falta ID de usuario.")
+        url_destino = f"{settings.USER_MICROSERVICE_URL}{usuario}"
+        try:
+            response = await usuarios_client.aget(url_destino)
+        except httpx.TransportError as e:
+            raise ExternalServiceError(f"Error de conexión con el microservicio de usuarios: {str(e)}")
+        return MiembroDAO._miembro_de_respuesta(usuario, response)
+
+    @staticmethod
+    def _miembro_de_respuesta(usuario: int, response) -> MiembroDTO:
+        """
+        Convierte la respuesta del servicio de usuarios (síncrona o asíncrona) en el MiembroDTO.
+        Si el servicio no respondió 200, LANZA UNA EXCEPCIÓN.
+        """
+        if response.status_code == 200:
+            data = response.json()
+            
+            # Mapeamos el JSON recibido al MiembroDTO (y lo guardamos por si luego falla el servicio)
+            miembro_dto = MiembroDTO(
+                idUsuario=data.get('id'),
+                nombreUsuario=data.get('nombreusuario'),
+                esArtista=data.get('esartista'),
+                rutaFoto=data.get('rutafoto', None)
+            )
+            MiembroDAO.usuarios_respaldo.set(usuario, miembro_dto)
+            return miembro_dto
+        # Si devuelve 404 o 500, lanzamos excepción.
+        raise ExternalServiceError(f"Error al obtener usuario {usuario}: El servicio respondió {response.status_code}")
         
             
     @staticmethod
@@ -60,16 +97,84 @@ class MiembroDAO:
         return MiembroDAO.get_miembros(idUsuario)
 
     @staticmethod
-    def get_miembros_comunidad(comunidad: int) -> List[MiembroDTO]:
+    async def _ato_dto(modelo: ComunidadMiembros) -> MiembroDTO:
+        """
+        Versión asíncrona de _to_dto().
+        """
+        return await MiembroDAO.aget_miembros(getattr(modelo, "idUsuario", None))
+
+    @staticmethod
+    def _miembro_degradado(modelo: ComunidadMiembros) -> MiembroDTO:
         """
-        Devuelve la lista de miembros (DTOs) de una comunidad.
+        Miembro para cuando el servicio de usuarios falla o tarda demasiado (modo degradado):
+        el último valor conocido o, si no lo hay, solo el id. Siempre marcado como parcial.
+        """
+        anterior = MiembroDAO.usuarios_respaldo.get_obsoleto(modelo.idUsuario)
+        if anterior is not None:
+            return dataclasses.replace(anterior, partial=True)
+        return MiembroDTO(idUsuario=modelo.idUsuario, nombreUsuario=None, esArtista=None, rutaFoto=None, partial=True)
+
+    @staticmethod
+    def _alternativa():
+        """
+        Función con la que se resuelven los miembros si falla el servicio de usuarios (None si no se degrada).
+        """
+        return MiembroDAO._miembro_degradado if settings.USER_SERVICE_DEGRADAR else None
+
+    @staticmethod
+    def get_miembros_paginados(comunidad: int, limite: int, cursor: Optional[str] = None) -> Tuple[List[MiembroDTO], Optional[str]]:
+        """
+        Devuelve una página de miembros (DTOs) de la comunidad ordenados por fecha de unión,
+        y el cursor de la página siguiente (None si no hay más).
+        Solo se piden al servicio de usuarios los miembros de la página.
         """
-        # 1. Busca en nuestra BD local los IDs de los miembros
         miembros_models = ComunidadMiembros.objects.filter(idComunidad_id=comunidad)
-        
-        # 2. Prepara cada DTO (esto hará múltiples llamadas al servicio de usuarios para recuperarlos a todos)
-        return [MiembroDAO._to_dto(m) for m in miembros_models] 
-            
+        pagina, siguiente = paginacion.paginar(miembros_models, 'fechaUnion', 'id', limite, cursor, descendente=False)
+        return usuarios_client.map_concurrente(MiembroDAO._to_dto, pagina, alternativa=MiembroDAO._alternativa()), siguiente
+
+    @staticmethod
+    async def aget_miembros_paginados(comunidad: int, limite: int, cursor: Optional[str] = None) -> Tuple[List[MiembroDTO], Optional[str]]:
+        """
+        Versión asíncrona de get_miembros_paginados() (para las vistas async).
+        """
+        miembros_models = ComunidadMiembros.objects.filter(idComunidad_id=comunidad)
+        pagina, siguiente = await paginacion.apaginar(miembros_models, 'fechaUnion', 'id', limite, cursor, descendente=False)
+        return await usuarios_client.amap_concurrente(MiembroDAO._ato_dto, pagina, alternativa=MiembroDAO._alternativa()), siguiente
+
+    @staticmethod
+    async def aget_ids_miembros(comunidad: int, limite: int, cursor: Optional[str] = None) -> Tuple[List[dict], Optional[str]]:
+        """
+        Versión asíncrona de get_ids_miembros() (para las vistas async).
+        """
+        filas = ComunidadMiembros.objects.filter(idComunidad_id=comunidad).values('id', 'idUsuario', 'fechaUnion')
+        pagina, siguiente = await paginacion.apaginar(filas, 'fechaUnion', 'id', limite, cursor, descendente=False)
+        return [{'idUsuario': f['idUsuario'], 'fechaUnion': f['fechaUnion']} for f in pagina], siguiente
+
+    @staticmethod
+    def get_ids_miembros(comunidad: int, limite: int, cursor: Optional[str] = None) -> Tuple[List[dict], Optional[str]]:
+        """
+        Devuelve una página con el idUsuario y la fechaUnion de los miembros de la comunidad,
+        leídos directamente de la BD (sin crear modelos ni llamar al servicio de usuarios).
+        """
+        filas = ComunidadMiembros.objects.filter(idComunidad_id=comunidad).values('id', 'idUsuario', 'fechaUnion')
+        pagina, siguiente = paginacion.paginar(filas, 'fechaUnion', 'id', limite, cursor, descendente=False)
+        return [{'idUsuario': f['idUsuario'], 'fechaUnion': f['fechaUnion']} for f in pagina], siguiente
+
+    @staticmethod
+    def iterar_miembros(comunidad: int, solo_ids: bool = False) -> Iterator:
+        """
+        Recorre todos los miembros de la comunidad por fecha de unión sin cargarlos en memoria
+        (para las exportaciones en streaming). Se leen de la BD por bloques con iterator() y, salvo con 'solo_ids',
+        cada bloque se completa con el servicio de usuarios (en paralelo) antes de pasar al siguiente.
+        """
+        miembros = ComunidadMiembros.objects.filter(idComunidad_id=comunidad).order_by('fechaUnion', 'id')
+        if solo_ids:
+            for idUsuario, fechaUnion in miembros.values_list('idUsuario', 'fechaUnion').iterator(chunk_size=MiembroDAO.TAM_BLOQUE):
+                yield {'idUsuario': idUsuario, 'fechaUnion': fechaUnion}
+            return
+        for trozo in MiembroDAO._trozos(miembros.only('idUsuario').iterator(chunk_size=MiembroDAO.TAM_BLOQUE), MiembroDAO.TAM_BLOQUE):
+            yield from usuarios_client.map_concurrente(MiembroDAO._to_dto, trozo, alternativa=MiembroDAO._alternativa())
+
     @staticmethod
     def get_miembro_especifico(comunidad: int, usuario: int) -> MiembroDTO:
         """
@@ -88,24 +193,45 @@ class MiembroDAO:
     def add_miembro(comunidad: int, usuario: int):
         """
         Añade un usuario a una comunidad.
+        Con ADMISION_CACHE las comprobaciones se hacen en memoria con los miembros y vetados de la comunidad,
+        pero solo para rechazar: el veto se confirma siempre en la base de datos en la transacción que inserta.
         """
-        
+        entrada = admision.get(comunidad)
+        if entrada is not None:
+            ya_miembro, es_creador, vetado = entrada.comprobar(int(usuario))
+        else:
+            ya_miembro = ComunidadMiembros.objects.filter(idComunidad=comunidad, idUsuario=usuario).exists()
+            es_creador = Comunidad.objects.filter(idComunidad=comunidad, idArtista=usuario).exists()
+            vetado = PersonasVetadas.objects.filter(idComunidad=comunidad, idUsuario=usuario).exists()
+
         # si ya existe el miembro en la comunidad, lanza una excepción
-        if ComunidadMiembros.objects.filter(idComunidad=comunidad, idUsuario=usuario).exists():
+        if ya_miembro:
             raise AlreadyExistsError("El usuario ya es miembro de la comunidad.")
         
         # si el usuario es el creador de la comunidad, lanza una excepción
-        if Comunidad.objects.filter(idComunidad=comunidad, idArtista=usuario).exists():
+        if es_creador:
             raise BusinessRuleError("El usuario es el creador de la comunidad.")
         
         # si el miembro está vetado de la comunidad, lanza una excepción
-        if PersonasVetadas.objects.filter(idComunidad=comunidad, idUsuario=usuario).exists():
+        if vetado:
             raise BusinessRuleError("El usuario está vetado en la comunidad.")
         
-        nuevo_miembro = ComunidadMiembros.objects.create(
-            idComunidad_id=comunidad,  # se añade _id para asignar directamente el id de la comunidad
-            idUsuario=usuario
-        )
+        try:
+            with basedatos.escritura():
+                # Un veto hecho en otro proceso puede no verse aún en la caché (hasta ADMISION_CACHE_TTL segundos)
+                if entrada is not None and PersonasVetadas.objects.filter(idComunidad=comunidad, idUsuario=usuario).exists():
+                    raise BusinessRuleError("El usuario está vetado en la comunidad.")
+                nuevo_miembro = ComunidadMiembros.objects.create(
+                    idComunidad_id=comunidad,  # se añade _id para asignar directamente el id de la comunidad
+                    idUsuario=usuario
+                )
+                MiembroDAO._sumar_miembros(comunidad, 1)
+                admision.cambio(comunidad, miembros_añadidos=[usuario])
+        except IntegrityError as e:
+            # Lo ha añadido otra petición a la vez, u otro proceso sin que la caché lo sepa aún: lo rechaza el índice único
+            if ComunidadMiembros.objects.filter(idComunidad_id=comunidad, idUsuario=usuario).exists():
+                raise AlreadyExistsError("El usuario ya es miembro de la comunidad.") from e
+            raise
         return MiembroDAO._to_dto(nuevo_miembro) # devolver el DTO del nuevo miembro añadido
 
         
@@ -114,11 +240,165 @@ class MiembroDAO:
         """
         Elimina a un miembro de una comunidad.
         """
-        try:
-            # se busca el miembro de la comunidad que se quiere eliminar
-            miembro = ComunidadMiembros.objects.get(idComunidad_id=comunidad, idUsuario=usuario) # idComunidad_id para buscar por id directamente
-            # si se encuentra, se elimina el miembro de la comunidad
-            miembro.delete()
+        with basedatos.escritura():
+            # se elimina el miembro de la comunidad (idComunidad_id para buscar por id directamente)
+            borrados, _ = ComunidadMiembros.objects.filter(idComunidad_id=comunidad, idUsuario=usuario).delete()
+            if not borrados:  # si no se encuentra el miembro en la comunidad, salta una excepción
+                raise NotFoundError(f"El usuario {usuario} no es miembro de la comunidad {comunidad}.")
+            MiembroDAO._sumar_miembros(comunidad, -1)
+            admision.cambio(comunidad, miembros_quitados=[usuario])
             # No se devuelve nada, el Controller dará un 204
-        except ComunidadMiembros.DoesNotExist:  # si no se encuentra el miembro en la comunidad, salta una excepción
-            raise NotFoundError(f"El usuario {usuario} no es miembro de la comunidad {comunidad}.")
\ No newline at end of file
+
+    @staticmethod
+    def _sumar_miembros(comunidad: int, cantidad: int):
+        """
+        Actualiza el contador de miembros de la comunidad (con F() para que sea atómico en la BD; nunca baja de 0).
+        Debe llamarse dentro de la misma transacción que el alta o baja de los miembros.
+        En la misma sentencia aumenta la versión de contenido de la comunidad (para los ETags)
+        y también invalida las respuestas cacheadas del catálogo (cambian los miembros y sus contadores).
+        """
+        if cantidad:
+            Comunidad.objects.filter(idComunidad=comunidad).update(
+                numUsuarios=Greatest(F('numUsuarios') + cantidad, 0),
+                versionContenido=F('versionContenido') + 1
+            )
+            CatalogoCache.invalidar()
+
+    @staticmethod
+    def _trozos(usuarios: Iterable, tamano: int):
+        """
+        Recorre los ids de usuario en trozos de 'tamano' elementos (sin cargar todos en memoria).
+        """
+        iterador = iter(usuarios)
+        while True:
+            trozo = list(islice(iterador, tamano))
+            if not trozo:
+                return
+            yield trozo
+
+    @staticmethod
+    def _resumen(resultados: Dict) -> dict:
+        """
+        Construye la respuesta de una operación por lotes: el resultado de cada id y el total por resultado.
+        """
+        totales = {}
+        for estado in resultados.values():
+            totales[estado] = totales.get(estado, 0) + 1
+        return {"resumen": totales, "resultados": resultados}
+
+    @staticmethod
+    def add_miembros_lote(comunidad: int, usuarios: Iterable) -> dict:
+        """
+        Añade muchos usuarios a una comunidad de una vez.
+        Las comprobaciones (ya es miembro, es el creador, está vetado) se hacen con una consulta por trozo
+        (los miembros, en memoria con ADMISION_CACHE; los vetos siempre en la base de datos)
+        y los nuevos miembros se insertan con una sola sentencia, cada trozo en su propia transacción.
+        Devuelve el resultado para cada id: añadido, ya_miembro, creador, vetado o invalido
+        (si otra petición lo ha añadido a la vez, ya_miembro: solo cuenta lo que se ha insertado de verdad).
+        """
+        creador = Comunidad.objects.filter(idComunidad=comunidad).values_list('idArtista', flat=True).first()
+        if creador is None:
+            raise NotFoundError(f"Comunidad con id {comunidad} no encontrada.")
+
+        resultados = {}
+        for trozo in MiembroDAO._trozos(usuarios, settings.MIEMBROS_LOTE_TAMANO):
+            # 1. Validamos los ids del trozo (enteros positivos; los repetidos se procesan una sola vez)
+            ids = []
+            for valor in trozo:
+                usuario = MiembroDAO._leer_id(valor)
+                if usuario is None:
+                    resultados[str(valor)] = "invalido"
+                elif usuario not in resultados:
+                    resultados[usuario] = None
+                    ids.append(usuario)
+
+            with basedatos.escritura():
+                # 2. Comprobaciones con una consulta por tabla para todo el trozo (los miembros, o con la caché de admisión)
+                entrada = admision.get(comunidad)
+                if entrada is not None:
+                    miembros = entrada.miembros
+                else:
+                    miembros = set(ComunidadMiembros.objects.filter(idComunidad_id=comunidad, idUsuario__in=ids).values_list('idUsuario', flat=True))
+                # Los vetos no se toman de la caché: uno hecho en otro proceso puede no verse aún en ella
+                vetados = set(PersonasVetadas.objects.filter(idComunidad_id=comunidad, idUsuario__in=ids).values_list('idUsuario', flat=True))
+
+                nuevos = []
+                for usuario in ids:
+                    if usuario in miembros:
+                        resultados[usuario] = "ya_miembro"
+                    elif usuario == creador:
+                        resultados[usuario] = "creador"
+                    elif usuario in vetados:
+                        resultados[usuario] = "vetado"
+                    else:
+                        nuevos.append(usuario)
+
+                # 3. Inserción de todo el trozo en una sola sentencia y actualización del contador con lo insertado
+                insertados = MiembroDAO._insertar_miembros(comunidad, nuevos)
+                for usuario in nuevos:
+                    resultados[usuario] = "añadido" if usuario in insertados else "ya_miembro"
+                MiembroDAO._sumar_miembros(comunidad, len(insertados))
+                if insertados:
+                    admision.cambio(comunidad, miembros_añadidos=insertados)
+
+        return MiembroDAO._resumen(resultados)
+
+    @staticmethod
+    def _insertar_miembros(comunidad: int, usuarios: List[int]) -> set:
+        """
+        Inserta los usuarios como miembros de la comunidad (INSERT ... ON CONFLICT DO NOTHING RETURNING)
+        y devuelve los ids que se han insertado de verdad: los que ya eran miembros (por ejemplo, porque
+        otra petición los ha añadido a la vez) no se insertan ni se devuelven.
+        """
+        fecha = timezone.now()
+        return set(basedatos.insertar_ignorando_conflictos(
+            ComunidadMiembros, ('idComunidad', 'idUsuario', 'fechaUnion'), ((comunidad, usuario, fecha) for usuario in usuarios),
+            conflicto=('idComunidad', 'idUsuario'), devolver='idUsuario'))
+
+    @staticmethod
+    def eliminar_miembros_lote(comunidad: int, usuarios: Iterable) -> dict:
+        """
+        Elimina muchos miembros de una comunidad de una vez (un DELETE por trozo).
+        Devuelve el resultado para cada id: eliminado, no_miembro o invalido.
+        """
+        if not Comunidad.objects.filter(idComunidad=comunidad).exists():
+            raise NotFoundError(f"Comunidad con id {comunidad} no encontrada.")
+
+        resultados = {}
+        for trozo in MiembroDAO._trozos(usuarios, settings.MIEMBROS_LOTE_TAMANO):
+            ids = []
+            for valor in trozo:
+                usuario = MiembroDAO._leer_id(valor)
+                if usuario is None:
+                    resultados[str(valor)] = "invalido"
+                elif usuario not in resultados:
+                    resultados[usuario] = None
+                    ids.append(usuario)
+
+            with basedatos.escritura():
+                miembros = ComunidadMiembros.objects.filter(idComunidad_id=comunidad, idUsuario__in=ids)
+                existentes = set(miembros.values_list('idUsuario', flat=True))
+                borrados, _ = miembros.delete()
+                MiembroDAO._sumar_miembros(comunidad, -borrados)
+                if existentes:
+                    admision.cambio(comunidad, miembros_quitados=existentes)
+
+            for usuario in ids:
+                resultados[usuario] = "eliminado" if usuario in existentes else "no_miembro"
+
+        return MiembroDAO._resumen(resultados)
+
+    @staticmethod
+    def _leer_id(valor) -> Optional[int]:
+        """
+        Convierte un id de usuario recibido (número, texto o {"idUsuario": n}) a entero. Devuelve None si no es válido.
+        """
+        if isinstance(valor, dict):
+            valor = valor.get('idUsuario')
+        if isinstance(valor, bool):
+            return None
+        try:
+            usuario = int(valor)
+        except (TypeError, ValueError):
+            return None
+        return usuario if usuario > 0 else None
@@ -1,102 +1,106 @@
 from typing import List
-from comunidades.models import Comunidad
+from comunidades import basedatos
+from django.db.models import F
+from comunidades.models import Comunidad, PalabraVetada
 from comunidades.dto.palabrasVetadas_dto import PalabrasVetadasDTO
-from comunidades.exceptions import ExternalServiceError, NotFoundError, AlreadyExistsError, MissingParameterError, BusinessRuleError
+from comunidades.moderacion import MotorModeracion
+from comunidades.cache import CatalogoCache
+from comunidades.exceptions import ExternalServiceError, NotFoundError, AlreadyExistsError, MissingParameterError, BusinessRuleError, InvalidParameterError
 
 class PalabrasVetadasDAO:
 
     @staticmethod
-    def _string_to_list(cadena: str) -> List[str]:
+    def _limpiar(palabras: List[str]) -> List[str]:
         """
-            Convierte una cadena separada por comas en una lista de palabras.
+            Quita espacios, palabras vacías y repetidas (manteniendo el orden).
         """
-        if not cadena or cadena.strip() == "":
-            return []
-        # Separa por comas y quita espacios en blanco alrededor
-        return [p.strip() for p in cadena.split(',')]
+        limpias = list(dict.fromkeys(p.strip() for p in palabras if p and p.strip()))
+        if any(len(p) > 100 for p in limpias):
+            raise InvalidParameterError("Las palabras vetadas no pueden tener más de 100 caracteres.")
+        return limpias
 
     @staticmethod
-    def _list_to_string(lista: List[str]) -> str:
+    def _marcar_cambio(idComunidad: int):
         """
-            Convierte una lista de palabras en una cadena separada por comas.
+            Aumenta la versión de la lista de palabras vetadas de la comunidad (para la caché de moderación)
+            e invalida las respuestas cacheadas del catálogo.
+            Si la comunidad no existe, LANZA UNA EXCEPCIÓN.
         """
-        if not lista:
-            return ""
-        # Une la lista con comas
-        return ",".join(lista)
+        if not Comunidad.objects.filter(pk=idComunidad).update(versionPalabras=F('versionPalabras') + 1):
+            raise NotFoundError(f"Comunidad con id {idComunidad} no encontrada.")
+        CatalogoCache.invalidar()
+
+    @staticmethod
+    def _get_lista(idComunidad: int) -> List[str]:
+        """
+            Devuelve las palabras vetadas de la comunidad en el orden en que se añadieron.
+        """
+        return list(PalabraVetada.objects.filter(idComunidad_id=idComunidad).order_by('id').values_list('palabra', flat=True))
 
     @staticmethod
     def get_palabras_vetadas(idComunidad: int) -> PalabrasVetadasDTO:
         """
             Obtiene la lista de palabras vetadas de una comunidad específica.
         """
-        
+
         # Si la url no tiene idComunidad, lanza excepción
         if not idComunidad:
             raise MissingParameterError("Falta id de la Comunidad")
-        
-        # Obtiene la comunidad con el id especificado
-        comunidad = Comunidad.objects.get(pk=idComunidad)
-        
-        # Usa la función auxiliar para convertir el string a lista
-        lista_palabras = PalabrasVetadasDAO._string_to_list(comunidad.palabrasVetadas)
-        
+
+        # Si no existe la comunidad, lanza excepción
+        if not Comunidad.objects.filter(pk=idComunidad).exists():
+            raise NotFoundError(f"Comunidad con id {idComunidad} no encontrada.")
+
         # Devuelve el DTO con la lista de palabras
-        return PalabrasVetadasDTO(palabras=lista_palabras)
+        return PalabrasVetadasDTO(palabras=PalabrasVetadasDAO._get_lista(idComunidad))
 
     @staticmethod
     def add_palabras_vetadas(idComunidad: int, nuevas_palabras: List[str]) -> PalabrasVetadasDTO:
         """
         Añade nuevas palabras vetadas a una comunidad específica.
+        Se insertan todas en una sola sentencia; las que ya estaban vetadas se ignoran.
         """
-        
-        comunidad = Comunidad.objects.get(pk=idComunidad)
-        # Obtenemos las palabras vetadas actuales
-        actuales = PalabrasVetadasDAO._string_to_list(comunidad.palabrasVetadas)
-        
-        # Usamos un set para evitar duplicados y añadimos las nuevas
-        conjunto_actualizado = set(actuales)
-        # Se eliminan los espacios para evitar problemas
-        nuevas_limpias = [p.strip() for p in nuevas_palabras if p.strip()]
-        # Actualizamos el conjunto con las nuevas palabras limpias
-        conjunto_actualizado.update(nuevas_limpias)
-        
-        lista_final = list(conjunto_actualizado)
-        
-        # Guardamos en BD como string
-        comunidad.palabrasVetadas = PalabrasVetadasDAO._list_to_string(lista_final)
-        comunidad.save()
-        
-        return PalabrasVetadasDTO(palabras=lista_final)
+        nuevas_limpias = PalabrasVetadasDAO._limpiar(nuevas_palabras)
+
+        with basedatos.escritura():
+            PalabrasVetadasDAO._marcar_cambio(idComunidad)
+            PalabraVetada.objects.bulk_create(
+                [PalabraVetada(idComunidad_id=idComunidad, palabra=p) for p in nuevas_limpias],
+                ignore_conflicts=True
+            )
+        MotorModeracion.invalidar(idComunidad)
+
+        return PalabrasVetadasDTO(palabras=PalabrasVetadasDAO._get_lista(idComunidad))
 
     @staticmethod
     def eliminar_palabras_vetadas(idComunidad: int, palabras_borrar: List[str]) -> PalabrasVetadasDTO:
         """
-        Elimina palabras vetadas específicas de una comunidad.
+        Elimina palabras vetadas específicas de una comunidad (en una sola sentencia DELETE).
         """
-        comunidad = Comunidad.objects.get(pk=idComunidad)
-        actuales = PalabrasVetadasDAO._string_to_list(comunidad.palabrasVetadas)
-        
-        # Filtramos: nos quedamos con las que NO estén en la lista de borrar
-        borrar = set(p.strip() for p in palabras_borrar)
-        lista_final = [p for p in actuales if p.strip() not in borrar]
-        
-        comunidad.palabrasVetadas = PalabrasVetadasDAO._list_to_string(lista_final)
-        comunidad.save()
-        
-        return PalabrasVetadasDTO(palabras=lista_final)
+        borrar = [p.strip() for p in palabras_borrar if p and p.strip()]
+
+        with basedatos.escritura():
+            PalabrasVetadasDAO._marcar_cambio(idComunidad)
+            PalabraVetada.objects.filter(idComunidad_id=idComunidad, palabra__in=borrar).delete()
+        MotorModeracion.invalidar(idComunidad)
+
+        return PalabrasVetadasDTO(palabras=PalabrasVetadasDAO._get_lista(idComunidad))
 
     @staticmethod
     def modificar_palabras_vetadas(idComunidad: int, nueva_lista_completa: List[str]) -> PalabrasVetadasDTO:
         """
         Modifica la lista completa de palabras vetadas de una comunidad.
+        Solo se borran las que ya no están y se insertan las nuevas.
         """
-        comunidad = Comunidad.objects.get(pk=idComunidad)
-        
-        # Preparamos la nueva lista para sustituir la anterior
-        lista_limpia = [p.strip() for p in nueva_lista_completa if p.strip()]
-        
-        comunidad.palabrasVetadas = PalabrasVetadasDAO._list_to_string(lista_limpia)
-        comunidad.save()
-        
-        return PalabrasVetadasDTO(palabras=lista_limpia)
\ No newline at end of file
+        lista_limpia = PalabrasVetadasDAO._limpiar(nueva_lista_completa)
+
+        with basedatos.escritura():
+            PalabrasVetadasDAO._marcar_cambio(idComunidad)
+            PalabraVetada.objects.filter(idComunidad_id=idComunidad).exclude(palabra__in=lista_limpia).delete()
+            PalabraVetada.objects.bulk_create(
+                [PalabraVetada(idComunidad_id=idComunidad, palabra=p) for p in lista_limpia],
+                ignore_conflicts=True
+            )
+        MotorModeracion.invalidar(idComunidad)
+
+        return PalabrasVetadasDTO(palabras=PalabrasVetadasDAO._get_lista(idComunidad))
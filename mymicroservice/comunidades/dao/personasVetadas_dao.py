@@ -1,4 +1,6 @@
 from typing import List
+from comunidades import basedatos, etags
+from comunidades.admision import admision
 from comunidades.models import PersonasVetadas
 from comunidades.dto.personasVetadas_dto import PersonaVetadaDTO
 from comunidades.dao.miembro_dao import MiembroDAO
@@ -37,21 +39,25 @@ class PersonasVetadasDAO:
         # Verificamos si ya está vetado para evitar error 500 por duplicado
         if PersonasVetadas.objects.filter(idComunidad_id=comunidad, idUsuario=usuario).exists():
              raise AlreadyExistsError(f"El usuario {usuario} ya está vetado en esta comunidad.")
-             
-        # Si no existe, creamos el veto
-        nuevo_veto = PersonasVetadas.objects.create(
-            idComunidad_id=comunidad,
-            idUsuario=usuario
-        )
         
-        # 3. Echar al miembro (Kick)
-        try:
-            # Eliminamos al miembro de la comunidad (si está en ella)
-            MiembroDAO.eliminar_miembro(comunidad, usuario)
-            print(f"INFO: Usuario {usuario} expulsado de la comunidad al ser vetado.")
-        except NotFoundError:
-            # Si el usuario no era miembro, no pasa nada
-            pass
+        # El veto y la expulsión (con su contador de miembros) van en la misma transacción
+        with basedatos.escritura():
+            # Si no existe, creamos el veto
+            nuevo_veto = PersonasVetadas.objects.create(
+                idComunidad_id=comunidad,
+                idUsuario=usuario
+            )
+            etags.marcar_cambio(comunidad)
+            admision.cambio(comunidad, vetados_añadidos=[usuario])
+            
+            # 3. Echar al miembro (Kick)
+            try:
+                # Eliminamos al miembro de la comunidad (si está en ella)
+                MiembroDAO.eliminar_miembro(comunidad, usuario)
+                print(f"INFO: Usuario {usuario} expulsado de la comunidad al ser vetado.")
+            except NotFoundError:
+                # Si el usuario no era miembro, no pasa nada
+                pass
         
         # Se devuelve el DTO del nuevo veto
         return PersonasVetadasDAO._to_dto(nuevo_veto)
@@ -61,7 +67,10 @@ class PersonasVetadasDAO:
         try:
             # Intentamos obtener el veto especificado para eliminarlo
             veto = PersonasVetadas.objects.get(idComunidad_id=comunidad, idUsuario=usuario)
-            veto.delete()
+            with basedatos.escritura():
+                veto.delete()
+                etags.marcar_cambio(comunidad)
+                admision.cambio(comunidad, vetados_quitados=[usuario])
             
             # Si no se encuetra el veto, se lanza una excepción
         except PersonasVetadas.DoesNotExist:
@@ -1,76 +1,275 @@
-from typing import List
+import functools
+from typing import Iterator, List
+from django.db import connection
+from django.conf import settings
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+from comunidades import basedatos
+from comunidades.admision import admision
+from comunidades.buffer_megusta import BufferMeGusta, buffer
 from comunidades.models import PublicacionMeGusta, Publicacion, ComunidadMiembros
 from comunidades.dto.publicacionMeGusta_dto import PublicacionMeGustaDTO
-from comunidades.exceptions import ExternalServiceError, NotFoundError, AlreadyExistsError, MissingParameterError, BusinessRuleError
+from comunidades.dto.estadoMeGusta_dto import EstadoMeGustaDTO
+from comunidades.exceptions import ExternalServiceError, NotFoundError, AlreadyExistsError, MissingParameterError, BusinessRuleError, InvalidParameterError
 
 class PublicacionMeGustaDAO:
 
+    # Columnas de PublicacionMeGusta en el orden de los campos de PublicacionMeGustaDTO
+    CAMPOS_DTO = ('idPublicacion_id', 'idUsuario', 'fechaMeGusta')
+    # Filas que se leen de la base de datos en cada bloque al listar los me gusta
+    TAM_BLOQUE = 2000
+
     @staticmethod
-    def _to_dto(modelo: PublicacionMeGusta) -> PublicacionMeGustaDTO:
-        return PublicacionMeGustaDTO(
-            idPublicacion=modelo.idPublicacion_id, # Accedemos al ID de la publicacion
-            idUsuario=modelo.idUsuario,
-            fechaMeGusta=modelo.fechaMeGusta
-        )
+    @functools.cache
+    def _sql() -> dict:
+        """
+        Sentencias SQL de dar y quitar me gusta (con los nombres de tablas y columnas de los modelos).
+        - 'insertar': inserta el me gusta solo si el usuario es miembro de la comunidad de la publicación
+          (comprobación e inserción en la misma sentencia) y no hace nada si ya existía.
+        - 'sumar': suma (o resta) al contador de la publicación y devuelve el contador nuevo.
+        - 'estado': contador, si el usuario es miembro y si ya le había dado me gusta.
+        """
+        # ON CONFLICT y RETURNING: PostgreSQL o SQLite 3.35 o posterior (comprobado al arrancar, ver basedatos)
+        columna = basedatos.columna
+        nombres = {
+            'megusta': basedatos.tabla(PublicacionMeGusta),
+            'l_publicacion': columna(PublicacionMeGusta, 'idPublicacion'),
+            'l_usuario': columna(PublicacionMeGusta, 'idUsuario'),
+            'l_fecha': columna(PublicacionMeGusta, 'fechaMeGusta'),
+            'publicacion': basedatos.tabla(Publicacion),
+            'p_id': columna(Publicacion, 'idPublicacion'),
+            'p_comunidad': columna(Publicacion, 'idComunidad'),
+            'p_megusta': columna(Publicacion, 'meGusta'),
+            'miembros': basedatos.tabla(ComunidadMiembros),
+            'm_comunidad': columna(ComunidadMiembros, 'idComunidad'),
+            'm_usuario': columna(ComunidadMiembros, 'idUsuario'),
+        }
+        return {
+            # El WHERE es obligatorio en SQLite para que el ON CONFLICT no se confunda con el ON del JOIN
+            'insertar': """
+                INSERT INTO {megusta} ({l_publicacion}, {l_usuario}, {l_fecha})
+                SELECT p.{p_id}, m.{m_usuario}, %s
+                FROM {publicacion} p JOIN {miembros} m ON m.{m_comunidad} = p.{p_comunidad}
+                WHERE p.{p_id} = %s AND m.{m_usuario} = %s
+                ON CONFLICT ({l_publicacion}, {l_usuario}) DO NOTHING
+            """.format(**nombres),
+            'sumar': """
+                UPDATE {publicacion}
+                SET {p_megusta} = CASE WHEN {p_megusta} + %s < 0 THEN 0 ELSE {p_megusta} + %s END
+                WHERE {p_id} = %s
+                RETURNING {p_megusta}
+            """.format(**nombres),
+            'estado': """
+                SELECT p.{p_megusta}, EXISTS(
+                    SELECT 1 FROM {miembros} m WHERE m.{m_comunidad} = p.{p_comunidad} AND m.{m_usuario} = %s
+                ), EXISTS(
+                    SELECT 1 FROM {megusta} l WHERE l.{l_publicacion} = p.{p_id} AND l.{l_usuario} = %s
+                )
+                FROM {publicacion} p WHERE p.{p_id} = %s
+            """.format(**nombres),
+        }
+
+    @staticmethod
+    def _sumar(cursor, id_publicacion: int, cantidad: int) -> int:
+        """
+        Suma 'cantidad' al contador de me gustas de la publicación (sin bajar de 0) y devuelve el contador nuevo.
+        No se toca la fila de la comunidad: el ETag del feed ya incluye los contadores de la página.
+        """
+        cursor.execute(PublicacionMeGustaDAO._sql()['sumar'], [cantidad, cantidad, id_publicacion])
+        return cursor.fetchone()[0]
+
+    @staticmethod
+    def _contador_sin_cambios(cursor, id_publicacion: int, id_usuario: int, exigir_miembro: bool) -> int:
+        """
+        Devuelve el contador de una publicación cuando el me gusta no ha cambiado.
+        Si la publicación no existe (o el usuario no es miembro y se exige), LANZA UNA EXCEPCIÓN.
+        """
+        meGusta, es_miembro, _ = PublicacionMeGustaDAO._estado(cursor, id_publicacion, id_usuario)
+        if exigir_miembro and not es_miembro:
+            raise BusinessRuleError(f"ACCESO DENEGADO: El usuario {id_usuario} no es miembro de esta comunidad.")
+        return meGusta
 
     @staticmethod
-    def dar_megusta(id_publicacion: int, id_usuario: int) -> PublicacionMeGustaDTO:
+    def _estado(cursor, id_publicacion: int, id_usuario: int) -> tuple:
         """
-        Crea un registro de 'Me Gusta', verificando antes si es miembro.
+        Devuelve (contador, es miembro, le gusta) para la publicación y el usuario.
+        Si la publicación no existe, LANZA UNA EXCEPCIÓN.
         """
-        
-        # 1. Primero buscamos la publicación para saber a qué comunidad pertenece
-        try:
-            publicacion = Publicacion.objects.get(idPublicacion=id_publicacion)
-        except Publicacion.DoesNotExist:
+        cursor.execute(PublicacionMeGustaDAO._sql()['estado'], [id_usuario, id_usuario, id_publicacion])
+        fila = cursor.fetchone()
+        if fila is None:
             raise NotFoundError(f"La publicación {id_publicacion} no existe.")
+        return fila
+
+    @staticmethod
+    def _anotar_en_buffer(id_publicacion: int, id_usuario: int, le_gusta: bool) -> int:
+        """
+        Modo MEGUSTA_BUFFER: comprueba con una sola lectura la publicación, si el usuario es miembro
+        y si ya le había dado me gusta, anota la operación en el buffer (se escribirá en el siguiente volcado)
+        y devuelve el contador contando las operaciones pendientes.
+        """
+        id_usuario = int(id_usuario)
+        def consulta():
+            with connection.cursor() as cursor:
+                return PublicacionMeGustaDAO._estado(cursor, id_publicacion, id_usuario)
 
-        # 2. VERIFICACIÓN: ¿Es este usuario miembro de esa comunidad?
-        es_miembro = ComunidadMiembros.objects.filter(
-            idComunidad_id=publicacion.idComunidad_id, # Usamos _id para comparar rápido
-            idUsuario=id_usuario
-        ).exists()
+        def combinar(fila, pendientes):
+            meGusta, es_miembro, guardado = fila
+            if le_gusta and not es_miembro:
+                raise BusinessRuleError(f"ACCESO DENEGADO: El usuario {id_usuario} no es miembro de esta comunidad.")
+            BufferMeGusta.anotar(pendientes, (id_publicacion, id_usuario), le_gusta, guardado)
+            return max(meGusta + BufferMeGusta.diferencia(pendientes, id_publicacion), 0)
 
-        # 3. Si no es miembro, lanzamos un error y bloqueamos el like
-        if not es_miembro:
-             raise BusinessRuleError(f"ACCESO DENEGADO: El usuario {id_usuario} no es miembro de esta comunidad.")
+        total = buffer.consultar(consulta, combinar)
+        buffer.avisar()
+        return total
 
-        # 4. Si pasa el control, creamos el like
-        nuevo_like = PublicacionMeGusta.objects.create(
-            idPublicacion_id=id_publicacion, 
-            idUsuario=id_usuario
-        )
-        return PublicacionMeGustaDAO._to_dto(nuevo_like)
+    @staticmethod
+    def dar_megusta(id_publicacion: int, id_usuario: int) -> int:
+        """
+        Da 'Me Gusta' a una publicación (si el usuario es miembro de su comunidad) y devuelve el contador nuevo.
+        Es idempotente: si ya le había dado me gusta no cambia nada y devuelve el contador actual.
+        Todo se hace en una transacción: la comprobación de miembro y la inserción son una sola sentencia
+        (sin huecos entre comprobar e insertar) y el contador se actualiza y se lee con la misma sentencia.
+        Con MEGUSTA_BUFFER la operación se anota en el buffer y se escribe después, por lotes.
+        Con ADMISION_CACHE los que no son miembros se rechazan en memoria, sin abrir la transacción de escritura
+        (a los miembros los sigue comprobando la base de datos en la propia inserción).
+        """
+        if admision.es_miembro_publicacion(id_publicacion, id_usuario) is False:
+            raise BusinessRuleError(f"ACCESO DENEGADO: El usuario {id_usuario} no es miembro de esta comunidad.")
+        if settings.MEGUSTA_BUFFER:
+            return PublicacionMeGustaDAO._anotar_en_buffer(id_publicacion, id_usuario, True)
+
+        fecha = PublicacionMeGusta._meta.get_field('fechaMeGusta').get_db_prep_value(timezone.now(), connection)
+        with basedatos.escritura(), connection.cursor() as cursor:
+            cursor.execute(PublicacionMeGustaDAO._sql()['insertar'], [fecha, id_publicacion, id_usuario])
+            if cursor.rowcount == 1:
+                return PublicacionMeGustaDAO._sumar(cursor, id_publicacion, 1)
+            # No se ha insertado: ya tenía el me gusta, no es miembro o la publicación no existe
+            return PublicacionMeGustaDAO._contador_sin_cambios(cursor, id_publicacion, id_usuario, exigir_miembro=True)
 
     @staticmethod
-    def quitar_megusta(id_publicacion: int, id_usuario: int):
+    def quitar_megusta(id_publicacion: int, id_usuario: int) -> int:
         """
-        Borra el registro de 'Me Gusta'.
+        Quita el 'Me Gusta' del usuario y devuelve el contador nuevo.
+        Es idempotente: si no le había dado me gusta no cambia nada y devuelve el contador actual.
+        Con MEGUSTA_BUFFER la operación se anota en el buffer y se escribe después, por lotes.
         """
-        try:
-            like = PublicacionMeGusta.objects.get(
+        if settings.MEGUSTA_BUFFER:
+            return PublicacionMeGustaDAO._anotar_en_buffer(id_publicacion, id_usuario, False)
+
+        with basedatos.escritura(), connection.cursor() as cursor:
+            borrados, _ = PublicacionMeGusta.objects.filter(
                 idPublicacion_id=id_publicacion, 
                 idUsuario=id_usuario
-            )
-            like.delete()
-        except PublicacionMeGusta.DoesNotExist:
-            raise NotFoundError(f"El usuario {id_usuario} no le ha dado 'Me Gusta' a la publicación {id_publicacion}.")
-            
+            ).delete()
+            if borrados:
+                # Restamos 1 al contador en la misma transacción
+                return PublicacionMeGustaDAO._sumar(cursor, id_publicacion, -1)
+            return PublicacionMeGustaDAO._contador_sin_cambios(cursor, id_publicacion, id_usuario, exigir_miembro=False)
+
     @staticmethod
     def contar_likes(id_publicacion: int) -> int:
         """
         Devuelve el número total de likes de una publicación.
         (Útil para devolver el contador actualizado)
+        Se lee el contador guardado en la publicación, sin contar sus likes
+        (más los pendientes del buffer, con MEGUSTA_BUFFER).
         """
-        return PublicacionMeGusta.objects.filter(idPublicacion_id=id_publicacion).count()
+        def consulta():
+            return Publicacion.objects.filter(idPublicacion=id_publicacion).values_list('meGusta', flat=True).first() or 0
+
+        if not settings.MEGUSTA_BUFFER:
+            return consulta()
+        return buffer.consultar(consulta, lambda total, pendientes: max(total + BufferMeGusta.diferencia(pendientes, id_publicacion), 0))
     
     @staticmethod
     def get_likes_de_publicacion(id_publicacion: int) -> List[PublicacionMeGustaDTO]:
         """
         Devuelve la lista de todos los usuarios que dieron like a una publicación.
+        Los DTO se construyen directamente con las filas (tuplas) de la consulta, sin crear los modelos,
+        y se leen por bloques con iterator() para no guardar además todas las filas en la caché del QuerySet.
+        """
+        def consulta():
+            # Busamos por el ID de la publicación (usando _id para el string)
+            filas = PublicacionMeGusta.objects.filter(idPublicacion_id=id_publicacion) \
+                .values_list(*PublicacionMeGustaDAO.CAMPOS_DTO).iterator(chunk_size=PublicacionMeGustaDAO.TAM_BLOQUE)
+
+            # Cada fila tiene los campos en el orden del DTO
+            return [PublicacionMeGustaDTO(*fila) for fila in filas]
+
+        def combinar(likes, pendientes):
+            # Con MEGUSTA_BUFFER: se quitan los que se han quitado y se añaden los nuevos, aún sin volcar
+            operaciones = BufferMeGusta.de_publicacion(pendientes, id_publicacion)
+            if not operaciones:
+                return likes
+            likes = [l for l in likes if l.idUsuario not in operaciones]
+            likes.extend(PublicacionMeGustaDTO(id_publicacion, u, fecha) for u, (le_gusta, fecha) in operaciones.items() if le_gusta)
+            return likes
+
+        if not settings.MEGUSTA_BUFFER:
+            return consulta()
+        return buffer.consultar(consulta, combinar)
+
+    @staticmethod
+    def iterar_likes_de_publicacion(id_publicacion: int) -> Iterator[PublicacionMeGustaDTO]:
         """
-        # Busamos por el ID de la publicación (usando _id para el string)
-        likes = PublicacionMeGusta.objects.filter(idPublicacion_id=id_publicacion)
-        
-        # Convertimos cada modelo a su DTO
-        return [PublicacionMeGustaDAO._to_dto(l) for l in likes]
\ No newline at end of file
+        Recorre los me gusta de una publicación sin cargarlos todos en memoria (para las exportaciones en streaming):
+        se leen de la BD por bloques con iterator().
+        Con MEGUSTA_BUFFER se aplican las operaciones pendientes de la publicación al empezar.
+        """
+        operaciones = {}
+        if settings.MEGUSTA_BUFFER:
+            operaciones = buffer.consultar(lambda: None, lambda _, pendientes: BufferMeGusta.de_publicacion(pendientes, id_publicacion))
+
+        filas = PublicacionMeGusta.objects.filter(idPublicacion_id=id_publicacion) \
+            .values_list(*PublicacionMeGustaDAO.CAMPOS_DTO).iterator(chunk_size=PublicacionMeGustaDAO.TAM_BLOQUE)
+        for fila in filas:
+            # Los usuarios con operaciones pendientes se escriben al final (aunque se vuelquen mientras tanto)
+            if fila[1] not in operaciones:
+                yield PublicacionMeGustaDTO(*fila)
+        for idUsuario, (le_gusta, fecha) in operaciones.items():
+            if le_gusta:
+                yield PublicacionMeGustaDTO(id_publicacion, idUsuario, fecha)
+
+    @staticmethod
+    def get_estado_megusta(id_usuario: int, ids_publicaciones: List[int]) -> EstadoMeGustaDTO:
+        """
+        Devuelve, de una lista de publicaciones (por ejemplo, una página del feed), a cuáles ha dado me gusta
+        el usuario y el contador de me gustas de cada una.
+        Se resuelve en una sola consulta: las publicaciones por clave primaria y, para cada una, si existe
+        el me gusta del usuario (búsqueda por el índice (idUsuario, idPublicacion)).
+        Las publicaciones que no existen no aparecen en la respuesta.
+        """
+        if not id_usuario:
+            raise MissingParameterError("Falta idUsuario")
+        ids = list(dict.fromkeys(ids_publicaciones))
+        if len(ids) > settings.PAGINACION_LIMITE_MAXIMO:
+            raise InvalidParameterError(f"Como máximo se pueden consultar {settings.PAGINACION_LIMITE_MAXIMO} publicaciones a la vez.")
+
+        le_gusta = PublicacionMeGusta.objects.filter(idUsuario=id_usuario, idPublicacion=OuterRef('pk'))
+        def consulta():
+            return list(Publicacion.objects.filter(idPublicacion__in=ids)
+                        .annotate(leGusta=Exists(le_gusta)).values_list('idPublicacion', 'meGusta', 'leGusta'))
+
+        def combinar(filas, pendientes):
+            # Con MEGUSTA_BUFFER: contadores y me gustas del usuario contando las operaciones sin volcar
+            return [
+                (idPublicacion, max(meGusta + BufferMeGusta.diferencia(pendientes, idPublicacion), 0),
+                 pendientes.get((idPublicacion, id_usuario), (leGusta,))[0])
+                for idPublicacion, meGusta, leGusta in filas
+            ]
+
+        filas = buffer.consultar(consulta, combinar) if settings.MEGUSTA_BUFFER else consulta()
+        contadores = {}
+        gustadas = set()
+        for idPublicacion, meGusta, leGusta in filas:
+            contadores[idPublicacion] = meGusta
+            if leGusta:
+                gustadas.add(idPublicacion)
+        # Se mantiene el orden en que se pidieron las publicaciones
+        return EstadoMeGustaDTO(
+            idUsuario=id_usuario,
+            meGustan=[i for i in ids if i in gustadas],
+            meGusta={i: contadores[i] for i in ids if i in contadores}
+        )
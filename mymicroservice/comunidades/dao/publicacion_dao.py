@@ -1,7 +1,11 @@
-from comunidades.models import Publicacion
+from django.db.models import F
+from django.db.models.functions import Greatest
+from comunidades.models import Comunidad, Publicacion
 from comunidades.dto.publicacion_dto import PublicacionDTO
-from typing import List
-from django.db.models import Count
+from typing import List, Optional, Tuple
+from comunidades import basedatos, etags, paginacion
+from comunidades.cache import CatalogoCache
+from comunidades.moderacion import MotorModeracion
 from comunidades.exceptions import ExternalServiceError, NotFoundError, AlreadyExistsError, MissingParameterError, BusinessRuleError
 
 class PublicacionDAO:
@@ -11,30 +15,35 @@ class PublicacionDAO:
         """
         Convierte un modelo Publicacion a PublicacionDTO.
         """
-        # Contamos el número de me gustas
-        likes = getattr(modelo, 'meGusta', modelo.publicacionmegusta_set.count())
-
         return PublicacionDTO(
             idPublicacion=modelo.idPublicacion,
-            idComunidad=modelo.idComunidad.idComunidad, # Accedemos al ID del objeto comunidad
+            idComunidad=modelo.idComunidad_id, # Usamos _id para no cargar el objeto comunidad
             titulo=modelo.titulo,
             contenido=modelo.contenido,
             rutaFichero=modelo.rutaFichero,
             fecha=modelo.fechaPublicacion,
-            meGusta=likes
+            meGusta=modelo.meGusta # Contador guardado en la publicación
         )
 
     @staticmethod
-    def get_publicaciones_comunidad(idComunidad: int) -> List[PublicacionDTO]:
+    def get_publicaciones_paginadas(idComunidad: int, limite: int, cursor: Optional[str] = None) -> Tuple[List[PublicacionDTO], Optional[str]]:
         '''
-        Devuelve una lista de las publicaciones de una comunidad específica.
+        Devuelve una página de publicaciones de la comunidad (de la más reciente a la más antigua)
+        y el cursor de la página siguiente (None si no hay más).
         '''
-        
-        # se cuentan los me gusta únicamente en las publicaciones de esta comunidad
-        publicaciones = Publicacion.objects.filter(idComunidad_id=idComunidad).annotate(
-            num_megusta=Count('publicacionmegusta')
-        )
-        return [PublicacionDAO._to_dto(p) for p in publicaciones]
+        publicaciones = Publicacion.objects.filter(idComunidad_id=idComunidad)
+        pagina, siguiente = paginacion.paginar(publicaciones, 'fechaPublicacion', 'idPublicacion', limite, cursor)
+        return [PublicacionDAO._to_dto(p) for p in pagina], siguiente
+
+    @staticmethod
+    def huella_pagina(idComunidad: int, limite: int, cursor: Optional[str] = None) -> str:
+        '''
+        Ids y contadores de me gusta de una página del feed, para el ETag del listado
+        (los me gusta no cambian la versión de la comunidad). Solo lee esas columnas de las filas de la página.
+        '''
+        filas = Publicacion.objects.filter(idComunidad_id=idComunidad).values('fechaPublicacion', 'idPublicacion', 'meGusta')
+        pagina, _ = paginacion.paginar(filas, 'fechaPublicacion', 'idPublicacion', limite, cursor)
+        return ','.join(f"{f['idPublicacion']}:{f['meGusta']}" for f in pagina)
 
     @staticmethod
     def get_publicacion_especifica(publicacion: int) -> PublicacionDTO:
@@ -42,9 +51,7 @@ class PublicacionDAO:
         Devuelve una publicación específica por su ID.
         """
         try:
-            p = Publicacion.objects.annotate(
-                num_megusta=Count('publicacionmegusta')
-            ).get(idPublicacion=publicacion)
+            p = Publicacion.objects.get(idPublicacion=publicacion)
             return PublicacionDAO._to_dto(p)
         except Publicacion.DoesNotExist:
             raise NotFoundError(f"Publicación {publicacion} no encontrada")
@@ -55,6 +62,9 @@ class PublicacionDAO:
         Crea una nueva publicación en una comunidad específica.
         """
         
+        # Comprobamos que el texto no contiene palabras vetadas en la comunidad
+        MotorModeracion.comprobar_textos(idComunidad, datos.get('titulo'), datos.get('contenido'))
+        
         # Traducimos nombres del DTO -> Modelo
         datos_modelo = {
             'idComunidad_id': idComunidad, # _id para pasar el id directamente y no el objeto comunidad
@@ -63,7 +73,9 @@ class PublicacionDAO:
             'rutaFichero': datos.get('rutaFichero')
         }
         
-        nuevaPublicacion = Publicacion.objects.create(**datos_modelo)
+        with basedatos.escritura():
+            nuevaPublicacion = Publicacion.objects.create(**datos_modelo)
+            PublicacionDAO._sumar_publicaciones(idComunidad, 1)
         return PublicacionDAO._to_dto(nuevaPublicacion)
     
     @staticmethod
@@ -81,10 +93,15 @@ class PublicacionDAO:
             publicacion.contenido = datos.get('contenido', publicacion.contenido)
             publicacion.rutaFichero = datos.get('rutaFichero', publicacion.rutaFichero)
             
-            # 3. Guardamos cambios en BD
-            publicacion.save()
+            # 3. Comprobamos que el nuevo texto no contiene palabras vetadas en la comunidad
+            MotorModeracion.comprobar_textos(publicacion.idComunidad_id, publicacion.titulo, publicacion.contenido)
+            
+            # 4. Guardamos cambios en BD (solo los campos editables, para no pisar el contador de me gusta)
+            with basedatos.escritura():
+                publicacion.save(update_fields=['titulo', 'contenido', 'rutaFichero'])
+                etags.marcar_cambio(publicacion.idComunidad_id)
             
-            # 4. Devolvemos el DTO actualizado
+            # 5. Devolvemos el DTO actualizado
             return PublicacionDAO._to_dto(publicacion)
             
         except Publicacion.DoesNotExist:
@@ -96,7 +113,24 @@ class PublicacionDAO:
         Elimina una publicación específica por su ID.
         """
         try:
-            p = Publicacion.objects.get(idPublicacion=publicacion)
-            p.delete()
+            with basedatos.escritura():
+                p = Publicacion.objects.get(idPublicacion=publicacion)
+                idComunidad = p.idComunidad_id
+                p.delete()
+                PublicacionDAO._sumar_publicaciones(idComunidad, -1)
         except Publicacion.DoesNotExist:
              raise NotFoundError(f"Publicación {publicacion} no encontrada")
+
+    @staticmethod
+    def _sumar_publicaciones(idComunidad: int, cantidad: int):
+        """
+        Actualiza el contador de publicaciones de la comunidad (con F() para que sea atómico en la BD; nunca baja de 0).
+        Debe llamarse dentro de la misma transacción que la creación o el borrado.
+        En la misma sentencia aumenta la versión de contenido de la comunidad (para los ETags)
+        y también invalida las respuestas cacheadas del catálogo (cambia el contador).
+        """
+        Comunidad.objects.filter(idComunidad=idComunidad).update(
+            numPublicaciones=Greatest(F('numPublicaciones') + cantidad, 0),
+            versionContenido=F('versionContenido') + 1
+        )
+        CatalogoCache.invalidar()
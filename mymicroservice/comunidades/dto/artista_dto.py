@@ -1,7 +1,7 @@
 from dataclasses import dataclass
 from .genero_dto import GeneroDTO
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class ArtistaDTO:
     idArtista: int
     nombreUsuario: str
@@ -9,3 +9,4 @@ class ArtistaDTO:
     esNovedad: bool
     oyentes: int
     genero: GeneroDTO | None # hace referencia a un objeto Genero
+    partial: bool = False # True si no se pudo obtener del servicio de usuarios (datos de la caché caducada o solo el id)
@@ -2,7 +2,7 @@ from dataclasses import dataclass
 from datetime import datetime
 from .artista_dto import ArtistaDTO
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class ComunidadDTO:
     idComunidad: int
     artista: ArtistaDTO # se pasa el objeto ARTISTA completo
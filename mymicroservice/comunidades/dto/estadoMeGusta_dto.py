@@ -0,0 +1,7 @@
+from dataclasses import dataclass
+
+@dataclass(slots=True, frozen=True)
+class EstadoMeGustaDTO:
+    idUsuario: int
+    meGustan: list[int] # publicaciones (de las pedidas) a las que el usuario ha dado me gusta
+    meGusta: dict[int, int] # contador de me gustas de cada publicación pedida que existe
@@ -1,6 +1,6 @@
 from dataclasses import dataclass
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class GeneroDTO:
     id: str | None # puede ser nulo
     nombre: str | None # puede ser nulo
\ No newline at end of file
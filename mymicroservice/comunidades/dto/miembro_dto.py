@@ -1,8 +1,9 @@
 from dataclasses import dataclass
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class MiembroDTO:
     idUsuario: int
     nombreUsuario: str
     esArtista: bool
-    rutaFoto: str | None # puede ser nulo
\ No newline at end of file
+    rutaFoto: str | None # puede ser nulo
+    partial: bool = False # True si no se pudo obtener del servicio de usuarios (datos de la caché caducada o solo el id)
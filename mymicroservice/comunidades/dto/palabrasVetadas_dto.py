@@ -1,6 +1,6 @@
 from dataclasses import dataclass
 from typing import List
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class PalabrasVetadasDTO:
     palabras: List[str]
\ No newline at end of file
@@ -1,7 +1,7 @@
 from dataclasses import dataclass
 from datetime import datetime
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class PublicacionMeGustaDTO:
     idPublicacion: int
     idUsuario: int
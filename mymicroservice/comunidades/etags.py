@@ -0,0 +1,107 @@
+import functools
+import hashlib
+from typing import Callable, Optional
+from django.db.models import F
+from django.utils.cache import patch_vary_headers
+from django.views.decorators.http import condition
+from comunidades.models import Comunidad
+
+# ETags de los listados de una comunidad (publicaciones, miembros y vetados).
+# Se calculan a partir de la versión de contenido de la comunidad, que aumenta con cada escritura
+# (publicaciones, miembros y vetos), así que basta una consulta de una sola fila
+# para saber si el cliente ya tiene la respuesta, sin construirla.
+# Los me gusta no tocan la fila de la comunidad (serían un bloqueo compartido por todos los me gusta):
+# el ETag del feed incluye además los contadores de la página pedida (ver 'huella' en etag_listado).
+
+def marcar_cambio(idComunidad: int):
+    """
+    Aumenta la versión de contenido de la comunidad.
+    Debe llamarse dentro de la misma transacción que la escritura.
+    """
+    Comunidad.objects.filter(pk=idComunidad).update(versionContenido=F('versionContenido') + 1)
+
+
+def etag_listado(recurso: str, huella: Callable = None) -> Callable:
+    """
+    Devuelve la función que calcula el ETag de un listado de la comunidad
+    (para usarla con el decorador condition de Django).
+    El ETag incluye los parámetros de la URL y el tipo de contenido negociado (?format= o Accept),
+    porque cada página, variante o formato (JSON, NDJSON, CSV...) es una respuesta distinta.
+    Si se indica, huella(request, idComunidad) devuelve lo que puede cambiar sin que cambie la versión
+    de la comunidad (como los contadores de me gusta de la página), que también se incluye en el ETag;
+    si devuelve None no hay ETag.
+    Si no hay comunidad en la URL o no existe, no hay ETag y la petición se atiende normalmente.
+    """
+    def calcular(request, idComunidad=None, *args, **kwargs) -> Optional[str]:
+        if not idComunidad or args or kwargs:
+            return None
+        version = Comunidad.objects.filter(pk=idComunidad).values_list('versionContenido', flat=True).first()
+        tipo = getattr(request, 'accepted_media_type', '')
+        if version is None or huella is None:
+            return _formatear(recurso, idComunidad, version, request, tipo)
+        extra = huella(request, idComunidad)
+        return None if extra is None else _formatear(recurso, idComunidad, version, request, tipo, extra)
+    return calcular
+
+
+def condicion_listado(recurso: str, huella: Callable = None) -> Callable:
+    """
+    Decorador para el GET de un listado: como condition(etag_func=etag_listado(recurso, huella)) de Django
+    (responde 304 si el cliente ya tiene la respuesta), pero el ETag solo se deja en las respuestas válidas
+    para volver a usarse (ver poner_etag), no en las de error ni en las degradadas (ver sin_validador).
+    Todas llevan 'Vary: Accept', porque el formato (y el ETag) depende de esa cabecera.
+    """
+    condicional = condition(etag_func=etag_listado(recurso, huella))
+
+    def decorador(vista):
+        vista_condicional = condicional(vista)
+
+        @functools.wraps(vista)
+        def envoltura(request, *args, **kwargs):
+            respuesta = vista_condicional(request, *args, **kwargs)
+            if not _admite_etag(respuesta):
+                respuesta.headers.pop('ETag', None)
+            patch_vary_headers(respuesta, ('Accept',))
+            return respuesta
+        return envoltura
+    return decorador
+
+
+def poner_etag(respuesta, etag: Optional[str]):
+    """
+    Pone el ETag a una respuesta de una vista async, solo si admite validarse con él (ver condicion_listado).
+    """
+    if etag and _admite_etag(respuesta):
+        respuesta.headers.setdefault('ETag', etag)
+    return respuesta
+
+
+def sin_validador(respuesta):
+    """
+    Marca una respuesta que no debe guardarse ni revalidarse con su ETag (Cache-Control: no-store),
+    como las que llevan datos en modo degradado: así el cliente no recibe un 304 para ellas
+    y la siguiente petición las obtiene completas.
+    """
+    respuesta['Cache-Control'] = 'no-store'
+    return respuesta
+
+
+def _admite_etag(respuesta) -> bool:
+    # Solo las respuestas correctas (y los 304 que las sustituyen), nunca las de error ni las marcadas con sin_validador
+    return respuesta.status_code in (200, 304) and 'no-store' not in respuesta.get('Cache-Control', '')
+
+
+async def aetag_listado(recurso: str, request, idComunidad: int, tipo: str = '') -> Optional[str]:
+    """
+    Versión asíncrona del cálculo del ETag de un listado (para las vistas async),
+    con el tipo de contenido negociado por la vista ('tipo').
+    """
+    version = await Comunidad.objects.filter(pk=idComunidad).values_list('versionContenido', flat=True).afirst()
+    return _formatear(recurso, idComunidad, version, request, tipo)
+
+
+def _formatear(recurso: str, idComunidad: int, version: Optional[int], request, tipo: str = '', extra: str = '') -> Optional[str]:
+    if version is None:
+        return None
+    parametros = hashlib.sha1(f'{request.GET.urlencode()}|{tipo}|{extra}'.encode()).hexdigest()[:16]
+    return f'{recurso}-{idComunidad}-{version}-{parametros}'
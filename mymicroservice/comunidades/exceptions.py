@@ -18,4 +18,13 @@ class NotFoundError(BusinessRuleError):
 
 class AlreadyExistsError(BusinessRuleError):
     """Se lanza cuando algo ya existe (ej: Usuario ya es miembro, Ya ha dado me gusta)."""
-    pass
\ No newline at end of file
+    pass
+
+class InvalidParameterError(BusinessRuleError):
+    """Se lanza cuando un parámetro tiene un valor no válido (ej: cursor de paginación corrupto)."""
+    pass
+
+
+class ContenidoVetadoError(BusinessRuleError):
+    """Se lanza cuando un texto contiene palabras vetadas en la comunidad (ej: título de una publicación)."""
+    pass
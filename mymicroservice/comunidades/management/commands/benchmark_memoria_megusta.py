@@ -0,0 +1,139 @@
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from comunidades import renderizado
+from comunidades.dao.publicacionMeGusta_dao import PublicacionMeGustaDAO
+from comunidades.models import Comunidad, Publicacion, PublicacionMeGusta
+
+
+@dataclass
+class _PublicacionMeGustaDTOAntiguo:
+    # PublicacionMeGustaDTO tal y como era antes (sin slots, con __dict__ por instancia)
+    idPublicacion: int
+    idUsuario: int
+    fechaMeGusta: datetime
+
+
+def _pico_rss_mb() -> float:
+    """
+    Pico de memoria residente del proceso en MB.
+    En Linux se lee VmHWM (ru_maxrss conserva el pico del proceso padre tras el fork).
+    """
+    try:
+        with open('/proc/self/status') as estado:
+            for linea in estado:
+                if linea.startswith('VmHWM:'):
+                    return int(linea.split()[1]) / 1024
+    except OSError:
+        pass
+    # ru_maxrss está en KB en Linux y en bytes en macOS
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pico / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+
+
+def _exportar_json(idPublicacion: int) -> int:
+    # La respuesta JSON del GET: la lista y el array JSON entero en memoria
+    likes = PublicacionMeGustaDAO.get_likes_de_publicacion(idPublicacion)
+    renderizado.serializar(likes)
+    return len(likes)
+
+
+def _exportar_ndjson(idPublicacion: int) -> int:
+    # ?format=ndjson: se escribe por trozos a medida que se lee
+    respuesta = renderizado.respuesta_streaming(
+        PublicacionMeGustaDAO.iterar_likes_de_publicacion(idPublicacion), 'ndjson', [], 'benchmark')
+    return sum(trozo.count(b'\n') for trozo in respuesta)
+
+
+class Command(BaseCommand):
+    help = ("Mide el pico de memoria (RSS) al exportar los me gusta de una publicación con N me gustas: "
+            "con modelos y DTO sin slots (antes), con filas de values_list() y DTO con slots (después), "
+            "la respuesta JSON completa y la exportación en streaming (?format=ndjson). "
+            "Los datos se crean en una base de datos SQLite temporal, nunca en la configurada.")
+
+    # Variable de entorno con la base de datos temporal: los pasos internos (--crear, --modo) solo se ejecutan sobre ella
+    VARIABLE_BASE = 'BENCHMARK_MEMORIA_MEGUSTA_DB'
+
+    # Cada modo devuelve el número de me gustas exportados
+    MODOS = {
+        # antes: un modelo por fila y un DTO con __dict__
+        'modelos': lambda idPublicacion: len([
+            _PublicacionMeGustaDTOAntiguo(l.idPublicacion_id, l.idUsuario, l.fechaMeGusta)
+            for l in PublicacionMeGusta.objects.filter(idPublicacion_id=idPublicacion)
+        ]),
+        # después: lo que hace el DAO
+        'filas': lambda idPublicacion: len(PublicacionMeGustaDAO.get_likes_de_publicacion(idPublicacion)),
+        'json': lambda idPublicacion: _exportar_json(idPublicacion),
+        'ndjson': lambda idPublicacion: _exportar_ndjson(idPublicacion),
+    }
+
+    def add_arguments(self, parser):
+        parser.add_argument('--n', type=int, default=1_000_000, help="Número de me gustas de la publicación (por defecto 1.000.000).")
+        parser.add_argument('--modo', choices=list(self.MODOS), help="Mide solo ese modo en este proceso (uso interno).")
+        parser.add_argument('--publicacion', type=int, help="Publicación ya creada que se usa con --modo.")
+        parser.add_argument('--crear', action='store_true', help="Crea los datos y escribe el id de la publicación (uso interno).")
+
+    def _medir(self, modo: str, idPublicacion: int):
+        """
+        Exporta los me gusta en este proceso y escribe el pico de RSS (antes y después de exportar).
+        """
+        connection.ensure_connection()
+        inicial = _pico_rss_mb()
+        likes = self.MODOS[modo](idPublicacion)
+        self.stdout.write(f"{modo}: {likes} me gustas, pico RSS {_pico_rss_mb():.1f} MB (al empezar {inicial:.1f} MB)")
+
+    @transaction.atomic
+    def _crear_datos(self, n: int) -> int:
+        comunidad = Comunidad.objects.create(idArtista=0, nombreComunidad='benchmark_memoria_megusta')
+        publicacion = Publicacion.objects.create(idComunidad=comunidad, titulo='benchmark', contenido='')
+        # Por bloques, para no tener todos los modelos en memoria a la vez
+        for inicio in range(0, n, 10000):
+            PublicacionMeGusta.objects.bulk_create(
+                [PublicacionMeGusta(idPublicacion=publicacion, idUsuario=i) for i in range(inicio, min(inicio + 10000, n))])
+        return publicacion.idPublicacion
+
+    def _comprobar_base_temporal(self):
+        """
+        Los pasos internos escriben o leen millones de filas: solo se permiten sobre la base de datos temporal
+        que prepara el comando (nunca sobre la configurada, que puede ser la de producción).
+        """
+        temporal = os.environ.get(self.VARIABLE_BASE)
+        if not temporal or str(connection.settings_dict['NAME']) != temporal:
+            raise CommandError("--crear y --modo son de uso interno: ejecuta el comando sin ellos.")
+
+    @staticmethod
+    def _ejecutar(entorno: dict, *argumentos: str) -> str:
+        """
+        Ejecuta manage.py en un proceso nuevo sobre la base de datos temporal y devuelve su salida.
+        """
+        salida = subprocess.run([sys.executable, str(settings.BASE_DIR / 'manage.py'), *argumentos],
+                                env=entorno, capture_output=True, text=True, check=True)
+        return salida.stdout.strip()
+
+    def handle(self, *args, **options):
+        if options['crear'] or options['modo']:
+            self._comprobar_base_temporal()
+            if options['crear']:
+                self.stdout.write(str(self._crear_datos(options['n'])))
+            else:
+                self._medir(options['modo'], options['publicacion'])
+            return
+
+        # Todo se hace en procesos nuevos sobre un fichero SQLite temporal, que se borra al terminar (aunque falle).
+        # Además, cada modo se mide en su propio proceso, porque el pico de RSS de un proceso nunca baja
+        with tempfile.TemporaryDirectory(prefix='benchmark_memoria_megusta_') as directorio:
+            base = str(Path(directorio) / 'benchmark.sqlite3')
+            entorno = {**os.environ, 'DB_ENGINE': 'sqlite', 'DB_NAME': base, self.VARIABLE_BASE: base}
+            self._ejecutar(entorno, 'migrate', '--noinput', '--verbosity', '0')
+            self.stdout.write(f"Creando una publicación con {options['n']} me gustas en {base}...")
+            idPublicacion = self._ejecutar(entorno, 'benchmark_memoria_megusta', '--crear', '--n', str(options['n']))
+            for modo in self.MODOS:
+                self.stdout.write(self._ejecutar(entorno, 'benchmark_memoria_megusta', '--modo', modo, '--publicacion', idPublicacion))
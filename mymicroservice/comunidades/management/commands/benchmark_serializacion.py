@@ -0,0 +1,47 @@
+import dataclasses
+import time
+from datetime import datetime, timezone
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+from comunidades import renderizado
+from comunidades.dto.publicacion_dto import PublicacionDTO
+
+
+class Command(BaseCommand):
+    help = "Mide lo que cuesta serializar N PublicacionDTO con dataclasses.asdict() + JSONRenderer (antes) y con el renderizado de DTO (después)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--n', type=int, default=10000, help="Número de publicaciones a serializar (por defecto 10000).")
+        parser.add_argument('--repeticiones', type=int, default=5, help="Repeticiones de cada medida (se queda la mejor).")
+
+    def _medir(self, funcion, repeticiones: int) -> float:
+        """
+        Devuelve el mejor tiempo (en milisegundos) de varias ejecuciones de la función.
+        """
+        mejor = float('inf')
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            funcion()
+            mejor = min(mejor, time.perf_counter() - inicio)
+        return mejor * 1000
+
+    def handle(self, *args, **options):
+        n = options['n']
+        fecha = datetime(2025, 1, 1, tzinfo=timezone.utc)
+        dtos = [
+            PublicacionDTO(idPublicacion=i, idComunidad=1, titulo=f'Publicación {i}', contenido='Texto de la publicación ' * 4,
+                           rutaFichero=None, fecha=fecha, meGusta=i % 100)
+            for i in range(n)
+        ]
+
+        medidas = {
+            'antes (asdict + JSONRenderer)': lambda: JSONRenderer().render([dataclasses.asdict(d) for d in dtos]),
+            'después (json)': lambda: renderizado.serializar(dtos, usar_orjson=False),
+        }
+        if renderizado.orjson is not None:
+            medidas['después (orjson)'] = lambda: renderizado.serializar(dtos)
+
+        self.stdout.write(f"Serialización de {n} PublicacionDTO (mejor de {options['repeticiones']}):")
+        for nombre, funcion in medidas.items():
+            ms = self._medir(funcion, options['repeticiones'])
+            self.stdout.write(f"  {nombre}: {ms:.1f} ms ({ms * 10000 / n:.1f} ms por 10k)")
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from comunidades.models import Comunidad, ComunidadMiembros, Publicacion
+
+
+class Command(BaseCommand):
+    help = "Comprueba (y corrige) los contadores de miembros y publicaciones de cada comunidad contando sus registros."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--solo-comprobar', action='store_true', help="Solo informa de las diferencias, sin corregirlas.")
+
+    def handle(self, *args, **options):
+        # Número real de miembros y publicaciones de cada comunidad (subconsultas)
+        miembros = ComunidadMiembros.objects.filter(idComunidad=OuterRef('pk')).order_by() \
+            .values('idComunidad').annotate(total=Count('pk')).values('total')
+        publicaciones = Publicacion.objects.filter(idComunidad=OuterRef('pk')).order_by() \
+            .values('idComunidad').annotate(total=Count('pk')).values('total')
+        usuarios_reales = Coalesce(Subquery(miembros, output_field=IntegerField()), 0)
+        publicaciones_reales = Coalesce(Subquery(publicaciones, output_field=IntegerField()), 0)
+
+        # Comunidades con algún contador descuadrado
+        descuadradas = Comunidad.objects.annotate(usuarios_reales=usuarios_reales, publicaciones_reales=publicaciones_reales) \
+            .filter(~Q(numUsuarios=F('usuarios_reales')) | ~Q(numPublicaciones=F('publicaciones_reales')))
+        diferencias = list(descuadradas.values_list('idComunidad', 'numUsuarios', 'usuarios_reales', 'numPublicaciones', 'publicaciones_reales'))
+
+        for idComunidad, usuarios, usuarios_contados, publis, publis_contadas in diferencias:
+            self.stdout.write(
+                f"Comunidad {idComunidad}: miembros {usuarios} (reales {usuarios_contados}), "
+                f"publicaciones {publis} (reales {publis_contadas})"
+            )
+
+        if diferencias and not options['solo_comprobar']:
+            ids = [d[0] for d in diferencias]
+            Comunidad.objects.filter(idComunidad__in=ids).update(numUsuarios=usuarios_reales, numPublicaciones=publicaciones_reales)
+            self.stdout.write(self.style.SUCCESS(f"{len(diferencias)} comunidades corregidas."))
+        else:
+            self.stdout.write(f"{len(diferencias)} comunidades descuadradas.")
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from comunidades.models import Publicacion, PublicacionMeGusta
+
+
+class Command(BaseCommand):
+    help = "Comprueba (y corrige) el contador de me gustas de cada publicación contando sus registros en PublicacionMeGusta."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--solo-comprobar', action='store_true', help="Solo informa de las diferencias, sin corregirlas.")
+
+    def handle(self, *args, **options):
+        # Número real de me gustas de cada publicación (subconsulta)
+        likes = PublicacionMeGusta.objects.filter(idPublicacion=OuterRef('pk')).order_by() \
+            .values('idPublicacion').annotate(total=Count('pk')).values('total')
+        real = Coalesce(Subquery(likes, output_field=IntegerField()), 0)
+
+        # Publicaciones cuyo contador no coincide con el número real
+        descuadradas = Publicacion.objects.annotate(real=real).exclude(meGusta=F('real'))
+        diferencias = list(descuadradas.values_list('idPublicacion', 'meGusta', 'real'))
+
+        for idPublicacion, guardado, contado in diferencias:
+            self.stdout.write(f"Publicación {idPublicacion}: contador {guardado}, me gustas reales {contado}")
+
+        if diferencias and not options['solo_comprobar']:
+            ids = [d[0] for d in diferencias]
+            Publicacion.objects.filter(idPublicacion__in=ids).update(meGusta=real)
+            self.stdout.write(self.style.SUCCESS(f"{len(diferencias)} contadores corregidos."))
+        else:
+            self.stdout.write(f"{len(diferencias)} contadores descuadrados.")
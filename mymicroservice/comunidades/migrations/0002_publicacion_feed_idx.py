@@ -0,0 +1,17 @@
+# Generated by Django 5.2.8 on 2026-10-18 13:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('comunidades', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='publicacion',
+            index=models.Index(fields=['idComunidad', '-fechaPublicacion', '-idPublicacion'], name='publicacion_feed_idx'),
+        ),
+    ]
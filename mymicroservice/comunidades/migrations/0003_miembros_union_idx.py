@@ -0,0 +1,17 @@
+# Generated by Django 5.2.8 on 2026-10-18 13:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('comunidades', '0002_publicacion_feed_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comunidadmiembros',
+            index=models.Index(fields=['idComunidad', 'fechaUnion', 'id'], name='miembros_union_idx'),
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.2.8 on 2026-10-18 13:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def copiar_palabras_a_tabla(apps, schema_editor):
+    """
+    Pasa las palabras vetadas de la cadena separada por comas a la tabla PalabraVetada.
+    """
+    Comunidad = apps.get_model('comunidades', 'Comunidad')
+    PalabraVetada = apps.get_model('comunidades', 'PalabraVetada')
+    nuevas = []
+    for idComunidad, cadena in Comunidad.objects.exclude(palabrasVetadas__isnull=True).values_list('idComunidad', 'palabrasVetadas'):
+        # Quitamos espacios, vacías y repetidas (la tabla no admite duplicados)
+        palabras = dict.fromkeys(p.strip()[:100] for p in cadena.split(',') if p.strip())
+        nuevas.extend(PalabraVetada(idComunidad_id=idComunidad, palabra=p) for p in palabras)
+    PalabraVetada.objects.bulk_create(nuevas, batch_size=1000)
+
+
+def copiar_palabras_a_cadena(apps, schema_editor):
+    """
+    Operación inversa: vuelve a guardar las palabras vetadas como cadena separada por comas.
+    """
+    Comunidad = apps.get_model('comunidades', 'Comunidad')
+    PalabraVetada = apps.get_model('comunidades', 'PalabraVetada')
+    palabras = {}
+    for idComunidad, palabra in PalabraVetada.objects.order_by('id').values_list('idComunidad_id', 'palabra'):
+        palabras.setdefault(idComunidad, []).append(palabra)
+    for idComunidad, lista in palabras.items():
+        Comunidad.objects.filter(idComunidad=idComunidad).update(palabrasVetadas=','.join(lista))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('comunidades', '0003_miembros_union_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comunidad',
+            name='versionPalabras',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='PalabraVetada',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('palabra', models.CharField(max_length=100)),
+                ('idComunidad', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='comunidades.comunidad')),
+            ],
+            options={
+                'unique_together': {('idComunidad', 'palabra')},
+            },
+        ),
+        migrations.RunPython(copiar_palabras_a_tabla, copiar_palabras_a_cadena),
+        migrations.RemoveField(
+            model_name='comunidad',
+            name='palabrasVetadas',
+        ),
+    ]
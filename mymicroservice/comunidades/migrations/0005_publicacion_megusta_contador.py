@@ -0,0 +1,32 @@
+# Generated by Django 5.2.8 on 2026-10-18 13:30
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def calcular_megusta(apps, schema_editor):
+    """
+    Rellena el contador de me gustas de las publicaciones existentes.
+    """
+    Publicacion = apps.get_model('comunidades', 'Publicacion')
+    PublicacionMeGusta = apps.get_model('comunidades', 'PublicacionMeGusta')
+    likes = PublicacionMeGusta.objects.filter(idPublicacion=OuterRef('pk')).order_by() \
+        .values('idPublicacion').annotate(total=Count('pk')).values('total')
+    Publicacion.objects.update(meGusta=Coalesce(Subquery(likes, output_field=IntegerField()), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('comunidades', '0004_palabras_vetadas_tabla'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='publicacion',
+            name='meGusta',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(calcular_megusta, migrations.RunPython.noop),
+    ]
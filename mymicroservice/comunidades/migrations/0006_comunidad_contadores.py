@@ -0,0 +1,43 @@
+# Generated by Django 5.2.8 on 2026-10-18 13:31
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def calcular_contadores(apps, schema_editor):
+    """
+    Rellena los contadores de miembros y publicaciones de las comunidades existentes.
+    """
+    Comunidad = apps.get_model('comunidades', 'Comunidad')
+    ComunidadMiembros = apps.get_model('comunidades', 'ComunidadMiembros')
+    Publicacion = apps.get_model('comunidades', 'Publicacion')
+    miembros = ComunidadMiembros.objects.filter(idComunidad=OuterRef('pk')).order_by() \
+        .values('idComunidad').annotate(total=Count('pk')).values('total')
+    publicaciones = Publicacion.objects.filter(idComunidad=OuterRef('pk')).order_by() \
+        .values('idComunidad').annotate(total=Count('pk')).values('total')
+    Comunidad.objects.update(
+        numUsuarios=Coalesce(Subquery(miembros, output_field=IntegerField()), 0),
+        numPublicaciones=Coalesce(Subquery(publicaciones, output_field=IntegerField()), 0)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('comunidades', '0005_publicacion_megusta_contador'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comunidad',
+            name='numPublicaciones',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='comunidad',
+            name='numUsuarios',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(calcular_contadores, migrations.RunPython.noop),
+    ]
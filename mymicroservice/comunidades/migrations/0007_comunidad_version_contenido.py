@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 13:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('comunidades', '0006_comunidad_contadores'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comunidad',
+            name='versionContenido',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
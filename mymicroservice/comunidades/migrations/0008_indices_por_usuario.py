@@ -0,0 +1,21 @@
+# Generated by Django 5.2.8 on 2026-10-18 13:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('comunidades', '0007_comunidad_version_contenido'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comunidadmiembros',
+            index=models.Index(fields=['idUsuario', 'idComunidad'], name='miembros_usuario_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='publicacionmegusta',
+            index=models.Index(fields=['idUsuario', 'idPublicacion'], name='megusta_usuario_idx'),
+        ),
+    ]
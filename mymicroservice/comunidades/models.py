@@ -15,8 +15,13 @@ class Comunidad(models.Model):
     rutaImagen = models.CharField(max_length=255, blank=True, null=True)
     # Fecha de creación de la comunidad
     fechaCreacion = models.DateTimeField(auto_now_add=True)
-    # Lista de palabras vetadas en la comunidad (lista separada por comas)
-    palabrasVetadas = models.TextField(blank=True, null=True)
+    # Número de miembros y de publicaciones (contadores mantenidos por los DAO, se reconcilian con 'reconciliar_contadores_comunidad')
+    numUsuarios = models.PositiveIntegerField(default=0)
+    numPublicaciones = models.PositiveIntegerField(default=0)
+    # Versión de la lista de palabras vetadas (aumenta con cada cambio, la usa la caché de moderación)
+    versionPalabras = models.PositiveIntegerField(default=0)
+    # Versión del contenido (publicaciones, miembros y vetos); con ella se calculan los ETags de los listados
+    versionContenido = models.PositiveIntegerField(default=0)
 
     def __str__(self):
         return self.nombreComunidad
@@ -35,6 +40,12 @@ class ComunidadMiembros(models.Model):
         # Un usuario no puede estar más de una vez en la misma comunidad
         # CADA ID_USUARIO SOLO PUEDE APARECER UNA VEZ POR CADA ID_COMUNIDAD
         unique_together = ('idComunidad', 'idUsuario')
+        # Índices para listar los miembros de una comunidad paginando por (fecha de unión, id)
+        # y para buscar las comunidades de un usuario (mis-comunidades)
+        indexes = [
+            models.Index(fields=['idComunidad', 'fechaUnion', 'id'], name='miembros_union_idx'),
+            models.Index(fields=['idUsuario', 'idComunidad'], name='miembros_usuario_idx'),
+        ]
 
     def __str__(self):
         return f"Usuario {self.idUsuario} en {self.idComunidad.nombreComunidad}"
@@ -53,12 +64,18 @@ class Publicacion(models.Model):
     rutaFichero = models.CharField(max_length=255, blank=True, null=True)
     # Fecha de creación de la publicación
     fechaPublicacion = models.DateTimeField(auto_now_add=True)
+    # Número de me gustas (contador mantenido al dar/quitar me gusta, se reconcilia con 'reconciliar_megusta')
+    meGusta = models.PositiveIntegerField(default=0)
     
     # Creación de restricción
     class Meta:
         # Una publicación debe ser única dentro de una comunidad
         # CADA IDPUBLICACION SOLO PUEDE APARECER UNA VEZ POR CADA IDCOMUNIDAD
         unique_together = ('idPublicacion', 'idComunidad')    
+        # Índice para listar las publicaciones de una comunidad paginando por (fecha, id)
+        indexes = [
+            models.Index(fields=['idComunidad', '-fechaPublicacion', '-idPublicacion'], name='publicacion_feed_idx'),
+        ]
 
     def __str__(self):
         return self.titulo
@@ -77,11 +94,31 @@ class PublicacionMeGusta(models.Model):
         # Un usuario no puede dar más de un me gusta a la misma publicación
         # CADA IDUSUARIO SOLO PUEDE APARECER UNA VEZ POR CADA IDPUBLICACION
         unique_together = ('idPublicacion', 'idUsuario')
+        # Índice para buscar los me gusta de un usuario
+        indexes = [
+            models.Index(fields=['idUsuario', 'idPublicacion'], name='megusta_usuario_idx'),
+        ]
 
     def __str__(self):
         return f"Me gusta ❤️: Usuario {self.idUsuario} → {self.idPublicacion.titulo}"
 
 
+class PalabraVetada(models.Model):
+    # Id de la comunidad en la que está vetada la palabra
+    idComunidad = models.ForeignKey(Comunidad, on_delete=models.CASCADE)
+    # Palabra (o expresión) vetada
+    palabra = models.CharField(max_length=100)
+
+    # Creación de restricción
+    class Meta:
+        # Una palabra no puede estar vetada más de una vez en la misma comunidad
+        # CADA PALABRA SOLO PUEDE APARECER UNA VEZ POR CADA IDCOMUNIDAD
+        unique_together = ('idComunidad', 'palabra')
+
+    def __str__(self):
+        return f"Palabra '{self.palabra}' vetada en {self.idComunidad.nombreComunidad}"
+
+
 class PersonasVetadas(models.Model):
     # Id de la comunidad en la que se realiza el veto
     idComunidad = models.ForeignKey(Comunidad, on_delete=models.CASCADE)
@@ -0,0 +1,105 @@
+import re
+import unicodedata
+from typing import Iterable, List
+from django.conf import settings
+from comunidades.cache import TTLCache
+from comunidades.exceptions import ContenidoVetadoError
+from comunidades.models import Comunidad, PalabraVetada
+
+# Motor de moderación: comprueba los textos de las publicaciones contra las palabras vetadas de la comunidad
+
+_PALABRA = re.compile(r'\w+')
+
+
+def normalizar(texto: str) -> str:
+    """
+    Quita tildes/diacríticos y pasa a minúsculas ('Canción' -> 'cancion'), para comparar sin distinguir.
+    """
+    descompuesto = unicodedata.normalize('NFKD', texto)
+    return ''.join(c for c in descompuesto if not unicodedata.combining(c)).casefold()
+
+
+def tokenizar(texto: str) -> List[str]:
+    """
+    Separa un texto normalizado en palabras (los límites de palabra son los del \\w de las expresiones regulares).
+    """
+    return _PALABRA.findall(normalizar(texto))
+
+
+class Matcher:
+    """
+    Buscador compilado de las palabras vetadas de una comunidad.
+    Cada palabra (o expresión de varias palabras) se guarda como una tupla de tokens en un conjunto,
+    así que buscar es recorrer el texto una vez y hacer una consulta al conjunto por posición:
+    coste lineal en el texto e independiente del número de palabras vetadas.
+    """
+
+    def __init__(self, palabras: Iterable[str]):
+        self.vetadas = {}  # tupla de tokens -> palabra vetada original
+        for palabra in palabras:
+            tokens = tuple(tokenizar(palabra))
+            if tokens:
+                self.vetadas.setdefault(tokens, palabra.strip())
+        # Longitudes (en tokens) de las expresiones vetadas, normalmente solo 1
+        self.longitudes = sorted({len(t) for t in self.vetadas})
+
+    def buscar(self, texto: str) -> List[str]:
+        """
+        Devuelve las palabras vetadas que aparecen en el texto (sin repetir, en orden de aparición).
+        """
+        if not self.vetadas or not texto:
+            return []
+        tokens = tokenizar(texto)
+        encontradas = {}
+        for i in range(len(tokens)):
+            for longitud in self.longitudes:
+                palabra = self.vetadas.get(tuple(tokens[i:i + longitud]))
+                if palabra is not None:
+                    encontradas[palabra] = None
+        return list(encontradas)
+
+
+class MotorModeracion:
+
+    # Buscadores compilados por comunidad: idComunidad -> (versión de la lista, Matcher)
+    matchers_cache = TTLCache(maxsize=settings.MODERACION_CACHE_MAXSIZE, ttl=settings.MODERACION_CACHE_TTL)
+
+    @staticmethod
+    def get_matcher(idComunidad: int) -> Matcher:
+        """
+        Devuelve el buscador de la comunidad, compilándolo solo si no está en la caché o si la lista ha cambiado.
+        Para saber si ha cambiado basta con leer la versión de la lista (no hace falta cargar las palabras).
+        """
+        version = Comunidad.objects.filter(pk=idComunidad).values_list('versionPalabras', flat=True).first()
+        if version is None:
+            return Matcher([])
+
+        guardado = MotorModeracion.matchers_cache.get(idComunidad)
+        if guardado is not None and guardado[0] == version:
+            return guardado[1]
+
+        palabras = PalabraVetada.objects.filter(idComunidad_id=idComunidad).values_list('palabra', flat=True)
+        matcher = Matcher(palabras)
+        MotorModeracion.matchers_cache.set(idComunidad, (version, matcher))
+        return matcher
+
+    @staticmethod
+    def comprobar_textos(idComunidad: int, *textos: str):
+        """
+        Comprueba los textos contra las palabras vetadas de la comunidad.
+        Si alguno contiene palabras vetadas, LANZA UNA EXCEPCIÓN.
+        """
+        matcher = MotorModeracion.get_matcher(idComunidad)
+        encontradas = {}
+        for texto in textos:
+            for palabra in matcher.buscar(texto):
+                encontradas[palabra] = None
+        if encontradas:
+            raise ContenidoVetadoError(f"El texto contiene palabras vetadas en la comunidad: {', '.join(encontradas)}")
+
+    @staticmethod
+    def invalidar(idComunidad: int):
+        """
+        Elimina el buscador compilado de la comunidad (se llama cuando cambia su lista de palabras vetadas).
+        """
+        MotorModeracion.matchers_cache.delete(idComunidad)
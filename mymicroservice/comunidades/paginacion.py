@@ -0,0 +1,112 @@
+import base64
+import json
+from datetime import datetime
+from typing import List, Optional, Tuple
+from django.conf import settings
+from django.db.models import Q
+from comunidades.exceptions import InvalidParameterError
+
+# Paginación por cursor (keyset) para los listados del microservicio.
+# El cursor guarda los valores (fecha, id) del último elemento devuelto; la siguiente página
+# empieza justo después de él, así que cualquier página cuesta lo mismo que la primera.
+
+def codificar_cursor(fecha: datetime, id_elemento: int) -> str:
+    """
+    Convierte la posición (fecha, id) en un cursor opaco para el cliente.
+    """
+    crudo = json.dumps([fecha.isoformat(), id_elemento]).encode()
+    return base64.urlsafe_b64encode(crudo).decode().rstrip('=')
+
+
+def decodificar_cursor(cursor: str) -> Tuple[datetime, int]:
+    """
+    Recupera la posición (fecha, id) guardada en un cursor.
+    Si el cursor no es válido, LANZA UNA EXCEPCIÓN.
+    """
+    try:
+        crudo = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        fecha, id_elemento = json.loads(crudo)
+        return datetime.fromisoformat(fecha), int(id_elemento)
+    except (ValueError, TypeError):
+        raise InvalidParameterError("El cursor de paginación no es válido.")
+
+
+def leer_limite(valor: Optional[str]) -> int:
+    """
+    Lee el parámetro 'limit' de la petición aplicando el valor por defecto y el máximo configurados.
+    """
+    if valor in (None, ''):
+        return settings.PAGINACION_LIMITE_DEFECTO
+    try:
+        limite = int(valor)
+    except ValueError:
+        raise InvalidParameterError("El parámetro 'limit' debe ser un número entero.")
+    if limite < 1:
+        raise InvalidParameterError("El parámetro 'limit' debe ser mayor que 0.")
+    return min(limite, settings.PAGINACION_LIMITE_MAXIMO)
+
+
+def paginar(queryset, campo_fecha: str, campo_id: str, limite: int, cursor: Optional[str] = None,
+            descendente: bool = True) -> Tuple[List, Optional[str]]:
+    """
+    Devuelve una página del queryset ordenado por (campo_fecha, campo_id) y el cursor de la siguiente.
+    El cursor de la siguiente página es None cuando ya no quedan más elementos.
+    Admite querysets de modelos o de diccionarios (.values()) que incluyan ambos campos.
+    """
+    consulta = _consulta_pagina(queryset, campo_fecha, campo_id, limite, cursor, descendente)
+    return _resultado_pagina(list(consulta), campo_fecha, campo_id, limite)
+
+
+async def apaginar(queryset, campo_fecha: str, campo_id: str, limite: int, cursor: Optional[str] = None,
+                   descendente: bool = True) -> Tuple[List, Optional[str]]:
+    """
+    Versión asíncrona de paginar() (para las vistas async; la consulta se hace con el ORM asíncrono).
+    """
+    consulta = _consulta_pagina(queryset, campo_fecha, campo_id, limite, cursor, descendente)
+    return _resultado_pagina([e async for e in consulta], campo_fecha, campo_id, limite)
+
+
+def _consulta_pagina(queryset, campo_fecha: str, campo_id: str, limite: int, cursor: Optional[str], descendente: bool):
+    signo = '-' if descendente else ''
+    queryset = queryset.order_by(f'{signo}{campo_fecha}', f'{signo}{campo_id}')
+
+    if cursor:
+        fecha, id_elemento = decodificar_cursor(cursor)
+        comparador = 'lt' if descendente else 'gt'
+        queryset = queryset.filter(
+            Q(**{f'{campo_fecha}__{comparador}': fecha}) |
+            Q(**{campo_fecha: fecha, f'{campo_id}__{comparador}': id_elemento})
+        )
+
+    # Pedimos un elemento de más para saber si existe una página siguiente
+    return queryset[:limite + 1]
+
+
+def _resultado_pagina(elementos: List, campo_fecha: str, campo_id: str, limite: int) -> Tuple[List, Optional[str]]:
+    if len(elementos) <= limite:
+        return elementos, None
+
+    elementos = elementos[:limite]
+    ultimo = elementos[-1]
+    if isinstance(ultimo, dict):
+        return elementos, codificar_cursor(ultimo[campo_fecha], ultimo[campo_id])
+    return elementos, codificar_cursor(getattr(ultimo, campo_fecha), getattr(ultimo, campo_id))
+
+
+def leer_booleano(valor: Optional[str]) -> bool:
+    """
+    Interpreta un parámetro de la URL como booleano (?param=true / 1 / si).
+    """
+    return str(valor).lower() in ('1', 'true', 'si', 'sí', 'yes')
+
+
+def cabeceras_paginacion(request, siguiente: Optional[str]) -> dict:
+    """
+    Cabeceras HTTP con el enlace a la siguiente página (estilo 'Link: <...>; rel="next"').
+    """
+    if not siguiente:
+        return {}
+    parametros = request.GET.copy()
+    parametros['cursor'] = siguiente
+    url = request.build_absolute_uri(f"{request.path}?{parametros.urlencode()}")
+    return {'Link': f'<{url}>; rel="next"', 'X-Next-Cursor': siguiente}
@@ -0,0 +1,232 @@
+import csv
+import dataclasses
+import io
+import json
+import operator
+from itertools import islice
+from typing import Callable, Dict, Iterable, Iterator, List, Tuple
+from asgiref.sync import sync_to_async
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError: # orjson es opcional: sin él se usa el módulo json de la biblioteca estándar
+    orjson = None
+
+# Renderizado JSON de los DTO sin pasar por dataclasses.asdict():
+# los controladores devuelven los DTO tal cual y se convierten al escribir el JSON.
+# - Con orjson instalado, orjson serializa directamente los dataclasses y las fechas.
+# - Sin orjson, cada clase de DTO tiene un convertidor a diccionario preparado una sola vez con sus campos
+#   (solo los copia, los DTO anidados los convierte json al encontrarlos).
+
+_convertidores: Dict[type, Callable] = {}
+
+
+def _convertidor(cls: type) -> Callable:
+    """
+    Devuelve (preparándolo la primera vez) la función que convierte un DTO de la clase en diccionario.
+    """
+    convertidor = _convertidores.get(cls)
+    if convertidor is None:
+        nombres = tuple(f.name for f in dataclasses.fields(cls))
+        if len(nombres) > 1:
+            # Un solo attrgetter lee todos los campos de una vez (en C) y devuelve sus valores en orden
+            leer = operator.attrgetter(*nombres)
+            convertidor = lambda o: dict(zip(nombres, leer(o)))
+        else:
+            # Con un solo nombre attrgetter no devuelve una tupla
+            convertidor = lambda o: {nombre: getattr(o, nombre) for nombre in nombres}
+        _convertidores[cls] = convertidor
+    return convertidor
+
+
+def a_dict(dto) -> dict:
+    """
+    Convierte un DTO en diccionario (sin copiar en profundidad: los DTO anidados se quedan como objetos).
+    """
+    return _convertidor(type(dto))(dto)
+
+
+class CodificadorJSON(encoders.JSONEncoder):
+    """
+    Codificador de DRF (fechas, decimales...) que además convierte los DTO con el convertidor de su clase.
+    """
+    def default(self, obj):
+        if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+            return a_dict(obj)
+        return super().default(obj)
+
+
+def _por_defecto_orjson(obj):
+    # Tipos que orjson no conoce (Decimal, QuerySet, textos traducibles...): igual que el codificador de DRF
+    return CodificadorJSON().default(obj)
+
+
+def serializar(datos, usar_orjson: bool = True) -> bytes:
+    """
+    Convierte en JSON (bytes en UTF-8) los datos de una respuesta, que pueden contener DTO.
+    El resultado es el mismo que el del JSONRenderer de DRF sobre los diccionarios equivalentes.
+    """
+    if orjson is not None and usar_orjson:
+        # OPT_NON_STR_KEYS: claves enteras (resultados por id) como en json.dumps
+        salida = orjson.dumps(datos, default=_por_defecto_orjson, option=orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS)
+    else:
+        salida = json.dumps(datos, cls=CodificadorJSON, ensure_ascii=False, separators=(',', ':')).encode()
+    # Igual que DRF: se escapan los separadores de línea Unicode para que el JSON sea JavaScript válido
+    if b'\xe2\x80\xa8' in salida or b'\xe2\x80\xa9' in salida:
+        salida = salida.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
+    return salida
+
+
+class RenderizadorJSON(JSONRenderer):
+    """
+    Renderizador JSON de DRF para las respuestas con DTO (configurado por defecto en REST_FRAMEWORK).
+    Si se pide el JSON indentado (por ejemplo desde la API navegable) se usa el renderizado de DRF.
+    """
+    encoder_class = CodificadorJSON
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+        return serializar(data)
+
+
+# --- Exportaciones en streaming (?format=ndjson o ?format=csv) ---
+# Los listados grandes se escriben a medida que se leen de la base de datos (por bloques),
+# así que la memoria no depende del tamaño del listado y el primer bloque sale enseguida.
+
+FORMATOS_STREAMING = ('ndjson', 'csv')
+
+
+def negociar(request, renderizadores: Iterable[type]) -> Tuple[BaseRenderer, str]:
+    """
+    Renderizador y tipo de contenido de la respuesta, elegidos igual que en las vistas de DRF (?format= o la cabecera Accept),
+    también para las vistas que no son de DRF (los controladores async).
+    Si no se admite ninguno de los formatos pedidos, LANZA NotAcceptable (406).
+    """
+    aceptado = getattr(request, 'accepted_renderer', None)
+    if aceptado is not None:
+        return aceptado, request.accepted_media_type
+    if not isinstance(request, Request):
+        request = Request(request)
+    negociacion = api_settings.DEFAULT_CONTENT_NEGOTIATION_CLASS()
+    return negociacion.select_renderer(request, [r() for r in renderizadores])
+
+# Elementos que se escriben juntos en cada trozo de la respuesta
+TAM_TROZO = 1000
+
+
+def _a_fila(elemento) -> dict:
+    if dataclasses.is_dataclass(elemento):
+        return a_dict(elemento)
+    return elemento
+
+
+def _valor_csv(valor):
+    """
+    Valor de una celda CSV: igual que en el JSON (fechas ISO 8601, true/false), vacío si es nulo.
+    """
+    if valor is None:
+        return ''
+    if isinstance(valor, bool):
+        return 'true' if valor else 'false'
+    if isinstance(valor, (str, int, float)):
+        return valor
+    if isinstance(valor, (dict, list, tuple)) or dataclasses.is_dataclass(valor):
+        return serializar(valor).decode()
+    return CodificadorJSON().default(valor)
+
+
+def _trozos(elementos: Iterable) -> Iterator[List]:
+    iterador = iter(elementos)
+    while trozo := list(islice(iterador, TAM_TROZO)):
+        yield trozo
+
+
+def lineas_ndjson(elementos: Iterable) -> Iterator[bytes]:
+    """
+    Escribe los elementos (DTO o diccionarios) como NDJSON: un objeto JSON por línea.
+    """
+    for trozo in _trozos(elementos):
+        yield b''.join(serializar(elemento) + b'\n' for elemento in trozo)
+
+
+def lineas_csv(elementos: Iterable, campos: List[str]) -> Iterator[bytes]:
+    """
+    Escribe los elementos (DTO o diccionarios) como CSV, con una cabecera con los campos.
+    """
+    salida = io.StringIO()
+    escritor = csv.writer(salida)
+    escritor.writerow(campos)
+    for trozo in _trozos(elementos):
+        for elemento in trozo:
+            fila = _a_fila(elemento)
+            escritor.writerow([_valor_csv(fila.get(campo)) for campo in campos])
+        yield salida.getvalue().encode()
+        salida.seek(0)
+        salida.truncate()
+    # Listado vacío: solo la cabecera
+    if salida.tell():
+        yield salida.getvalue().encode()
+
+
+async def _iterar_async(iterador: Iterator[bytes]):
+    # Cada trozo se genera en el hilo de las vistas síncronas (el de la conexión a la BD)
+    siguiente = sync_to_async(lambda: next(iterador, None))
+    while (trozo := await siguiente()) is not None:
+        yield trozo
+
+
+def respuesta_streaming(elementos: Iterable, formato: str, campos: List[str], nombre: str,
+                        asincrona: bool = False) -> StreamingHttpResponse:
+    """
+    Respuesta en streaming de un listado en formato 'ndjson' o 'csv' (los CSV se descargan como '<nombre>.csv').
+    Con 'asincrona' (vistas async bajo ASGI) el contenido se genera sin bloquear el bucle de eventos
+    y sin que Django lo lea entero antes de enviarlo.
+    """
+    if formato == 'csv':
+        contenido, tipo = lineas_csv(elementos, campos), 'text/csv; charset=utf-8'
+    else:
+        contenido, tipo = lineas_ndjson(elementos), 'application/x-ndjson'
+    respuesta = StreamingHttpResponse(_iterar_async(contenido) if asincrona else contenido, content_type=tipo)
+    if formato == 'csv':
+        respuesta['Content-Disposition'] = f'attachment; filename="{nombre}.csv"'
+    return respuesta
+
+
+class RenderizadorNDJSON(BaseRenderer):
+    """
+    Permite ?format=ndjson (o Accept: application/x-ndjson) en las vistas con exportación en streaming.
+    Las exportaciones se devuelven con respuesta_streaming(); este renderizador solo escribe
+    las demás respuestas (por ejemplo, los errores) como NDJSON.
+    """
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return b''.join(lineas_ndjson(data if isinstance(data, list) else [data]))
+
+
+class RenderizadorCSV(BaseRenderer):
+    """
+    Permite ?format=csv (o Accept: text/csv) en las vistas con exportación en streaming
+    (el resto de respuestas se escriben como CSV con los campos del primer elemento).
+    """
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        filas = [_a_fila(e) for e in (data if isinstance(data, list) else [data])]
+        return b''.join(lineas_csv(filas, list(filas[0]) if filas else []))
@@ -1,3 +1,1391 @@
-from django.test import TestCase
+import asyncio
+import csv
+import dataclasses
+import io
+import json
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+from asgiref.sync import async_to_sync, sync_to_async
+import httpx
+import requests
+
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.test import AsyncRequestFactory, RequestFactory, TestCase, TransactionTestCase, override_settings
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from comunidades import basedatos, buffer_megusta, etags, renderizado, usuarios_client
+from comunidades.admision import CacheAdmision, ConjuntoIds, admision
+from comunidades.cache import TTLCache
+from comunidades.controller.comunidad_controller import ComunidadAsyncController, ComunidadController
+from comunidades.controller.miembro_controller import MiembroAsyncController
+from comunidades.dao.comunidad_dao import ComunidadDAO
+from comunidades.dao.miembro_dao import MiembroDAO
+from comunidades.dao.palabrasVetadas_dao import PalabrasVetadasDAO
+from comunidades.dao.personasVetadas_dao import PersonasVetadasDAO
+from comunidades.dao.publicacion_dao import PublicacionDAO
+from comunidades.dao.publicacionMeGusta_dao import PublicacionMeGustaDAO
+from comunidades.dto.artista_dto import ArtistaDTO
+from comunidades.dto.comunidad_dto import ComunidadDTO
+from comunidades.dto.publicacion_dto import PublicacionDTO
+from comunidades.exceptions import AlreadyExistsError, BusinessRuleError, ContenidoVetadoError, ExternalServiceError, NotFoundError
+from comunidades.moderacion import Matcher, MotorModeracion
+from comunidades.models import Comunidad, ComunidadMiembros, PalabraVetada, PersonasVetadas, Publicacion, PublicacionMeGusta
 
 # Create your tests here.
+
+def respuesta_artista(url, timeout=None):
+    """
+    Simula la respuesta del microservicio de usuarios para /artistas/<id>
+    """
+    id_artista = int(url.rstrip('/').rsplit('/', 1)[-1])
+    respuesta = mock.Mock(status_code=200)
+    respuesta.json.return_value = {
+        'id': id_artista, 'nombreusuario': f'artista{id_artista}', 'rutafoto': None,
+        'esnovedad': False, 'oyentes': 0, 'genero': None,
+    }
+    return respuesta
+
+
+def respuesta_usuario(url, timeout=None):
+    """
+    Simula la respuesta del microservicio de usuarios para /<id>
+    """
+    id_usuario = int(url.rstrip('/').rsplit('/', 1)[-1])
+    respuesta = mock.Mock(status_code=200)
+    respuesta.json.return_value = {'id': id_usuario, 'nombreusuario': f'usuario{id_usuario}', 'esartista': False}
+    return respuesta
+
+
+class TTLCacheTests(TestCase):
+
+    def test_caducidad_y_contadores(self):
+        cache = TTLCache(maxsize=10, ttl=60)
+        cache.set(1, 'a')
+        self.assertEqual(cache.get(1), 'a')
+        self.assertIsNone(cache.get(2))
+        with mock.patch('comunidades.cache.time.monotonic', return_value=10**9):
+            self.assertIsNone(cache.get(1))
+        self.assertEqual(cache.stats()['hits'], 1)
+        self.assertEqual(cache.stats()['misses'], 2)
+
+    def test_expulsa_la_entrada_menos_usada(self):
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set(1, 'a')
+        cache.set(2, 'b')
+        cache.get(1)
+        cache.set(3, 'c')
+        self.assertEqual(cache.get(1), 'a')
+        self.assertIsNone(cache.get(2))
+        self.assertEqual(len(cache), 2)
+
+
+class ArtistasListadoTests(TestCase):
+
+    def setUp(self):
+        ComunidadDAO.artistas_cache.clear()
+        for i in range(1, 6):
+            Comunidad.objects.create(idArtista=i, nombreComunidad=f'Comunidad {i}')
+
+    def test_listado_resuelve_cada_artista_una_vez(self):
+        with mock.patch('comunidades.usuarios_client.sesion.get', side_effect=respuesta_artista) as get:
+            comunidades = ComunidadDAO.get_all_comunidades()
+        self.assertEqual(get.call_count, 5)
+        self.assertEqual([c.artista.idArtista for c in comunidades], [1, 2, 3, 4, 5])
+
+    def test_listado_repetido_usa_la_cache(self):
+        with mock.patch('comunidades.usuarios_client.sesion.get', side_effect=respuesta_artista) as get:
+            ComunidadDAO.get_all_comunidades()
+            ComunidadDAO.get_all_comunidades()
+        self.assertEqual(get.call_count, 5)
+        self.assertEqual(ComunidadDAO.artistas_cache.stats()['hits'], 5)
+        self.assertEqual(ComunidadDAO.artistas_cache.stats()['misses'], 5)
+
+
+class MiembrosHidratacionTests(TestCase):
+
+    def setUp(self):
+        self.comunidad = Comunidad.objects.create(idArtista=1, nombreComunidad='Comunidad')
+        for usuario in range(100, 120):
+            ComunidadMiembros.objects.create(idComunidad=self.comunidad, idUsuario=usuario)
+
+    def test_mantiene_el_orden_de_los_miembros(self):
+        def respuesta_desordenada(url, timeout=None):
+            # Los primeros usuarios tardan más en responder
+            time.sleep((120 - int(url.rsplit('/', 1)[-1])) / 2000)
+            return respuesta_usuario(url)
+
+        with mock.patch('comunidades.usuarios_client.sesion.get', side_effect=respuesta_desordenada):
+            miembros, _ = MiembroDAO.get_miembros_paginados(self.comunidad.idComunidad, 50)
+            exportados = list(MiembroDAO.iterar_miembros(self.comunidad.idComunidad))
+        self.assertEqual([m.idUsuario for m in miembros], list(range(100, 120)))
+        self.assertEqual([m.idUsuario for m in exportados], list(range(100, 120)))
+
+    @override_settings(USER_SERVICE_DEADLINE=0.2, USER_SERVICE_DEGRADAR=False)
+    def test_tiempo_maximo_para_toda_la_peticion(self):
+        def respuesta_lenta(url, timeout=None):
+            if url.endswith('/105'):
+                time.sleep(2)
+            return respuesta_usuario(url)
+
+        inicio = time.monotonic()
+        with mock.patch('comunidades.usuarios_client.sesion.get', side_effect=respuesta_lenta):
+            with self.assertRaises(ExternalServiceError):
+                MiembroDAO.get_miembros_paginados(self.comunidad.idComunidad, 50)
+        self.assertLess(time.monotonic() - inicio, 1)
+
+    def test_limite_de_llamadas_simultaneas(self):
+        en_curso = []
+        maximo = []
+
+        def respuesta_contada(url, timeout=None):
+            en_curso.append(url)
+            maximo.append(len(en_curso))
+            time.sleep(0.01)
+            en_curso.remove(url)
+            return respuesta_usuario(url)
+
+        with mock.patch('comunidades.usuarios_client.sesion.get', side_effect=respuesta_contada):
+            usuarios_client.map_concurrente(MiembroDAO.get_miembros, range(100, 120), max_workers=3)
+        self.assertLessEqual(max(maximo), 3)
+
+
+class ComunidadContadoresTests(TestCase):
+
+    def setUp(self):
+        ComunidadDAO.artistas_cache.clear()
+        self.patcher = mock.patch('comunidades.usuarios_client.sesion.get', side_effect=respuesta_artista)
+        self.patcher.start()
+        self.addCleanup(self.patcher.stop)
+
+    def crear_comunidades(self, desde, hasta):
+        for i in range(desde, hasta):
+            comunidad = Comunidad.objects.create(idArtista=i, nombreComunidad=f'Comunidad {i}')
+            for usuario in range(3):
+                ComunidadMiembros.objects.create(idComunidad=comunidad, idUsuario=usuario)
+            for titulo in range(2):
+                Publicacion.objects.create(idComunidad=comunidad, titulo=f'Publicación {titulo}')
+        # Los registros se crean sin pasar por los DAO: reconciliamos los contadores
+        call_command('reconciliar_contadores_comunidad', stdout=io.StringIO())
+
+    def test_contadores_correctos(self):
+        self.crear_comunidades(1, 3)
+        for dto in ComunidadDAO.get_all_comunidades():
+            self.assertEqual((dto.numPublicaciones, dto.numUsuarios), (2, 3))
+        for dto in ComunidadDAO.get_comunidades_usuario(0):
+            self.assertEqual((dto.numPublicaciones, dto.numUsuarios), (2, 3))
+        dto = ComunidadDAO.get_comunidad_especifica(Comunidad.objects.first().idComunidad)
+        self.assertEqual((dto.numPublicaciones, dto.numUsuarios), (2, 3))
+
+    def test_numero_de_consultas_constante(self):
+        # Una consulta para las comunidades (con sus contadores) y otra para sus palabras vetadas
+        self.crear_comunidades(1, 3)
+        with self.assertNumQueries(2):
+            ComunidadDAO.get_all_comunidades()
+        self.crear_comunidades(3, 30)
+        with self.assertNumQueries(2):
+            self.assertEqual(len(ComunidadDAO.get_all_comunidades()), 29)
+        with self.assertNumQueries(2):
+            self.assertEqual(len(ComunidadDAO.get_comunidades_usuario(1)), 29)
+
+
+class PublicacionesFeedTests(TestCase):
+
+    def setUp(self):
+        self.comunidad = Comunidad.objects.create(idArtista=1, nombreComunidad='Comunidad')
+        Publicacion.objects.bulk_create(
+            Publicacion(idComunidad=self.comunidad, titulo=f'Publicación {i}') for i in range(1000)
+        )
+        self.publicacion = Publicacion.objects.filter(idComunidad=self.comunidad).first()
+        PublicacionMeGusta.objects.bulk_create(
+            PublicacionMeGusta(idPublicacion=self.publicacion, idUsuario=u) for u in range(3)
+        )
+        # bulk_create no actualiza el contador: lo reconciliamos con el comando
+        call_command('reconciliar_megusta', stdout=io.StringIO())
+
+    def test_feed_en_una_sola_consulta(self):
+        # Una consulta por página, con el contador de me gusta ya incluido en cada publicación
+        dtos = []
+        cursor = None
+        while True:
+            with self.assertNumQueries(1):
+                pagina, cursor = PublicacionDAO.get_publicaciones_paginadas(self.comunidad.idComunidad, 200, cursor)
+            dtos.extend(pagina)
+            if cursor is None:
+                break
+        self.assertEqual(len(dtos), 1000)
+        likes = {d.idPublicacion: d.meGusta for d in dtos}
+        self.assertEqual(likes[self.publicacion.idPublicacion], 3)
+        self.assertEqual(sum(likes.values()), 3)
+        self.assertTrue(all(d.idComunidad == self.comunidad.idComunidad for d in dtos))
+
+    def test_detalle_en_una_sola_consulta(self):
+        with self.assertNumQueries(1):
+            dto = PublicacionDAO.get_publicacion_especifica(self.publicacion.idPublicacion)
+        self.assertEqual(dto.meGusta, 3)
+
+
+class PublicacionesPaginacionTests(TestCase):
+
+    def setUp(self):
+        self.comunidad = Comunidad.objects.create(idArtista=1, nombreComunidad='Comunidad')
+        for i in range(25):
+            Publicacion.objects.create(idComunidad=self.comunidad, titulo=f'Publicación {i}')
+        self.url = f'/comunidad/publicaciones/{self.comunidad.idComunidad}/'
+
+    def test_recorre_todas_las_paginas_sin_repetir(self):
+        vistos = []
+        cursor = None
+        while True:
+            with self.assertNumQueries(1):
+                pagina, cursor = PublicacionDAO.get_publicaciones_paginadas(self.comunidad.idComunidad, 10, cursor)
+            vistos.extend(d.idPublicacion for d in pagina)
+            if cursor is None:
+                break
+        esperados = list(Publicacion.objects.order_by('-fechaPublicacion', '-idPublicacion').values_list('idPublicacion', flat=True))
+        self.assertEqual(vistos, esperados)
+
+    def test_cabecera_link_con_la_siguiente_pagina(self):
+        respuesta = APIClient().get(self.url, {'limit': 20})
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(len(respuesta.json()), 20)
+        self.assertIn('rel="next"', respuesta['Link'])
+
+        respuesta = APIClient().get(self.url, {'limit': 20, 'cursor': respuesta['X-Next-Cursor']})
+        self.assertEqual(len(respuesta.json()), 5)
+        self.assertFalse(respuesta.has_header('Link'))
+
+    def test_cursor_no_valido(self):
+        respuesta = APIClient().get(self.url, {'cursor': 'no-es-un-cursor'})
+        self.assertEqual(respuesta.status_code, 400)
+
+
+class MiembrosPaginacionTests(TestCase):
+
+    def setUp(self):
+        self.comunidad = Comunidad.objects.create(idArtista=1, nombreComunidad='Comunidad')
+        for usuario in range(100, 125):
+            ComunidadMiembros.objects.create(idComunidad=self.comunidad, idUsuario=usuario)
+        self.url = f'/comunidad/miembros/{self.comunidad.idComunidad}/'
+
+    def test_ids_only_sin_llamadas_al_servicio_de_usuarios(self):
+        vistos = []
+        cursor = None
+        with mock.patch('comunidades.usuarios_client.sesion.get') as get:
+            while True:
+                parametros = {'ids_only': 'true', 'limit': 10}
+                if cursor:
+                    parametros['cursor'] = cursor
+                respuesta = APIClient().get(self.url, parametros)
+                self.assertEqual(respuesta.status_code, 200)
+                vistos.extend(m['idUsuario'] for m in respuesta.json())
+                cursor = respuesta.headers.get('X-Next-Cursor')
+                if not cursor:
+                    break
+        get.assert_not_called()
+        self.assertEqual(vistos, list(range(100, 125)))
+
+    def test_pagina_hidratada(self):
+        with mock.patch('comunidades.usuarios_client.sesion.get', side_effect=respuesta_usuario) as get:
+            miembros, siguiente = MiembroDAO.get_miembros_paginados(self.comunidad.idComunidad, 10)
+        self.assertEqual(get.call_count, 10)
+        self.assertEqual([m.idUsuario for m in miembros], list(range(100, 110)))
+        self.assertIsNotNone(siguiente)
+
+
+class ModeracionTests(TestCase):
+
+    def setUp(self):
+        MotorModeracion.matchers_cache.clear()
+        self.comunidad = Comunidad.objects.create(idArtista=1, nombreComunidad='Comunidad')
+        PalabrasVetadasDAO.add_palabras_vetadas(self.comunidad.idComunidad, ['tonto', 'canción prohibida'])
+
+    def test_ignora_mayusculas_y_tildes_y_respeta_limites_de_palabra(self):
+        matcher = Matcher(['Tontó', 'canción prohibida'])
+        self.assertEqual(matcher.buscar('Eres un TONTO'), ['Tontó'])
+        self.assertEqual(matcher.buscar('Esta CANCION   prohibida...'), ['canción prohibida'])
+        self.assertEqual(matcher.buscar('tontería'), [])
+
+    def test_miles_de_palabras(self):
+        matcher = Matcher([f'palabra{i}' for i in range(5000)])
+        self.assertEqual(matcher.buscar('texto con PALABRA4999 dentro'), ['palabra4999'])
+
+    def test_bloquea_crear_y_editar_publicaciones(self):
+        with self.assertRaises(ContenidoVetadoError):
+            PublicacionDAO.crear_publicacion({'titulo': 'Hola tonto'}, self.comunidad.idComunidad)
+        dto = PublicacionDAO.crear_publicacion({'titulo': 'Hola'}, self.comunidad.idComunidad)
+        with self.assertRaises(ContenidoVetadoError):
+            PublicacionDAO.actualizar_publicacion(dto.idPublicacion, {'contenido': 'una canción prohibida'})
+
+    def test_la_cache_se_renueva_al_cambiar_la_lista(self):
+        PublicacionDAO.crear_publicacion({'titulo': 'Hola amigo'}, self.comunidad.idComunidad)
+        PalabrasVetadasDAO.modificar_palabras_vetadas(self.comunidad.idComunidad, ['amigo'])
+        with self.assertRaises(ContenidoVetadoError):
+            PublicacionDAO.crear_publicacion({'titulo': 'Hola amigo'}, self.comunidad.idComunidad)
+
+
+class PalabrasVetadasTests(TestCase):
+
+    def setUp(self):
+        ComunidadDAO.artistas_cache.clear()
+        self.comunidad = Comunidad.objects.create(idArtista=1, nombreComunidad='Comunidad')
+        self.url = f'/comunidad/{self.comunidad.idComunidad}/palabras-vetadas/'
+
+    def test_anadir_eliminar_y_reemplazar(self):
+        dto = PalabrasVetadasDAO.add_palabras_vetadas(self.comunidad.idComunidad, ['uno', ' dos ', 'uno', 'a,b'])
+        self.assertEqual(dto.palabras, ['uno', 'dos', 'a,b'])
+        dto = PalabrasVetadasDAO.add_palabras_vetadas(self.comunidad.idComunidad, ['dos', 'tres'])
+        self.assertEqual(dto.palabras, ['uno', 'dos', 'a,b', 'tres'])
+        dto = PalabrasVetadasDAO.eliminar_palabras_vetadas(self.comunidad.idComunidad, ['uno', 'no-existe'])
+        self.assertEqual(dto.palabras, ['dos', 'a,b', 'tres'])
+        dto = PalabrasVetadasDAO.modificar_palabras_vetadas(self.comunidad.idComunidad, ['tres', 'cuatro'])
+        self.assertEqual(dto.palabras, ['tres', 'cuatro'])
+        self.comunidad.refresh_from_db()
+        self.assertEqual(self.comunidad.versionPalabras, 4)
+
+    def test_anadir_cuesta_lo_mismo_con_cualquier_tamano_de_lista(self):
+        PalabrasVetadasDAO.add_palabras_vetadas(self.comunidad.idComunidad, [f'p{i}' for i in range(2000)])
+        # SAVEPOINT + UPDATE de la versión + INSERT de las nuevas + RELEASE + SELECT de la lista final
+        with self.assertNumQueries(5):
+            PalabrasVetadasDAO.add_palabras_vetadas(self.comunidad.idComunidad, ['nueva'])
+        self.assertEqual(PalabraVetada.objects.filter(idComunidad=self.comunidad).count(), 2001)
+
+    def test_comunidad_inexistente(self):
+        with self.assertRaises(NotFoundError):
+            PalabrasVetadasDAO.add_palabras_vetadas(9999, ['uno'])
+
+    def test_endpoint_y_dto_de_comunidad(self):
+        cliente = APIClient()
+        respuesta = cliente.post(self.url, {'palabras': ['uno', 'dos']}, format='json')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(cliente.get(self.url).json(), {'palabras': ['uno', 'dos']})
+        with mock.patch('comunidades.usuarios_client.sesion.get', side_effect=respuesta_artista):
+            dto = ComunidadDAO.get_comunidad_especifica(self.comunidad.idComunidad)
+        self.assertEqual(dto.palabrasVetadas, ['uno', 'dos'])
+
+
+@override_settings(MIEMBROS_LOTE_TAMANO=50)
+class MiembrosLoteTests(TestCase):
+
+    def setUp(self):
+        self.comunidad = Comunidad.objects.create(idArtista=7, nombreComunidad='Comunidad')
+        ComunidadMiembros.objects.create(idComunidad=self.comunidad, idUsuario=1)
+        PersonasVetadas.objects.create(idComunidad=self.comunidad, idUsuario=2)
+        self.url = f'/comunidad/miembros/{self.comunidad.idComunidad}/lote/'
+
+    def test_importar_con_resultado_por_id(self):
+        respuesta = APIClient().post(self.url, [1, 2, 7, 3, 3, 'x'] + list(range(100, 300)), format='json')
+        self.assertEqual(respuesta.status_code, 200)
+        datos = respuesta.json()
+        self.assertEqual(datos['resultados']['1'], 'ya_miembro')
+        self.assertEqual(datos['resultados']['2'], 'vetado')
+        self.assertEqual(datos['resultados']['7'], 'creador')
+        self.assertEqual(datos['resultados']['3'], 'añadido')
+        self.assertEqual(datos['resultados']['x'], 'invalido')
+        self.assertEqual(datos['resumen']['añadido'], 201)
+        self.assertEqual(ComunidadMiembros.objects.filter(idComunidad=self.comunidad).count(), 202)
+
+    def test_consultas_por_trozo_y_no_por_id(self):
+        # 1 consulta para la comunidad y, por trozo de 50: SAVEPOINT, 2 comprobaciones, INSERT, contador y RELEASE
+        with self.assertNumQueries(1 + 4 * 6):
+            MiembroDAO.add_miembros_lote(self.comunidad.idComunidad, range(1000, 1200))
+
+    def test_solo_cuenta_los_insertados(self):
+        insertar = MiembroDAO._insertar_miembros
+        def insertar_con_carrera(comunidad, usuarios):
+            # Otra petición añade al primero entre la comprobación y la inserción
+            ComunidadMiembros.objects.create(idComunidad_id=comunidad, idUsuario=usuarios[0])
+            return insertar(comunidad, usuarios)
+
+        with mock.patch.object(MiembroDAO, '_insertar_miembros', side_effect=insertar_con_carrera):
+            datos = MiembroDAO.add_miembros_lote(self.comunidad.idComunidad, [20, 21])
+        self.assertEqual(datos['resultados'], {20: 'ya_miembro', 21: 'añadido'})
+        self.comunidad.refresh_from_db()
+        # El contador solo suma el que se ha insertado en el lote
+        self.assertEqual(self.comunidad.numUsuarios, 1)
+        self.assertEqual(ComunidadMiembros.objects.filter(idComunidad=self.comunidad).count(), 3)
+
+    def test_importar_ndjson(self):
+        cuerpo = '\n'.join(['10', '{"idUsuario": 11}', '', 'no-es-json']).encode()
+        respuesta = APIClient().generic('POST', self.url, cuerpo, content_type='application/x-ndjson')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.json()['resumen'], {'añadido': 2, 'invalido': 1})
+
+    def test_eliminar_por_lotes(self):
+        MiembroDAO.add_miembros_lote(self.comunidad.idComunidad, [10, 11])
+        respuesta = APIClient().delete(self.url, {'idsUsuario': [1, 10, 11, 12]}, format='json')
+        self.assertEqual(respuesta.json()['resumen'], {'eliminado': 3, 'no_miembro': 1})
+        self.assertFalse(ComunidadMiembros.objects.filter(idComunidad=self.comunidad).exists())
+
+
+class MeGustaContadorTests(TestCase):
+
+    def setUp(self):
+        comunidad = Comunidad.objects.create(idArtista=1, nombreComunidad='Comunidad')
+        for usuario in (1, 2):
+            ComunidadMiembros.objects.create(idComunidad=comunidad, idUsuario=usuario)
+        self.publicacion = Publicacion.objects.create(idComunidad=comunidad, titulo='Publicación')
+        self.url = f'/comunidad/publicaciones/megusta/{self.publicacion.idPublicacion}/'
+
+    def test_dar_y_quitar_actualizan_el_contador(self):
+        cliente = APIClient()
+        self.assertEqual(cliente.post(self.url, {'idUsuario': 1}, format='json').json(), {'meGusta': 1})
+        self.assertEqual(cliente.post(self.url, {'idUsuario': 2}, format='json').json(), {'meGusta': 2})
+        # Dar y quitar son idempotentes: repetirlos no cambia el contador
+        self.assertEqual(cliente.post(self.url, {'idUsuario': 2}, format='json').json(), {'meGusta': 2})
+        self.assertEqual(cliente.delete(self.url, {'idUsuario': 1}, format='json').json(), {'meGusta': 1})
+        self.assertEqual(cliente.delete(self.url, {'idUsuario': 1}, format='json').json(), {'meGusta': 1})
+        self.publicacion.refresh_from_db()
+        self.assertEqual(self.publicacion.meGusta, 1)
+        # Sin ser miembro, o sobre una publicación que no existe
+        self.assertEqual(cliente.post(self.url, {'idUsuario': 3}, format='json').status_code, 409)
+        self.assertEqual(cliente.post('/comunidad/publicaciones/megusta/9999/', {'idUsuario': 1}, format='json').status_code, 404)
+        self.assertEqual(cliente.delete('/comunidad/publicaciones/megusta/9999/', {'idUsuario': 1}, format='json').status_code, 404)
+        self.assertFalse(PublicacionMeGusta.objects.filter(idUsuario=3).exists())
+
+    def test_dar_megusta_en_una_transaccion(self):
+        # Insertar (con la comprobación de miembro) y actualizar y leer el contador, sin tocar la comunidad
+        for esperadas in (['INSERT', 'UPDATE'], ['INSERT', 'SELECT']):
+            with CaptureQueriesContext(connection) as consultas:
+                self.assertEqual(PublicacionMeGustaDAO.dar_megusta(self.publicacion.idPublicacion, 1), 1)
+            sentencias = [c['sql'].split()[0] for c in consultas.captured_queries]
+            self.assertEqual([s for s in sentencias if s not in ('SAVEPOINT', 'RELEASE')], esperadas)
+
+    def test_contar_likes_sin_contar_registros(self):
+        PublicacionMeGustaDAO.dar_megusta(self.publicacion.idPublicacion, 1)
+        with self.assertNumQueries(1):
+            self.assertEqual(PublicacionMeGustaDAO.contar_likes(self.publicacion.idPublicacion), 1)
+
+    def test_comando_de_reconciliacion(self):
+        PublicacionMeGustaDAO.dar_megusta(self.publicacion.idPublicacion, 1)
+        Publicacion.objects.filter(pk=self.publicacion.pk).update(meGusta=40)
+        salida = io.StringIO()
+        call_command('reconciliar_megusta', '--solo-comprobar', stdout=salida)
+        self.assertIn('contador 40, me gustas reales 1', salida.getvalue())
+        self.publicacion.refresh_from_db()
+        self.assertEqual(self.publicacion.meGusta, 40)
+        call_command('reconciliar_megusta', stdout=io.StringIO())
+        self.publicacion.refresh_from_db()
+        self.assertEqual(self.publicacion.meGusta, 1)
+
+    def test_listado_de_likes_desde_filas(self):
+        for usuario in (1, 2):
+            PublicacionMeGustaDAO.dar_megusta(self.publicacion.idPublicacion, usuario)
+        with mock.patch.object(PublicacionMeGusta, '__init__', side_effect=AssertionError('no se crean modelos')):
+            likes = PublicacionMeGustaDAO.get_likes_de_publicacion(self.publicacion.idPublicacion)
+        self.assertEqual(sorted(l.idUsuario for l in likes), [1, 2])
+        self.assertEqual({l.idPublicacion for l in likes}, {self.publicacion.idPublicacion})
+        # Los DTO no tienen __dict__ y no se pueden modificar
+        self.assertFalse(hasattr(likes[0], '__dict__'))
+        with self.assertRaises(AttributeError):
+            likes[0].idUsuario = 3
+        respuesta = APIClient().get(self.url)
+        self.assertEqual(sorted(l['idUsuario'] for l in respuesta.json()), [1, 2])
+
+        # El benchmark solo mide sobre su base de datos temporal (aquí, la de los tests)
+        with self.assertRaises(CommandError):
+            call_command('benchmark_memoria_megusta', modo='filas', publicacion=self.publicacion.idPublicacion)
+        salida = io.StringIO()
+        with mock.patch.dict('os.environ', {'BENCHMARK_MEMORIA_MEGUSTA_DB': str(connection.settings_dict['NAME'])}):
+            call_command('benchmark_memoria_megusta', modo='filas', publicacion=self.publicacion.idPublicacion, stdout=salida)
+        self.assertIn('filas: 2 me gustas, pico RSS', salida.getvalue())
+
+    def test_estado_de_varias_publicaciones_en_una_consulta(self):
+        otra = Publicacion.objects.create(idComunidad=self.publicacion.idComunidad, titulo='Otra')
+        sin_likes = Publicacion.objects.create(idComunidad=self.publicacion.idComunidad, titulo='Sin likes')
+        PublicacionMeGustaDAO.dar_megusta(self.publicacion.idPublicacion, 1)
+        PublicacionMeGustaDAO.dar_megusta(otra.idPublicacion, 1)
+        PublicacionMeGustaDAO.dar_megusta(otra.idPublicacion, 2)
+        ids = [sin_likes.idPublicacion, otra.idPublicacion, 9999, self.publicacion.idPublicacion]
+
+        with self.assertNumQueries(1):
+            estado = PublicacionMeGustaDAO.get_estado_megusta(2, ids)
+        self.assertEqual(estado.meGustan, [otra.idPublicacion])
+
+        cliente = APIClient()
+        respuesta = cliente.get('/comunidad/publicaciones/megusta/estado/', {'idUsuario': 1, 'ids': ','.join(map(str, ids))})
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.json(), {
+            'idUsuario': 1,
+            'meGustan': [otra.idPublicacion, self.publicacion.idPublicacion],
+            'meGusta': {str(sin_likes.idPublicacion): 0, str(otra.idPublicacion): 2, str(self.publicacion.idPublicacion): 1},
+        })
+        self.assertEqual(cliente.get('/comunidad/publicaciones/megusta/estado/', {'ids': '1'}).status_code, 400)
+        self.assertEqual(cliente.get('/comunidad/publicaciones/megusta/estado/', {'idUsuario': 1, 'ids': 'a'}).status_code, 400)
+        with override_settings(PAGINACION_LIMITE_MAXIMO=2):
+            self.assertEqual(cliente.get('/comunidad/publicaciones/megusta/estado/', {'idUsuario': 1, 'ids': '1,2,3'}).status_code, 400)
+
+
+class ComunidadContadoresMantenidosTests(TestCase):
+
+    def setUp(self):
+        self.comunidad = Comunidad.objects.create(idArtista=1, nombreComunidad='Comunidad')
+        self.id = self.comunidad.idComunidad
+
+    def contadores(self):
+        self.comunidad.refresh_from_db()
+        return self.comunidad.numUsuarios, self.comunidad.numPublicaciones
+
+    def test_altas_bajas_y_vetos_de_miembros(self):
+        with mock.patch('comunidades.usuarios_client.sesion.get', side_effect=respuesta_usuario):
+            MiembroDAO.add_miembro(self.id, 10)
+            MiembroDAO.add_miembro(self.id, 11)
+        MiembroDAO.add_miembros_lote(self.id, [12, 13, 14, 10])
+        self.assertEqual(self.contadores(), (5, 0))
+        MiembroDAO.eliminar_miembro(self.id, 10)
+        MiembroDAO.eliminar_miembros_lote(self.id, [11, 99])
+        self.assertEqual(self.contadores(), (3, 0))
+        PersonasVetadasDAO.vetar_miembro(self.id, 12)
+        PersonasVetadasDAO.vetar_miembro(self.id, 50)
+        self.assertEqual(self.contadores(), (2, 0))
+
+    def test_publicaciones(self):
+        dto = PublicacionDAO.crear_publicacion({'titulo': 'Una'}, self.id)
+        PublicacionDAO.crear_publicacion({'titulo': 'Otra'}, self.id)
+        PublicacionDAO.eliminar_publicacion(dto.idPublicacion)
+        self.assertEqual(self.contadores(), (0, 1))
+
+    def test_comando_de_reconciliacion(self):
+        ComunidadMiembros.objects.create(idComunidad=self.comunidad, idUsuario=1)
+        salida = io.StringIO()
+        call_command('reconciliar_contadores_comunidad', '--solo-comprobar', stdout=salida)
+        self.assertIn(f'Comunidad {self.id}: miembros 0 (reales 1)', salida.getvalue())
+        call_command('reconciliar_contadores_comunidad', stdout=io.StringIO())
+        self.assertEqual(self.contadores(), (1, 0))
+
+
+class CatalogoCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        ComunidadDAO.artistas_cache.clear()
+        self.patcher = mock.patch('comunidades.usuarios_client.sesion.get', side_effect=respuesta_artista)
+        self.patcher.start()
+        self.addCleanup(self.patcher.stop)
+        self.comunidad = Comunidad.objects.create(idArtista=1, nombreComunidad='Comunidad')
+        self.id = self.comunidad.idComunidad
+        self.cliente = APIClient()
+
+    def test_respuestas_repetidas_no_consultan_la_bd(self):
+        self.cliente.get('/comunidad/')
+        self.cliente.get(f'/comunidad/{self.id}/')
+        self.cliente.get('/comunidad/mis-comunidades/5/')
+        with self.assertNumQueries(0):
+            self.assertEqual(len(self.cliente.get('/comunidad/').json()), 1)
+            self.assertEqual(self.cliente.get(f'/comunidad/{self.id}/').json()['nombreComunidad'], 'Comunidad')
+            self.assertEqual(self.cliente.get('/comunidad/mis-comunidades/5/').json(), [])
+
+    def test_las_escrituras_invalidan_la_cache(self):
+        self.cliente.get('/comunidad/')
+        self.cliente.get(f'/comunidad/{self.id}/')
+        self.cliente.get('/comunidad/mis-comunidades/5/')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ComunidadDAO.actualizar_comunidad(self.id, {'nombreComunidad': 'Nueva'})
+        self.assertEqual(self.cliente.get(f'/comunidad/{self.id}/').json()['nombreComunidad'], 'Nueva')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            MiembroDAO.add_miembros_lote(self.id, [5])
+        self.assertEqual(len(self.cliente.get('/comunidad/mis-comunidades/5/').json()), 1)
+        self.assertEqual(self.cliente.get('/comunidad/').json()[0]['numUsuarios'], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ComunidadDAO.crear_comunidad({'idArtista': 2, 'nombreComunidad': 'Otra'})
+        self.assertEqual(len(self.cliente.get('/comunidad/').json()), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ComunidadDAO.eliminar_comunidad(self.id)
+        self.assertEqual(self.cliente.get(f'/comunidad/{self.id}/').status_code, 404)
+        self.assertEqual(self.cliente.get('/comunidad/mis-comunidades/5/').json(), [])
+
+
+
+class ETagListadosTests(TestCase):
+
+    def setUp(self):
+        self.comunidad = Comunidad.objects.create(idArtista=1, nombreComunidad='Comunidad')
+        self.id = self.comunidad.idComunidad
+        self.publicacion = Publicacion.objects.create(idComunidad=self.comunidad, titulo='Hola')
+        ComunidadMiembros.objects.create(idComunidad=self.comunidad, idUsuario=5)
+        self.cliente = APIClient()
+        self.patcher = mock.patch('comunidades.usuarios_client.sesion.get', side_effect=respuesta_usuario)
+        self.patcher.start()
+        self.addCleanup(self.patcher.stop)
+
+    def test_304_sin_construir_la_respuesta(self):
+        for url in (f'/comunidad/publicaciones/{self.id}/', f'/comunidad/miembros/{self.id}/', f'/comunidad/vetados/{self.id}/'):
+            respuesta = self.cliente.get(url)
+            self.assertEqual(respuesta.status_code, 200)
+            etag = respuesta['ETag']
+            # Solo se lee la versión de la comunidad (y en el feed, los contadores de la página)
+            with self.assertNumQueries(2 if 'publicaciones' in url else 1):
+                respuesta = self.cliente.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(respuesta.status_code, 304)
+            self.assertEqual(respuesta['ETag'], etag)
+
+    def test_cada_pagina_tiene_su_etag(self):
+        url = f'/comunidad/publicaciones/{self.id}/'
+        self.assertNotEqual(self.cliente.get(url)['ETag'], self.cliente.get(url, {'limit': 1})['ETag'])
+
+    def test_cada_formato_tiene_su_etag(self):
+        # El formato se elige con Accept: el ETag de JSON no sirve para pedir CSV
+        url = f'/comunidad/miembros/{self.id}/'
+        vista = async_to_sync(MiembroAsyncController.as_view())
+        for pedir in (lambda cabeceras: self.cliente.get(url, {'ids_only': 'true'}, headers=cabeceras),
+                      lambda cabeceras: vista(AsyncRequestFactory().get(url, {'ids_only': 'true'}, headers=cabeceras),
+                                              idComunidad=self.id)):
+            json_ = pedir({'Accept': 'application/json'})
+            self.assertIn('Accept', json_['Vary'])
+            respuesta = pedir({'Accept': 'text/csv', 'If-None-Match': json_['ETag']})
+            self.assertEqual(respuesta.status_code, 200)
+            self.assertEqual(respuesta['Content-Type'], 'text/csv; charset=utf-8')
+            self.assertNotEqual(respuesta['ETag'], json_['ETag'])
+            self.assertIn('Accept', respuesta['Vary'])
+            no_modificado = pedir({'Accept': 'text/csv', 'If-None-Match': respuesta['ETag']})
+            self.assertEqual(no_modificado.status_code, 304)
+            self.assertIn('Accept', no_modificado['Vary'])
+
+    def test_las_escrituras_cambian_el_etag(self):
+        url = f'/comunidad/publicaciones/{self.id}/'
+        escrituras = [
+            lambda: PublicacionMeGustaDAO.dar_megusta(self.publicacion.idPublicacion, 5),
+            lambda: PublicacionMeGustaDAO.quitar_megusta(self.publicacion.idPublicacion, 5),
+            lambda: PublicacionDAO.actualizar_publicacion(self.publicacion.idPublicacion, {'titulo': 'Adiós'}),
+            lambda: PublicacionDAO.crear_publicacion({'titulo': 'Otra'}, self.id),
+            lambda: MiembroDAO.add_miembros_lote(self.id, [6]),
+            lambda: PersonasVetadasDAO.vetar_miembro(self.id, 7),
+            lambda: PersonasVetadasDAO.quitar_veto(self.id, 7),
+        ]
+        for escritura in escrituras:
+            etag = self.cliente.get(url)['ETag']
+            escritura()
+            respuesta = self.cliente.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(respuesta.status_code, 200)
+            self.assertNotEqual(respuesta['ETag'], etag)
+
+    def test_sin_etag_en_las_respuestas_de_error(self):
+        respuesta = self.cliente.get(f'/comunidad/miembros/{self.id}/', {'limit': 'x'})
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertNotIn('ETag', respuesta)
+        respuesta = async_to_sync(MiembroAsyncController.as_view())(AsyncRequestFactory().get('/', {'cursor': 'x'}), idComunidad=self.id)
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertNotIn('ETag', respuesta)
+
+    def test_los_me_gusta_no_tocan_la_comunidad(self):
+        url = f'/comunidad/miembros/{self.id}/'
+        etag = self.cliente.get(url)['ETag']
+        with CaptureQueriesContext(connection) as consultas:
+            PublicacionMeGustaDAO.dar_megusta(self.publicacion.idPublicacion, 5)
+        self.assertFalse([c['sql'] for c in consultas if 'comunidades_comunidad"' in c['sql'] and c['sql'].startswith('UPDATE')])
+        self.assertEqual(self.cliente.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN es propio de SQLite')
+class PlanesDeConsultaTests(TestCase):
+    """
+    Comprueba con EXPLAIN QUERY PLAN que las consultas de los DAO buscan por índice y no recorren tablas enteras.
+    """
+
+    def setUp(self):
+        ComunidadDAO.artistas_cache.clear()
+        self.patcher = mock.patch('comunidades.usuarios_client.sesion.get', side_effect=respuesta_usuario)
+        self.patcher.start()
+        self.addCleanup(self.patcher.stop)
+        self.comunidad = Comunidad.objects.create(idArtista=1, nombreComunidad='Comunidad')
+        self.id = self.comunidad.idComunidad
+        self.publicacion = Publicacion.objects.create(idComunidad=self.comunidad, titulo='Hola')
+        ComunidadMiembros.objects.create(idComunidad=self.comunidad, idUsuario=5)
+
+    def recorridos(self, operacion):
+        """
+        Ejecuta la operación y devuelve los pasos de los planes de sus consultas que recorren una tabla o un índice entero.
+        """
+        with CaptureQueriesContext(connection) as consultas:
+            operacion()
+        encontrados = []
+        with connection.cursor() as cursor:
+            for consulta in consultas.captured_queries:
+                sql = consulta['sql']
+                if not sql.lstrip().upper().startswith(('SELECT', 'UPDATE', 'DELETE')):
+                    continue
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                for fila in cursor.fetchall():
+                    paso = fila[-1]
+                    # 'SCAN ... USING INDEX' también recorre el índice entero: solo valen las búsquedas (SEARCH)
+                    if paso.startswith('SCAN') and 'CONSTANT ROW' not in paso:
+                        encontrados.append((paso, sql))
+        return encontrados
+
+    def test_consultas_de_los_dao_usan_indices(self):
+        id_publicacion = self.publicacion.idPublicacion
+        operaciones = [
+            lambda: ComunidadDAO.get_comunidades_usuario(5),
+            lambda: ComunidadDAO.get_comunidad_especifica(self.id),
+            lambda: ComunidadDAO.actualizar_comunidad(self.id, {'palabrasVetadas': ['uno']}),
+            lambda: MiembroDAO.add_miembro(self.id, 6),
+            lambda: MiembroDAO.get_miembro_especifico(self.id, 6),
+            lambda: MiembroDAO.get_miembros_paginados(self.id, 10),
+            lambda: MiembroDAO.get_ids_miembros(self.id, 10),
+            lambda: MiembroDAO.add_miembros_lote(self.id, [7, 8]),
+            lambda: MiembroDAO.eliminar_miembros_lote(self.id, [7, 8]),
+            lambda: MiembroDAO.eliminar_miembro(self.id, 6),
+            lambda: PublicacionDAO.crear_publicacion({'titulo': 'Otra'}, self.id),
+            lambda: PublicacionDAO.get_publicaciones_paginadas(self.id, 10),
+            lambda: PublicacionDAO.get_publicacion_especifica(id_publicacion),
+            lambda: PublicacionDAO.actualizar_publicacion(id_publicacion, {'titulo': 'Adiós'}),
+            lambda: PublicacionMeGustaDAO.dar_megusta(id_publicacion, 5),
+            lambda: PublicacionMeGustaDAO.get_likes_de_publicacion(id_publicacion),
+            lambda: PublicacionMeGustaDAO.contar_likes(id_publicacion),
+            lambda: PublicacionMeGustaDAO.get_estado_megusta(5, [id_publicacion, 999]),
+            lambda: PublicacionMeGustaDAO.quitar_megusta(id_publicacion, 5),
+            lambda: PersonasVetadasDAO.vetar_miembro(self.id, 5),
+            lambda: PersonasVetadasDAO.get_vetados(self.id),
+            lambda: PersonasVetadasDAO.quitar_veto(self.id, 5),
+            lambda: PalabrasVetadasDAO.add_palabras_vetadas(self.id, ['dos']),
+            lambda: PalabrasVetadasDAO.eliminar_palabras_vetadas(self.id, ['dos']),
+            lambda: PalabrasVetadasDAO.get_palabras_vetadas(self.id),
+            lambda: MotorModeracion.get_matcher(self.id),
+            lambda: etags.etag_listado('publicaciones')(RequestFactory().get('/'), self.id),
+            lambda: PublicacionDAO.eliminar_publicacion(id_publicacion),
+            lambda: ComunidadDAO.eliminar_comunidad(self.id),
+        ]
+        for operacion in operaciones:
+            self.assertEqual(self.recorridos(operacion), [])
+
+    def test_listado_completo_de_comunidades(self):
+        # El catálogo completo recorre la tabla de comunidades (es lo que se pide), pero nada más
+        pasos = [paso for paso, _ in self.recorridos(ComunidadDAO.get_all_comunidades)]
+        self.assertEqual(pasos, ['SCAN comunidades_comunidad'])
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', 'Ajustes propios de SQLite')
+class ConfiguracionSQLiteTests(TestCase):
+
+    def test_pragmas_aplicados_en_cada_conexion(self):
+        with connection.cursor() as cursor:
+            self.assertEqual(cursor.execute('PRAGMA synchronous').fetchone()[0], 1)  # NORMAL
+            self.assertGreater(cursor.execute('PRAGMA busy_timeout').fetchone()[0], 0)
+        # Las transacciones son DEFERRED: solo las de escritura (basedatos.escritura) toman el bloqueo al empezar
+        self.assertIsNone(connection.transaction_mode)
+
+    def test_version_minima_de_sqlite(self):
+        self.assertEqual(basedatos.comprobar_version_sqlite(), [])
+        with mock.patch('sqlite3.sqlite_version_info', (3, 31, 1)):
+            self.assertEqual([e.id for e in basedatos.comprobar_version_sqlite()], ['comunidades.E001'])
+
+
+class ServicioUsuariosFalso(BaseHTTPRequestHandler):
+    """
+    Servidor HTTP local que responde con los códigos de 'respuestas' (en orden; el último se repite).
+    """
+    respuestas = [200]
+    retardo = 0
+    llamadas = 0
+
+    def do_GET(self):
+        cls = type(self)
+        codigo = cls.respuestas[min(cls.llamadas, len(cls.respuestas) - 1)]
+        cls.llamadas += 1
+        time.sleep(cls.retardo)
+        try:
+            self.send_response(codigo)
+            self.send_header('Content-Type', 'application/json')
+            self.end_headers()
+            self.wfile.write(b'{"id": 1}')
+        except (BrokenPipeError, ConnectionResetError):
+            # El cliente ya se ha cansado de esperar
+            pass
+
+    def log_message(self, *args):
+        pass
+
+
+@override_settings(USER_SERVICE_BACKOFF=0, USER_SERVICE_RETRIES=2)
+class ClienteUsuariosTests(TestCase):
+
+    def setUp(self):
+        ServicioUsuariosFalso.respuestas = [200]
+        ServicioUsuariosFalso.retardo = 0
+        ServicioUsuariosFalso.llamadas = 0
+        self.servidor = ThreadingHTTPServer(('127.0.0.1', 0), ServicioUsuariosFalso)
+        threading.Thread(target=self.servidor.serve_forever, daemon=True).start()
+        self.addCleanup(self.servidor.server_close)
+        self.addCleanup(self.servidor.shutdown)
+        self.url = f'http://127.0.0.1:{self.servidor.server_port}/artistas/1'
+
+        # Sesión y cortocircuito nuevos para cada prueba
+        patcher = mock.patch.multiple(
+            usuarios_client,
+            sesion=usuarios_client._crear_sesion(),
+            circuito=usuarios_client.CircuitBreaker(umbral=0.5, minimo=4, ventana=10, espera=60),
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_reintenta_los_errores_transitorios(self):
+        ServicioUsuariosFalso.respuestas = [503, 502, 200]
+        self.assertEqual(usuarios_client.get(self.url).status_code, 200)
+        self.assertEqual(ServicioUsuariosFalso.llamadas, 3)
+
+    def test_tiempo_maximo_de_lectura(self):
+        ServicioUsuariosFalso.retardo = 0.5
+        inicio = time.monotonic()
+        with self.assertRaises(requests.RequestException):
+            usuarios_client.get(self.url, timeout=(1, 0.05))
+        # Tres intentos (con sus reintentos), ninguno espera la respuesta completa
+        self.assertLess(time.monotonic() - inicio, 1.2)
+
+    def test_cortocircuito_falla_rapido_y_se_recupera(self):
+        ServicioUsuariosFalso.respuestas = [500]
+        for _ in range(4):
+            self.assertEqual(usuarios_client.get(self.url).status_code, 500)
+        llamadas = ServicioUsuariosFalso.llamadas
+        self.assertEqual(usuarios_client.circuito.estado, 'abierto')
+
+        # Con el circuito abierto no se llega al servicio
+        with self.assertRaises(ExternalServiceError):
+            usuarios_client.get(self.url)
+        self.assertEqual(ServicioUsuariosFalso.llamadas, llamadas)
+
+        # Pasada la espera, una llamada correcta lo vuelve a cerrar
+        ServicioUsuariosFalso.respuestas = [200]
+        ServicioUsuariosFalso.llamadas = 0
+        usuarios_client.circuito.espera = 0
+        self.assertEqual(usuarios_client.get(self.url).status_code, 200)
+        self.assertEqual(usuarios_client.circuito.estado, 'cerrado')
+
+    def test_cliente_async_con_reintentos_y_cortocircuito(self):
+        ServicioUsuariosFalso.respuestas = [503, 502, 200]
+        aget = async_to_sync(usuarios_client.aget)
+        self.assertEqual(aget(self.url).status_code, 200)
+        self.assertEqual(ServicioUsuariosFalso.llamadas, 3)
+
+        ServicioUsuariosFalso.respuestas = [500]
+        usuarios_client.circuito.reiniciar()
+        for _ in range(4):
+            self.assertEqual(aget(self.url).status_code, 500)
+        with self.assertRaises(ExternalServiceError):
+            aget(self.url)
+
+        # Los errores de conexión también cuentan y se propagan agotados los reintentos
+        usuarios_client.circuito.reiniciar()
+        with self.assertRaises(httpx.TransportError):
+            aget('http://127.0.0.1:9/artistas/1')
+
+
+class ModoDegradadoTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        ComunidadDAO.artistas_cache.clear()
+        MiembroDAO.usuarios_respaldo.clear()
+        usuarios_client.circuito.reiniciar()
+        self.addCleanup(usuarios_client.circuito.reiniciar)
+        for i in range(1, 4):
+            comunidad = Comunidad.objects.create(idArtista=i, nombreComunidad=f'Comunidad {i}')
+            ComunidadMiembros.objects.create(idComunidad=comunidad, idUsuario=100 + i)
+        self.comunidad = comunidad
+
+    def test_catalogo_con_artistas_parciales(self):
+        # El artista 1 se conoce de antes (ya caducado); el 2 falla y el 3 no responde a tiempo
+        with mock.patch.object(ComunidadDAO.artistas_cache, 'ttl', 0), \
+             mock.patch('comunidades.usuarios_client.sesion.get', side_effect=respuesta_artista):
+            ComunidadDAO.get_artista(1)
+
+        def respuesta_con_fallos(url, timeout=None):
+            if url.endswith('/3'):
+                time.sleep(1)
+            if url.endswith('/1') or url.endswith('/2'):
+                return mock.Mock(status_code=503)
+            return respuesta_artista(url)
+
+        inicio = time.monotonic()
+        with override_settings(USER_SERVICE_DEADLINE=0.2), \
+             mock.patch('comunidades.usuarios_client.sesion.get', side_effect=respuesta_con_fallos):
+            respuesta = APIClient().get('/comunidad/')
+        self.assertLess(time.monotonic() - inicio, 1)
+        self.assertEqual(respuesta.status_code, 200)
+        artistas = [c['artista'] for c in respuesta.json()]
+        self.assertEqual([(a['idArtista'], a['nombreUsuario'], a['partial']) for a in artistas],
+                         [(1, 'artista1', True), (2, None, True), (3, None, True)])
+
+        # Las respuestas parciales no se cachean
+        with mock.patch('comunidades.usuarios_client.sesion.get', side_effect=respuesta_artista):
+            artistas = [c['artista'] for c in APIClient().get('/comunidad/').json()]
+        self.assertFalse(any(a['partial'] for a in artistas))
+
+    def test_miembros_parciales(self):
+        with mock.patch('comunidades.usuarios_client.sesion.get', side_effect=respuesta_usuario):
+            MiembroDAO.get_miembros_paginados(self.comunidad.idComunidad, 10)
+        ComunidadMiembros.objects.create(idComunidad=self.comunidad, idUsuario=200)
+
+        with mock.patch('comunidades.usuarios_client.sesion.get', side_effect=requests.ConnectionError('caído')):
+            miembros, _ = MiembroDAO.get_miembros_paginados(self.comunidad.idComunidad, 10)
+        self.assertEqual([(m.idUsuario, m.nombreUsuario, m.partial) for m in miembros],
+                         [(103, 'usuario103', True), (200, None, True)])
+
+    def test_miembros_parciales_sin_etag(self):
+        # Las respuestas degradadas no se revalidan: la siguiente petición debe llegar al servicio de usuarios
+        url = f'/comunidad/miembros/{self.comunidad.idComunidad}/'
+        vista = MiembroAsyncController.as_view()
+        with mock.patch('comunidades.usuarios_client.sesion.get', side_effect=requests.ConnectionError('caído')), \
+             mock.patch('httpx.AsyncClient.get', side_effect=httpx.ConnectError('caído')):
+            respuestas = [
+                APIClient().get(url),
+                async_to_sync(vista)(AsyncRequestFactory().get(url), idComunidad=self.comunidad.idComunidad),
+                APIClient().get(url, {'format': 'ndjson'}),
+            ]
+        for respuesta in respuestas:
+            self.assertEqual(respuesta.status_code, 200)
+            self.assertNotIn('ETag', respuesta)
+            self.assertEqual(respuesta['Cache-Control'], 'no-store')
+        self.assertTrue(json.loads(respuestas[1].content)[0]['partial'])
+
+        with mock.patch('comunidades.usuarios_client.sesion.get', side_effect=respuesta_usuario):
+            respuesta = APIClient().get(url)
+        self.assertIn('ETag', respuesta)
+        self.assertFalse(respuesta.json()[0]['partial'])
+        # Solo los ids no dependen del servicio de usuarios
+        self.assertIn('ETag', APIClient().get(url, {'format': 'ndjson', 'ids_only': 'true'}))
+
+
+class ControladoresAsyncTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        ComunidadDAO.artistas_cache.clear()
+        self.factory = AsyncRequestFactory()
+        for i in range(1, 6):
+            comunidad = Comunidad.objects.create(idArtista=i, nombreComunidad=f'Comunidad {i}')
+        for usuario in range(100, 120):
+            ComunidadMiembros.objects.create(idComunidad=comunidad, idUsuario=usuario)
+        self.comunidad = comunidad
+        # Las vistas async usan el cliente asíncrono; la síncrona (para comparar), la sesión de requests
+        for destino in ('comunidades.usuarios_client.sesion.get', 'httpx.AsyncClient.get'):
+            patcher = mock.patch(destino, side_effect=respuesta_artista)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    async def test_catalogo_igual_que_el_controlador_sincrono(self):
+        asincrona = await ComunidadAsyncController.as_view()(self.factory.get('/comunidad/'))
+        cache.clear()
+        sincrona = await sync_to_async(lambda: APIClient().get('/comunidad/'))()
+        self.assertEqual(asincrona.status_code, 200)
+        self.assertEqual(json.loads(asincrona.content), sincrona.json())
+
+        detalle = await ComunidadAsyncController.as_view()(self.factory.get('/'), idComunidad=self.comunidad.idComunidad)
+        self.assertEqual(json.loads(detalle.content)['artista']['nombreUsuario'], 'artista5')
+        no_existe = await ComunidadAsyncController.as_view()(self.factory.get('/'), idComunidad=9999)
+        self.assertEqual(no_existe.status_code, 404)
+
+    async def test_las_escrituras_se_delegan_en_el_controlador_sincrono(self):
+        peticion = self.factory.post('/comunidad/', {'idArtista': 50, 'nombreComunidad': 'Nueva'}, content_type='application/json')
+        respuesta = await ComunidadAsyncController.as_view()(peticion)
+        self.assertEqual(respuesta.status_code, 201)
+        self.assertTrue(await Comunidad.objects.filter(idArtista=50).aexists())
+
+    async def test_miembros_concurrentes_y_etag(self):
+        en_curso = []
+        maximo = []
+
+        async def respuesta_contada(url, timeout=None):
+            en_curso.append(url)
+            maximo.append(len(en_curso))
+            await asyncio.sleep(0.01)
+            en_curso.remove(url)
+            return respuesta_usuario(url)
+
+        vista = MiembroAsyncController.as_view()
+        with mock.patch('httpx.AsyncClient.get', side_effect=respuesta_contada), \
+             override_settings(USER_SERVICE_MAX_WORKERS=4):
+            respuesta = await vista(self.factory.get('/', {'limit': 15}), idComunidad=self.comunidad.idComunidad)
+        self.assertEqual([m['idUsuario'] for m in json.loads(respuesta.content)], list(range(100, 115)))
+        self.assertLessEqual(max(maximo), 4)
+        self.assertGreater(max(maximo), 1)
+        self.assertIn('X-Next-Cursor', respuesta.headers)
+
+        no_modificado = await vista(self.factory.get('/', {'limit': 15}, headers={'If-None-Match': respuesta['ETag']}),
+                                    idComunidad=self.comunidad.idComunidad)
+        self.assertEqual(no_modificado.status_code, 304)
+
+    async def test_tiempo_maximo_con_y_sin_degradar(self):
+        async def respuesta_lenta(url, timeout=None):
+            if url.endswith('/3'):
+                await asyncio.sleep(1)
+            return respuesta_artista(url)
+
+        inicio = time.monotonic()
+        with mock.patch('httpx.AsyncClient.get', side_effect=respuesta_lenta):
+            resultado = await usuarios_client.amap_concurrente(
+                ComunidadDAO._afetch_artista, [1, 2, 3], deadline=0.2, alternativa=ComunidadDAO._artista_degradado)
+            self.assertEqual([a.partial for a in resultado], [False, False, True])
+            with self.assertRaises(ExternalServiceError):
+                await usuarios_client.amap_concurrente(ComunidadDAO._afetch_artista, [1, 2, 3], deadline=0.2)
+        # La llamada lenta se cancela al vencer el plazo: no se espera a que termine
+        self.assertLess(time.monotonic() - inicio, 1)
+
+
+class RenderizadoTests(TestCase):
+
+    def setUp(self):
+        fecha = datetime(2025, 3, 1, 12, 30, 15, 123456, tzinfo=timezone.utc)
+        artista = ArtistaDTO(idArtista=1, nombreUsuario='artista1', rutaFoto=None, esNovedad=True, oyentes=5, genero=None)
+        self.datos = [
+            ComunidadDTO(idComunidad=1, artista=artista, nombreComunidad='Fans \u2028 ñ', descComunidad=None, rutaImagen=None,
+                         fechaCreacion=fecha, numPublicaciones=2, numUsuarios=3, palabrasVetadas=['a', 'b']),
+            PublicacionDTO(idPublicacion=1, idComunidad=1, titulo='Hola', contenido='', rutaFichero=None, fecha=fecha, meGusta=0),
+        ]
+
+    def test_mismo_json_que_asdict_con_json_renderer(self):
+        esperado = JSONRenderer().render([asdict(d) for d in self.datos])
+        self.assertEqual(renderizado.serializar(self.datos, usar_orjson=False), esperado)
+        if renderizado.orjson is not None:
+            self.assertEqual(renderizado.serializar(self.datos), esperado)
+        self.assertEqual(json.loads(esperado)[0]['fechaCreacion'], '2025-03-01T12:30:15.123456Z')
+        # Claves no textuales (resultados por id) y respuestas sin contenido
+        self.assertEqual(renderizado.serializar({7: 'ok'}), b'{"7":"ok"}')
+        self.assertEqual(renderizado.RenderizadorJSON().render(None), b'')
+
+    def test_convertidor_de_dto(self):
+        comunidad, publicacion = self.datos
+        self.assertEqual(renderizado.a_dict(publicacion), asdict(publicacion))
+        # Los DTO anidados se quedan como objetos
+        self.assertIs(renderizado.a_dict(comunidad)['artista'], comunidad.artista)
+        UnCampo = dataclasses.make_dataclass('UnCampo', ['valor'])
+        self.assertEqual(renderizado.a_dict(UnCampo(3)), {'valor': 3})
+
+    def test_benchmark(self):
+        salida = io.StringIO()
+        call_command('benchmark_serializacion', n=100, repeticiones=1, stdout=salida)
+        self.assertIn('antes (asdict + JSONRenderer)', salida.getvalue())
+
+
+class ExportacionStreamingTests(TestCase):
+
+    def setUp(self):
+        self.comunidad = Comunidad.objects.create(idArtista=1, nombreComunidad='Comunidad')
+        ComunidadMiembros.objects.bulk_create([ComunidadMiembros(idComunidad=self.comunidad, idUsuario=u) for u in range(100, 105)])
+        self.publicacion = Publicacion.objects.create(idComunidad=self.comunidad, titulo='Publicación')
+        PublicacionMeGusta.objects.bulk_create([PublicacionMeGusta(idPublicacion=self.publicacion, idUsuario=u) for u in range(100, 105)])
+        self.url_likes = f'/comunidad/publicaciones/megusta/{self.publicacion.idPublicacion}/'
+        self.url_miembros = f'/comunidad/miembros/{self.comunidad.idComunidad}/'
+        self.patcher = mock.patch('comunidades.usuarios_client.sesion.get', side_effect=respuesta_usuario)
+        self.patcher.start()
+        self.addCleanup(self.patcher.stop)
+
+    @staticmethod
+    def contenido(respuesta) -> bytes:
+        return b''.join(respuesta.streaming_content)
+
+    def test_likes_en_ndjson_por_trozos(self):
+        with mock.patch.object(renderizado, 'TAM_TROZO', 2):
+            respuesta = APIClient().get(self.url_likes, {'format': 'ndjson'})
+            self.assertTrue(respuesta.streaming)
+            self.assertEqual(respuesta['Content-Type'], 'application/x-ndjson')
+            trozos = list(respuesta.streaming_content)
+        self.assertEqual([t.count(b'\n') for t in trozos], [2, 2, 1])
+        likes = [json.loads(linea) for linea in b''.join(trozos).splitlines()]
+        self.assertEqual([l['idUsuario'] for l in likes], list(range(100, 105)))
+        self.assertEqual(likes, APIClient().get(self.url_likes).json())
+
+    def test_likes_en_csv(self):
+        for respuesta in (APIClient().get(self.url_likes, {'format': 'csv'}),
+                          APIClient().get(self.url_likes, HTTP_ACCEPT='text/csv')):
+            self.assertEqual(respuesta['Content-Type'], 'text/csv; charset=utf-8')
+            self.assertIn('attachment', respuesta['Content-Disposition'])
+            filas = list(csv.reader(io.StringIO(self.contenido(respuesta).decode())))
+            self.assertEqual(filas[0], ['idPublicacion', 'idUsuario', 'fechaMeGusta'])
+            self.assertEqual([f[1] for f in filas[1:]], [str(u) for u in range(100, 105)])
+            self.assertTrue(filas[1][2].endswith('Z'))
+        vacio = APIClient().get('/comunidad/publicaciones/megusta/9999/', {'format': 'csv'})
+        self.assertEqual(self.contenido(vacio), b'idPublicacion,idUsuario,fechaMeGusta\r\n')
+
+    def test_miembros_completos_y_solo_ids(self):
+        respuesta = APIClient().get(self.url_miembros, {'format': 'csv'})
+        filas = list(csv.reader(io.StringIO(self.contenido(respuesta).decode())))
+        self.assertEqual(filas[0], ['idUsuario', 'nombreUsuario', 'esArtista', 'rutaFoto', 'partial'])
+        self.assertEqual(filas[1], ['100', 'usuario100', 'false', '', 'false'])
+        self.assertEqual(len(filas), 6)
+
+        with mock.patch('comunidades.usuarios_client.sesion.get') as get:
+            respuesta = APIClient().get(self.url_miembros, {'format': 'ndjson', 'ids_only': 'true'})
+            miembros = [json.loads(l) for l in self.contenido(respuesta).splitlines()]
+        get.assert_not_called()
+        self.assertEqual([m['idUsuario'] for m in miembros], list(range(100, 105)))
+        self.assertEqual(set(miembros[0]), {'idUsuario', 'fechaUnion'})
+
+    async def test_miembros_en_la_vista_async(self):
+        respuesta = await MiembroAsyncController.as_view()(
+            AsyncRequestFactory().get('/', {'format': 'ndjson'}), idComunidad=self.comunidad.idComunidad)
+        self.assertTrue(respuesta.is_async)
+        contenido = b''.join([trozo async for trozo in respuesta.streaming_content])
+        self.assertEqual([json.loads(l)['nombreUsuario'] for l in contenido.splitlines()], [f'usuario{u}' for u in range(100, 105)])
+
+    async def test_formato_por_accept_en_la_vista_async(self):
+        vista = MiembroAsyncController.as_view()
+        factory = AsyncRequestFactory()
+        csv_async = await vista(factory.get('/', {'ids_only': 'true'}, headers={'Accept': 'text/csv'}), idComunidad=self.comunidad.idComunidad)
+        self.assertEqual(csv_async['Content-Type'], 'text/csv; charset=utf-8')
+        contenido = b''.join([trozo async for trozo in csv_async.streaming_content])
+        self.assertEqual(contenido.decode().splitlines()[0], 'idUsuario,fechaUnion')
+
+        ndjson = await vista(factory.get('/', headers={'Accept': 'application/x-ndjson'}), idComunidad=self.comunidad.idComunidad)
+        self.assertEqual(ndjson['Content-Type'], 'application/x-ndjson')
+        json_async = await vista(factory.get('/', {'ids_only': 'true'}, headers={'Accept': 'application/json'}),
+                                 idComunidad=self.comunidad.idComunidad)
+        self.assertEqual(len(json.loads(json_async.content)), 5)
+        no_admitido = await vista(factory.get('/', headers={'Accept': 'image/png'}), idComunidad=self.comunidad.idComunidad)
+        self.assertEqual(no_admitido.status_code, 406)
+
+
+@override_settings(MEGUSTA_BUFFER=True, MEGUSTA_BUFFER_INTERVALO=0, MEGUSTA_BUFFER_TAMANO=100)
+class MeGustaBufferTests(TestCase):
+
+    def setUp(self):
+        comunidad = Comunidad.objects.create(idArtista=1, nombreComunidad='Comunidad')
+        ComunidadMiembros.objects.bulk_create([ComunidadMiembros(idComunidad=comunidad, idUsuario=u) for u in (1, 2, 3)])
+        self.publicacion = Publicacion.objects.create(idComunidad=comunidad, titulo='Publicación')
+        self.id = self.publicacion.idPublicacion
+        self.buffer = buffer_megusta.buffer
+        self.addCleanup(self.buffer.volcar)
+
+    def test_operaciones_pendientes_visibles_y_volcadas_por_lotes(self):
+        PublicacionMeGusta.objects.create(idPublicacion=self.publicacion, idUsuario=3)
+        Publicacion.objects.filter(pk=self.id).update(meGusta=1)
+
+        self.assertEqual(PublicacionMeGustaDAO.dar_megusta(self.id, 1), 2)
+        self.assertEqual(PublicacionMeGustaDAO.dar_megusta(self.id, 2), 3)
+        self.assertEqual(PublicacionMeGustaDAO.dar_megusta(self.id, 2), 3)
+        # Dar y quitar antes del volcado se anulan
+        self.assertEqual(PublicacionMeGustaDAO.quitar_megusta(self.id, 1), 2)
+        self.assertEqual(PublicacionMeGustaDAO.quitar_megusta(self.id, 3), 1)
+        self.assertEqual(len(self.buffer), 2)
+
+        # Nada escrito todavía, pero las lecturas ya cuentan lo pendiente
+        self.assertEqual(list(PublicacionMeGusta.objects.values_list('idUsuario', flat=True)), [3])
+        self.assertEqual(PublicacionMeGustaDAO.contar_likes(self.id), 1)
+        self.assertEqual([l.idUsuario for l in PublicacionMeGustaDAO.get_likes_de_publicacion(self.id)], [2])
+        self.assertEqual([l.idUsuario for l in PublicacionMeGustaDAO.iterar_likes_de_publicacion(self.id)], [2])
+        estado = PublicacionMeGustaDAO.get_estado_megusta(2, [self.id])
+        self.assertEqual((estado.meGustan, estado.meGusta), ([self.id], {self.id: 1}))
+
+        with self.assertRaises(BusinessRuleError):
+            PublicacionMeGustaDAO.dar_megusta(self.id, 99)
+        with self.assertRaises(NotFoundError):
+            PublicacionMeGustaDAO.dar_megusta(9999, 1)
+
+        self.assertEqual(self.buffer.volcar(), 2)
+        self.assertEqual(len(self.buffer), 0)
+        self.assertEqual(list(PublicacionMeGusta.objects.values_list('idUsuario', flat=True)), [2])
+        self.publicacion.refresh_from_db()
+        self.assertEqual(self.publicacion.meGusta, 1)
+        self.assertEqual(PublicacionMeGustaDAO.contar_likes(self.id), 1)
+
+    def test_volcado_al_llenarse(self):
+        with override_settings(MEGUSTA_BUFFER_TAMANO=2):
+            PublicacionMeGustaDAO.dar_megusta(self.id, 1)
+            self.assertFalse(PublicacionMeGusta.objects.exists())
+            PublicacionMeGustaDAO.dar_megusta(self.id, 2)
+        self.assertEqual(len(self.buffer), 0)
+        self.assertEqual(PublicacionMeGusta.objects.count(), 2)
+        self.publicacion.refresh_from_db()
+        self.assertEqual(self.publicacion.meGusta, 2)
+
+    def test_publicacion_borrada_antes_del_volcado(self):
+        PublicacionMeGustaDAO.dar_megusta(self.id, 1)
+        self.publicacion.delete()
+        self.assertEqual(self.buffer.volcar(), 1)
+        self.assertFalse(PublicacionMeGusta.objects.exists())
+
+    def test_volcado_fallido_se_registra_y_se_reintenta(self):
+        PublicacionMeGustaDAO.dar_megusta(self.id, 1)
+        with mock.patch.object(buffer_megusta.BufferMeGusta, '_escribir', side_effect=RuntimeError('sin base de datos')), \
+             self.assertLogs('comunidades.buffer_megusta', 'ERROR') as registro:
+            self.assertEqual(self.buffer.volcar(), 1)
+        self.assertIn('sin base de datos', registro.output[0])
+        # El lote vuelve al buffer y se escribe en el siguiente volcado
+        self.assertEqual(len(self.buffer), 1)
+        self.assertEqual(self.buffer.volcar(), 1)
+        self.assertEqual(PublicacionMeGusta.objects.count(), 1)
+
+    def test_conflictos_y_fecha_del_me_gusta(self):
+        PublicacionMeGustaDAO.dar_megusta(self.id, 1)
+        PublicacionMeGustaDAO.dar_megusta(self.id, 2)
+        fechas = {u: fecha for u, (_, fecha) in buffer_megusta.BufferMeGusta.de_publicacion(self.buffer._pendientes, self.id).items()}
+        # Otro proceso guarda el me gusta del usuario 1 antes del volcado
+        PublicacionMeGusta.objects.create(idPublicacion=self.publicacion, idUsuario=1)
+        Publicacion.objects.filter(pk=self.id).update(meGusta=1)
+        time.sleep(0.01)
+
+        self.assertEqual(self.buffer.volcar(), 2)
+        self.assertEqual(len(self.buffer), 0)
+        self.assertEqual(sorted(PublicacionMeGusta.objects.values_list('idUsuario', flat=True)), [1, 2])
+        # Solo cuenta el me gusta que se ha insertado de verdad, con la fecha en que se dio y no la del volcado
+        self.publicacion.refresh_from_db()
+        self.assertEqual(self.publicacion.meGusta, 2)
+        self.assertEqual(PublicacionMeGusta.objects.get(idUsuario=2).fechaMeGusta, fechas[2])
+
+
+class MeGustaConcurrenteTests(TransactionTestCase):
+
+    def test_mil_me_gusta_simultaneos(self):
+        comunidad = Comunidad.objects.create(idArtista=1, nombreComunidad='Comunidad')
+        ComunidadMiembros.objects.bulk_create([ComunidadMiembros(idComunidad=comunidad, idUsuario=u) for u in range(250)])
+        publicacion = Publicacion.objects.create(idComunidad=comunidad, titulo='Publicación')
+
+        # 1000 me gustas lanzados a la vez desde 100 hilos (como peticiones simultáneas): cada miembro da me gusta 4 veces
+        def dar(usuario):
+            try:
+                return PublicacionMeGustaDAO.dar_megusta(publicacion.idPublicacion, usuario)
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=100) as hilos:
+            futuros = [hilos.submit(dar, u % 250) for u in range(1000)]
+        errores = [f.exception() for f in futuros if f.exception()]
+
+        self.assertEqual(errores, [])
+        publicacion.refresh_from_db()
+        self.assertEqual(publicacion.meGusta, 250)
+        self.assertEqual(PublicacionMeGusta.objects.filter(idPublicacion=publicacion).count(), 250)
+        # Cada llamada devuelve el contador tras su operación: el mayor es el final
+        self.assertEqual(max(f.result() for f in futuros), 250)
+
+    def test_solo_las_escrituras_toman_el_bloqueo(self):
+        with CaptureQueriesContext(connection) as consultas:
+            with transaction.atomic():
+                Comunidad.objects.exists()
+            with basedatos.escritura():
+                Comunidad.objects.create(idArtista=1, nombreComunidad='Comunidad')
+        self.assertEqual([q['sql'] for q in consultas.captured_queries if q['sql'].startswith('BEGIN')],
+                         ['BEGIN', 'BEGIN IMMEDIATE'])
+        self.assertIsNone(connection.transaction_mode)
+
+
+@override_settings(ADMISION_CACHE=True)
+class CacheAdmisionTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        admision.clear()
+        self.addCleanup(admision.clear)
+        self.comunidad = Comunidad.objects.create(idArtista=7, nombreComunidad='Comunidad')
+        self.id = self.comunidad.idComunidad
+        ComunidadMiembros.objects.bulk_create([ComunidadMiembros(idComunidad=self.comunidad, idUsuario=u) for u in (1, 5)])
+        PersonasVetadas.objects.create(idComunidad=self.comunidad, idUsuario=2)
+        # Lo cargado dentro de una transacción solo se guarda al confirmarse
+        with self.captureOnCommitCallbacks(execute=True):
+            admision.get(self.id)
+
+    def test_conjunto_ordenado(self):
+        ids = ConjuntoIds([1, 5, 9])
+        ids.añadir([3, 5])
+        ids.quitar([9, 4])
+        self.assertEqual(list(ids), [1, 3, 5])
+        ids.añadir(range(100, 200))
+        ids.quitar(range(100, 150))
+        self.assertEqual(len(ids), 53)
+        self.assertIn(150, ids)
+        self.assertNotIn(149, ids)
+
+    def test_comprobaciones_en_memoria(self):
+        with self.assertNumQueries(0):
+            with self.assertRaises(AlreadyExistsError):
+                MiembroDAO.add_miembro(self.id, 1)
+            with self.assertRaises(BusinessRuleError):
+                MiembroDAO.add_miembro(self.id, 7)
+            with self.assertRaises(BusinessRuleError):
+                MiembroDAO.add_miembro(self.id, '2')
+
+    def test_escrituras_actualizan_la_cache(self):
+        with self.captureOnCommitCallbacks(execute=True), \
+             mock.patch('comunidades.usuarios_client.sesion.get', side_effect=respuesta_usuario):
+            MiembroDAO.add_miembro(self.id, 3)
+            PersonasVetadasDAO.vetar_miembro(self.id, 5)
+            PersonasVetadasDAO.quitar_veto(self.id, 2)
+            MiembroDAO.add_miembros_lote(self.id, [10, 11])
+        entrada = admision.get(self.id)
+        self.assertEqual((list(entrada.miembros), list(entrada.vetados)), ([1, 3, 10, 11], [5]))
+        self.assertEqual(admision.stats()['misses'], 1)
+
+    def test_version_solo_al_caducar(self):
+        with mock.patch.object(CacheAdmision, 'version', wraps=CacheAdmision.version) as version:
+            for _ in range(3):
+                admision.get(self.id)
+            self.assertEqual(version.call_count, 0)
+            admision._datos[self.id].caduca = 0
+            # Con locmem la versión es de cada proceso: al caducar se recarga
+            admision.get(self.id)
+        self.assertEqual(version.call_count, 1)
+        self.assertEqual(admision.stats()['misses'], 2)
+
+    def test_cambios_de_otro_proceso_con_cache_compartida(self):
+        directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directorio, ignore_errors=True)
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                                                   'LOCATION': directorio}}):
+            admision.clear()
+            with self.captureOnCommitCallbacks(execute=True):
+                admision.get(self.id)
+            # Sin cambios, al caducar se renueva sin recargarla
+            admision._datos[self.id].caduca = 0
+            with self.assertNumQueries(0):
+                admision.get(self.id)
+            self.assertEqual(admision.stats()['misses'], 1)
+
+            # Otro proceso añade un miembro y sube la versión de la comunidad al confirmar su escritura
+            ComunidadMiembros.objects.create(idComunidad=self.comunidad, idUsuario=3)
+            CacheAdmision._subir_version(self.id)
+            self.assertNotIn(3, admision.get(self.id).miembros)
+            admision._datos[self.id].caduca = 0
+            self.assertIn(3, admision.get(self.id).miembros)
+            self.assertEqual(admision.stats()['misses'], 2)
+
+    def test_veto_de_otro_proceso_aun_no_visible(self):
+        # El veto de otro proceso no llega a la caché hasta que caducan sus datos (ADMISION_CACHE_TTL)
+        PersonasVetadas.objects.bulk_create([PersonasVetadas(idComunidad=self.comunidad, idUsuario=u) for u in (3, 4)])
+        self.assertNotIn(3, admision.get(self.id).vetados)
+        with self.assertRaises(BusinessRuleError):
+            MiembroDAO.add_miembro(self.id, 3)
+        resultado = MiembroDAO.add_miembros_lote(self.id, [4, 6])
+        self.assertEqual(resultado['resultados'], {4: 'vetado', 6: 'añadido'})
+        self.assertEqual(sorted(ComunidadMiembros.objects.filter(idComunidad=self.comunidad).values_list('idUsuario', flat=True)), [1, 5, 6])
+
+    def test_miembro_de_otro_proceso_aun_no_visible(self):
+        # Otro proceso añade al usuario 3 y la caché todavía no lo sabe: lo rechaza el índice único
+        ComunidadMiembros.objects.create(idComunidad=self.comunidad, idUsuario=3)
+        self.assertNotIn(3, admision.get(self.id).miembros)
+        with self.assertRaises(AlreadyExistsError):
+            MiembroDAO.add_miembro(self.id, 3)
+        self.assertEqual(ComunidadMiembros.objects.filter(idComunidad=self.comunidad, idUsuario=3).count(), 1)
+        self.comunidad.refresh_from_db()
+        self.assertEqual(self.comunidad.numUsuarios, 0)
+
+    def test_expulsa_las_comunidades_menos_usadas(self):
+        otra = Comunidad.objects.create(idArtista=8, nombreComunidad='Otra')
+        ComunidadMiembros.objects.bulk_create([ComunidadMiembros(idComunidad=otra, idUsuario=u) for u in (1, 2)])
+        self.addCleanup(setattr, admision, 'max_ids', admision.max_ids)
+        admision.max_ids = 4
+        with self.captureOnCommitCallbacks(execute=True):
+            admision.get(otra.idComunidad)
+        self.assertEqual(admision.stats()['comunidades'], 1)
+        self.assertEqual(admision.stats()['ids'], 2)
+
+    def test_me_gusta_de_quien_no_es_miembro(self):
+        publicacion = Publicacion.objects.create(idComunidad=self.comunidad, titulo='Publicación')
+        admision.comunidad_de_publicacion(publicacion.idPublicacion)
+        with self.assertNumQueries(0):
+            with self.assertRaises(BusinessRuleError):
+                PublicacionMeGustaDAO.dar_megusta(publicacion.idPublicacion, 99)
+        self.assertEqual(PublicacionMeGustaDAO.dar_megusta(publicacion.idPublicacion, 1), 1)
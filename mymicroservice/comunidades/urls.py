@@ -1,18 +1,25 @@
+from django.conf import settings
 from django.urls import path
-from comunidades.controller.comunidad_controller import ComunidadController, ComunidadesUsuarioController 
-from comunidades.controller.miembro_controller import MiembroController
+from comunidades.controller.comunidad_controller import ComunidadController, ComunidadesUsuarioController, ComunidadAsyncController, ComunidadesUsuarioAsyncController
+from comunidades.controller.miembro_controller import MiembroController, MiembrosLoteController, MiembroAsyncController
 from comunidades.controller.publicacion_controller import PublicacionController
-from comunidades.controller.publicacionMeGusta_controller import PublicacionMeGustaController
+from comunidades.controller.publicacionMeGusta_controller import PublicacionMeGustaController, PublicacionMeGustaEstadoController
 from comunidades.controller.personasVetadas_controller import PersonasVetadasController
 from comunidades.controller.palabrasVetadas_controller import PalabrasVetadasController
 
+# Con CONTROLADORES_ASYNC (perfil ASGI) las rutas que esperan al servicio de usuarios usan los controladores asíncronos
+if settings.CONTROLADORES_ASYNC:
+    Comunidades, ComunidadesUsuario, Miembros = ComunidadAsyncController, ComunidadesUsuarioAsyncController, MiembroAsyncController
+else:
+    Comunidades, ComunidadesUsuario, Miembros = ComunidadController, ComunidadesUsuarioController, MiembroController
+
 urlpatterns = [
 
     # --- Comunidades ---
     # GET (listar), POST (crear)
-    path('', ComunidadController.as_view()), 
+    path('', Comunidades.as_view()), 
     # GET (específica), DELETE (borrar), PUT (actualizar)
-    path('<int:idComunidad>/', ComunidadController.as_view()),
+    path('<int:idComunidad>/', Comunidades.as_view()),
     
     # --- Palabras Vetadas ---
     # GET (todas), POST (añadir), PUT (reemplazar lista), DELETE (eliminar específica)
@@ -20,15 +27,19 @@ urlpatterns = [
 
     # --- Mis Comunidades (del usuario logueado) ---
     # GET (todas las comunidades de un usuario)
-    path('mis-comunidades/<int:idUsuario>/', ComunidadesUsuarioController.as_view()),
+    path('mis-comunidades/<int:idUsuario>/', ComunidadesUsuario.as_view()),
         
     # --- Miembros --- 
     # GET (listar), POST (añadir)
-    path('miembros/<int:idComunidad>/', MiembroController.as_view()),
+    path('miembros/<int:idComunidad>/', Miembros.as_view()),
+    # POST (añadir muchos), DELETE (eliminar muchos) - body: array JSON o NDJSON con ids de usuario
+    path('miembros/<int:idComunidad>/lote/', MiembrosLoteController.as_view()),
     # GET (específico), DELETE (borrar)
-    path('miembros/<int:idComunidad>/<int:idMiembro>/', MiembroController.as_view()),
+    path('miembros/<int:idComunidad>/<int:idMiembro>/', Miembros.as_view()),
     
     # --- Me Gusta en Publicaciones ---
+    # GET (a cuáles de varias publicaciones ha dado me gusta un usuario, y sus contadores) - ?idUsuario=&ids=1,2,3
+    path('publicaciones/megusta/estado/', PublicacionMeGustaEstadoController.as_view()),
     # POST, GET y DELETE (específicos) 
     path('publicaciones/megusta/<int:idPublicacion>/', PublicacionMeGustaController.as_view()),
     
@@ -0,0 +1,293 @@
+import asyncio
+import random
+import threading
+import time
+import weakref
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FuturesTimeoutError, wait
+from typing import Awaitable, Callable, Iterable, List, Tuple, Union
+from django.conf import settings
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from comunidades.exceptions import ExternalServiceError
+
+# Cliente compartido para las llamadas al microservicio de usuarios
+
+# Respuestas que se reintentan (igual en el cliente síncrono y en el asíncrono)
+ESTADOS_REINTENTAR = (502, 503, 504)
+
+def _crear_sesion() -> requests.Session:
+    """
+    Crea una sesión HTTP que reutiliza las conexiones (keep-alive) con el servicio de usuarios.
+    El pool tiene tantas conexiones como llamadas simultáneas permitidas.
+    Los errores de conexión y las respuestas 502/503/504 se reintentan (solo GET) con espera
+    exponencial y aleatoria (jitter), para que los reintentos de muchas peticiones no coincidan.
+    """
+    reintentos = Retry(
+        total=settings.USER_SERVICE_RETRIES,
+        backoff_factor=settings.USER_SERVICE_BACKOFF,
+        backoff_jitter=settings.USER_SERVICE_BACKOFF,
+        status_forcelist=ESTADOS_REINTENTAR,
+        allowed_methods=frozenset({'GET'}),
+        raise_on_status=False, # Agotados los reintentos se devuelve la última respuesta
+    )
+    sesion = requests.Session()
+    adaptador = HTTPAdapter(pool_connections=1, pool_maxsize=settings.USER_SERVICE_MAX_WORKERS, max_retries=reintentos)
+    sesion.mount('http://', adaptador)
+    sesion.mount('https://', adaptador)
+    return sesion
+
+# Sesión única del proceso (el pool de conexiones de urllib3 se puede usar desde varios hilos)
+sesion = _crear_sesion()
+
+
+def _crear_cliente_async() -> httpx.AsyncClient:
+    """
+    Crea el cliente HTTP asíncrono para las vistas async, con los mismos tiempos máximos que la sesión síncrona.
+    Como en la sesión, se mantienen abiertas (keep-alive) hasta USER_SERVICE_MAX_WORKERS conexiones.
+    """
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(settings.USER_SERVICE_READ_TIMEOUT, connect=settings.USER_SERVICE_CONNECT_TIMEOUT),
+        limits=httpx.Limits(max_connections=None, max_keepalive_connections=settings.USER_SERVICE_MAX_WORKERS),
+    )
+
+# Un cliente asíncrono por bucle de eventos (sus conexiones no se pueden usar desde otro bucle):
+# con ASGI hay un único bucle, así que es un cliente compartido por todo el proceso
+_clientes_async = weakref.WeakKeyDictionary()
+
+
+def cliente_async() -> httpx.AsyncClient:
+    """
+    Devuelve el cliente asíncrono del bucle de eventos en curso, creándolo la primera vez.
+    """
+    bucle = asyncio.get_running_loop()
+    cliente = _clientes_async.get(bucle)
+    if cliente is None:
+        cliente = _clientes_async[bucle] = _crear_cliente_async()
+    return cliente
+
+
+class CircuitBreaker:
+    """
+    Cortocircuito para el servicio de usuarios.
+    - Cerrado: las llamadas pasan y se guarda el resultado de las últimas 'ventana'.
+    - Abierto: si al menos 'minimo' de esas llamadas fallaron en una proporción >= 'umbral',
+      las llamadas fallan al instante durante 'espera' segundos sin llegar al servicio.
+    - Semiabierto: pasada la espera se deja pasar una llamada de prueba; si va bien se cierra, si no se vuelve a abrir.
+    """
+
+    CERRADO, ABIERTO, SEMIABIERTO = 'cerrado', 'abierto', 'semiabierto'
+
+    def __init__(self, umbral: float, minimo: int, ventana: int, espera: float):
+        self.umbral = umbral
+        self.minimo = minimo
+        self.espera = espera
+        self._resultados = deque(maxlen=ventana) # True = fallo
+        self._estado = self.CERRADO
+        self._abierto_desde = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def estado(self) -> str:
+        with self._lock:
+            return self._estado
+
+    def permitir(self):
+        """
+        Comprueba si se puede llamar al servicio. Si el circuito está abierto, LANZA ExternalServiceError.
+        """
+        with self._lock:
+            if self._estado == self.CERRADO:
+                return
+            if self._estado == self.ABIERTO and time.monotonic() - self._abierto_desde >= self.espera:
+                # Dejamos pasar una única llamada de prueba
+                self._estado = self.SEMIABIERTO
+                return
+            raise ExternalServiceError("El servicio de usuarios no está disponible (demasiados errores recientes).")
+
+    def registrar(self, fallo: bool):
+        """
+        Anota el resultado de una llamada y abre o cierra el circuito según corresponda.
+        """
+        with self._lock:
+            if self._estado == self.SEMIABIERTO:
+                if fallo:
+                    self._abrir()
+                else:
+                    self._estado = self.CERRADO
+                    self._resultados.clear()
+                return
+            self._resultados.append(fallo)
+            fallos = sum(self._resultados)
+            if len(self._resultados) >= self.minimo and fallos / len(self._resultados) >= self.umbral:
+                self._abrir()
+
+    def _abrir(self):
+        self._estado = self.ABIERTO
+        self._abierto_desde = time.monotonic()
+        self._resultados.clear()
+
+    def reiniciar(self):
+        with self._lock:
+            self._estado = self.CERRADO
+            self._resultados.clear()
+
+
+circuito = CircuitBreaker(
+    umbral=settings.USER_SERVICE_CB_UMBRAL,
+    minimo=settings.USER_SERVICE_CB_MINIMO,
+    ventana=settings.USER_SERVICE_CB_VENTANA,
+    espera=settings.USER_SERVICE_CB_ESPERA,
+)
+
+
+def get(url: str, timeout: Union[float, Tuple[float, float]] = None) -> requests.Response:
+    """
+    Petición GET al servicio de usuarios reutilizando las conexiones abiertas.
+    Por defecto usa tiempos máximos distintos para conectar y para leer la respuesta
+    (USER_SERVICE_CONNECT_TIMEOUT, USER_SERVICE_READ_TIMEOUT).
+    Los errores de conexión y las respuestas 5xx cuentan como fallos para el cortocircuito;
+    si está abierto, LANZA ExternalServiceError sin hacer la llamada.
+    """
+    if timeout is None:
+        timeout = (settings.USER_SERVICE_CONNECT_TIMEOUT, settings.USER_SERVICE_READ_TIMEOUT)
+    circuito.permitir()
+    try:
+        respuesta = sesion.get(url, timeout=timeout)
+    except requests.RequestException:
+        circuito.registrar(fallo=True)
+        raise
+    circuito.registrar(fallo=respuesta.status_code >= 500)
+    return respuesta
+
+
+async def aget(url: str) -> httpx.Response:
+    """
+    Versión asíncrona de get() (para las vistas async), con el cliente compartido del bucle de eventos.
+    Mismos reintentos, tiempos máximos y cortocircuito que get(): los errores de conexión
+    (httpx.TransportError, que se propaga agotados los reintentos) y las respuestas 5xx cuentan como fallos.
+    """
+    circuito.permitir()
+    try:
+        respuesta = await _aget_con_reintentos(url)
+    except httpx.TransportError:
+        circuito.registrar(fallo=True)
+        raise
+    circuito.registrar(fallo=respuesta.status_code >= 500)
+    return respuesta
+
+
+async def _aget_con_reintentos(url: str) -> httpx.Response:
+    """
+    Reintenta los errores de conexión y las respuestas 502/503/504 como el Retry de la sesión síncrona:
+    hasta USER_SERVICE_RETRIES veces, el primero al momento y los siguientes tras una espera exponencial
+    con jitter (USER_SERVICE_BACKOFF). Agotados los reintentos se devuelve la última respuesta.
+    """
+    cliente = cliente_async()
+    reintentos = settings.USER_SERVICE_RETRIES
+    for intento in range(reintentos + 1):
+        if intento > 1:
+            espera = settings.USER_SERVICE_BACKOFF
+            await asyncio.sleep(espera * 2 ** (intento - 1) + random.uniform(0, espera))
+        try:
+            respuesta = await cliente.get(url)
+        except httpx.TransportError:
+            if intento == reintentos:
+                raise
+            continue
+        if respuesta.status_code not in ESTADOS_REINTENTAR or intento == reintentos:
+            return respuesta
+        await respuesta.aclose()
+
+
+def map_concurrente(funcion: Callable, elementos: Iterable, max_workers: int = None, deadline: float = None,
+                    alternativa: Callable = None) -> List:
+    """
+    Aplica 'funcion' a cada elemento en paralelo y devuelve los resultados EN EL MISMO ORDEN.
+    - 'max_workers' limita el número de llamadas simultáneas (USER_SERVICE_MAX_WORKERS por defecto).
+    - 'deadline' es el tiempo máximo (en segundos) para el conjunto de llamadas (USER_SERVICE_DEADLINE por defecto).
+    Si alguna llamada falla se propaga su excepción; si se supera el tiempo máximo, LANZA ExternalServiceError.
+    Si se indica 'alternativa' (modo degradado), los elementos cuya llamada falle con ExternalServiceError
+    o no haya terminado en el tiempo máximo se resuelven con alternativa(elemento) en vez de fallar.
+    """
+    elementos = list(elementos)
+    if not elementos:
+        return []
+    if len(elementos) == 1:
+        return [_aplicar(funcion, elementos[0], alternativa)]
+
+    max_workers = max_workers or settings.USER_SERVICE_MAX_WORKERS
+    deadline = settings.USER_SERVICE_DEADLINE if deadline is None else deadline
+
+    executor = ThreadPoolExecutor(max_workers=min(max_workers, len(elementos)))
+    try:
+        if alternativa is None:
+            # El timeout de map() cuenta desde la llamada, así que limita el tiempo total y no el de cada elemento
+            return list(executor.map(funcion, elementos, timeout=deadline))
+        futuros = [executor.submit(funcion, elemento) for elemento in elementos]
+        wait(futuros, timeout=deadline)
+        return [_resultado(futuro, elemento, alternativa) for futuro, elemento in zip(futuros, elementos)]
+    except FuturesTimeoutError:
+        raise ExternalServiceError(f"El servicio de usuarios no respondió en {deadline} segundos.")
+    finally:
+        # No esperamos a las llamadas que sigan en curso: la respuesta no debe depender de la más lenta tras el plazo
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+async def amap_concurrente(funcion: Callable[..., Awaitable], elementos: Iterable, max_workers: int = None,
+                           deadline: float = None, alternativa: Callable = None) -> List:
+    """
+    Versión asíncrona de map_concurrente() para las vistas async: 'funcion' es una corrutina (async def)
+    que llama al servicio con aget(). Las llamadas se lanzan a la vez en el bucle de eventos, sin hilos,
+    limitadas por un semáforo de USER_SERVICE_MAX_WORKERS, y se esperan juntas (gather) hasta el tiempo máximo.
+    Mismo comportamiento ante errores, tiempo máximo y 'alternativa' que map_concurrente().
+    """
+    elementos = list(elementos)
+    if not elementos:
+        return []
+
+    semaforo = asyncio.Semaphore(max_workers or settings.USER_SERVICE_MAX_WORKERS)
+    deadline = settings.USER_SERVICE_DEADLINE if deadline is None else deadline
+
+    async def llamar(elemento):
+        async with semaforo:
+            return await funcion(elemento)
+
+    tareas = [asyncio.ensure_future(llamar(e)) for e in elementos]
+    try:
+        # Sin alternativa, gather termina con el primer error; con ella se esperan todas (o hasta el tiempo máximo)
+        await asyncio.wait_for(asyncio.gather(*tareas, return_exceptions=alternativa is not None), deadline)
+    except asyncio.TimeoutError:
+        if alternativa is None:
+            raise ExternalServiceError(f"El servicio de usuarios no respondió en {deadline} segundos.")
+    finally:
+        # No esperamos a las llamadas que sigan en curso (wait_for ya cancela las pendientes al vencer el plazo)
+        for tarea in tareas:
+            tarea.cancel()
+
+    if alternativa is None:
+        return [tarea.result() for tarea in tareas]
+    return [_resultado(tarea, elemento, alternativa) for tarea, elemento in zip(tareas, elementos)]
+
+
+def _aplicar(funcion: Callable, elemento, alternativa: Callable = None):
+    try:
+        return funcion(elemento)
+    except ExternalServiceError:
+        if alternativa is None:
+            raise
+        return alternativa(elemento)
+
+
+def _resultado(futuro: Union[Future, asyncio.Future], elemento, alternativa: Callable):
+    """
+    Resultado de una llamada terminada, o el de la alternativa si no terminó a tiempo o falló el servicio.
+    """
+    if not futuro.done() or futuro.cancelled():
+        return alternativa(elemento)
+    try:
+        return futuro.result()
+    except ExternalServiceError:
+        return alternativa(elemento)
@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mymicroservice.settings')
+# Con ASGI se usan los controladores asíncronos (se puede desactivar con CONTROLADORES_ASYNC=False)
+os.environ.setdefault('CONTROLADORES_ASYNC', 'True')
 
 application = get_asgi_application()
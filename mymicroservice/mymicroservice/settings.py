@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
 import os
+import tempfile
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -77,14 +78,104 @@ WSGI_APPLICATION = 'mymicroservice.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# DB_ENGINE: 'sqlite' (por defecto, fichero db.sqlite3) o 'postgres' (necesita el paquete psycopg;
+# psycopg[pool] si se activa DB_POOL).
+
+DB_ENGINE = os.getenv('DB_ENGINE', 'sqlite')
+
+if DB_ENGINE == 'postgres':
+    # Con el pool nativo de Django las conexiones se reutilizan desde el pool, por lo que
+    # no pueden ser además persistentes (CONN_MAX_AGE debe ser 0)
+    DB_POOL = os.getenv('DB_POOL', 'False') == 'True'
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.getenv('DB_NAME', 'comunidades'),
+            'USER': os.getenv('DB_USER', 'postgres'),
+            'PASSWORD': os.getenv('DB_PASSWORD', ''),
+            'HOST': os.getenv('DB_HOST', '127.0.0.1'),
+            'PORT': os.getenv('DB_PORT', '5432'),
+            'CONN_MAX_AGE': 0 if DB_POOL else int(os.getenv('DB_CONN_MAX_AGE', '60')),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'pool': {
+                    'min_size': int(os.getenv('DB_POOL_MIN_SIZE', '2')),
+                    'max_size': int(os.getenv('DB_POOL_MAX_SIZE', '10')),
+                    'timeout': int(os.getenv('DB_POOL_TIMEOUT', '10')),
+                } if DB_POOL else False,
+            },
+        }
     }
+else:
+    # SQLite en modo WAL: las lecturas no bloquean a las escrituras y cada commit no fuerza un fsync completo.
+    # Solo las transacciones de escritura de los DAO (comunidades.basedatos.escritura) empiezan con IMMEDIATE
+    # para esperar al bloqueo de escritura (busy_timeout); las de solo lectura no lo toman.
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.getenv('DB_NAME', BASE_DIR / 'db.sqlite3'),
+            'OPTIONS': {
+                'init_command': (
+                    'PRAGMA journal_mode=WAL;'
+                    'PRAGMA synchronous=NORMAL;'
+                    f"PRAGMA busy_timeout={int(os.getenv('SQLITE_BUSY_TIMEOUT', '5000'))};"
+                    f"PRAGMA mmap_size={int(os.getenv('SQLITE_MMAP_SIZE', '134217728'))};"
+                ),
+            },
+            # Los tests usan también un fichero (y no la base de datos en memoria compartida, que no espera
+            # al bloqueo con busy_timeout) para probar escrituras concurrentes como en producción (ignorado en .gitignore)
+            'TEST': {
+                'NAME': BASE_DIR / 'test_db.sqlite3',
+            },
+        }
+    }
+
+
+# Django REST Framework
+# Los controladores devuelven los DTO directamente: el renderizador JSON los convierte sin dataclasses.asdict()
+# (y con orjson si está instalado)
+
+REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': [
+        'comunidades.renderizado.RenderizadorJSON',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# CACHE_BACKEND: 'locmem' (memoria del proceso, por defecto), 'file' (ficheros, compartida entre procesos)
+# o 'redis' (servidor Redis, necesita el paquete redis). CACHE_LOCATION indica el directorio o la URL.
+
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'locmem')
+
+if CACHE_BACKEND == 'redis':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('CACHE_LOCATION', 'redis://127.0.0.1:6379/1'),
+        }
+    }
+elif CACHE_BACKEND == 'file':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.getenv('CACHE_LOCATION', os.path.join(tempfile.gettempdir(), 'comunidades_cache')),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'comunidades',
+        }
+    }
+
+# Segundos que se guardan las respuestas del catálogo de comunidades
+RESPUESTAS_CACHE_TTL = int(os.getenv('RESPUESTAS_CACHE_TTL', '30'))
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -132,5 +223,74 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Si existe la variable de entorno la usa, si no, usa la de por defecto (localhost)
 USER_MICROSERVICE_URL = os.getenv('USER_MICROSERVICE_URL', 'http://127.0.0.1:3000/api/usuarios/')
 
+# Número máximo de llamadas simultáneas al microservicio de usuarios en una misma petición
+USER_SERVICE_MAX_WORKERS = int(os.getenv('USER_SERVICE_MAX_WORKERS', '16'))
+
+# Tiempo máximo (segundos) para el conjunto de llamadas al servicio de usuarios de una misma petición
+USER_SERVICE_DEADLINE = float(os.getenv('USER_SERVICE_DEADLINE', '10'))
+
+# Tiempos máximos (segundos) de cada llamada: para conectar y para leer la respuesta
+USER_SERVICE_CONNECT_TIMEOUT = float(os.getenv('USER_SERVICE_CONNECT_TIMEOUT', '1'))
+USER_SERVICE_READ_TIMEOUT = float(os.getenv('USER_SERVICE_READ_TIMEOUT', '4'))
+
+# Reintentos ante errores de conexión o respuestas 502/503/504, y espera base (segundos) entre ellos
+USER_SERVICE_RETRIES = int(os.getenv('USER_SERVICE_RETRIES', '2'))
+USER_SERVICE_BACKOFF = float(os.getenv('USER_SERVICE_BACKOFF', '0.1'))
+
+# Cortocircuito: se abre si de las últimas VENTANA llamadas (al menos MINIMO) falla la proporción UMBRAL,
+# y durante ESPERA segundos las llamadas fallan al instante
+USER_SERVICE_CB_UMBRAL = float(os.getenv('USER_SERVICE_CB_UMBRAL', '0.5'))
+USER_SERVICE_CB_MINIMO = int(os.getenv('USER_SERVICE_CB_MINIMO', '10'))
+USER_SERVICE_CB_VENTANA = int(os.getenv('USER_SERVICE_CB_VENTANA', '50'))
+USER_SERVICE_CB_ESPERA = float(os.getenv('USER_SERVICE_CB_ESPERA', '30'))
+
+# Modo degradado: si el servicio de usuarios falla o no responde en USER_SERVICE_DEADLINE, los listados
+# (catálogo de comunidades y miembros) se devuelven igualmente con los artistas/usuarios afectados
+# marcados como parciales ("partial": true), con su último valor conocido o solo con su id
+USER_SERVICE_DEGRADAR = os.getenv('USER_SERVICE_DEGRADAR', 'True') == 'True'
+# Número máximo de usuarios cuyo último valor conocido se guarda para el modo degradado
+USUARIOS_RESPALDO_MAXSIZE = int(os.getenv('USUARIOS_RESPALDO_MAXSIZE', '10000'))
+
+# Controladores asíncronos para las rutas que esperan al servicio de usuarios (catálogo, mis-comunidades y miembros).
+# Se activan por defecto al arrancar con ASGI (mymicroservice/asgi.py), por ejemplo con uvicorn
+CONTROLADORES_ASYNC = os.getenv('CONTROLADORES_ASYNC', 'False') == 'True'
+
+# Caché de artistas: número máximo de artistas guardados y segundos que se consideran válidos
+ARTISTAS_CACHE_MAXSIZE = int(os.getenv('ARTISTAS_CACHE_MAXSIZE', '5000'))
+ARTISTAS_CACHE_TTL = int(os.getenv('ARTISTAS_CACHE_TTL', '300'))
+
+# --- MODERACIÓN ---
+# Número máximo de comunidades con su buscador de palabras vetadas compilado en memoria, y segundos de validez
+MODERACION_CACHE_MAXSIZE = int(os.getenv('MODERACION_CACHE_MAXSIZE', '1000'))
+MODERACION_CACHE_TTL = int(os.getenv('MODERACION_CACHE_TTL', '3600'))
+
+# --- OPERACIONES POR LOTES ---
+# Número de ids de usuario que se procesan en cada transacción al añadir/eliminar miembros por lotes
+MIEMBROS_LOTE_TAMANO = int(os.getenv('MIEMBROS_LOTE_TAMANO', '1000'))
+
+# --- BUFFER DE ME GUSTA (escritura diferida) ---
+# Si está activo, dar y quitar me gusta se anota en memoria y se escribe en la base de datos por lotes
+# (al llegar a MEGUSTA_BUFFER_TAMANO operaciones o cada MEGUSTA_BUFFER_INTERVALO segundos; 0 = solo por tamaño)
+MEGUSTA_BUFFER = os.getenv('MEGUSTA_BUFFER', 'False') == 'True'
+MEGUSTA_BUFFER_TAMANO = int(os.getenv('MEGUSTA_BUFFER_TAMANO', '500'))
+MEGUSTA_BUFFER_INTERVALO = float(os.getenv('MEGUSTA_BUFFER_INTERVALO', '0.5'))
+
+# --- CACHÉ DE ADMISIÓN (miembros y vetados de cada comunidad en memoria) ---
+# Si está activa, unirse a una comunidad y dar me gusta se comprueban contra los miembros y vetados en memoria.
+# Los datos de cada comunidad se revalidan cada ADMISION_CACHE_TTL segundos con una versión en CACHES (compartida
+# entre procesos con CACHE_BACKEND file o redis; con locmem se recargan): es lo que puede tardar en verse un cambio
+# hecho por otro proceso (los vetos se confirman siempre en la base de datos antes de añadir un miembro).
+# ADMISION_CACHE_MAX_IDS limita el total de ids guardados (8 bytes cada uno) entre todas las comunidades
+ADMISION_CACHE = os.getenv('ADMISION_CACHE', 'False') == 'True'
+ADMISION_CACHE_MAX_IDS = int(os.getenv('ADMISION_CACHE_MAX_IDS', '1000000'))
+ADMISION_CACHE_TTL = float(os.getenv('ADMISION_CACHE_TTL', '60'))
+
+# --- PAGINACIÓN DE LISTADOS ---
+# Número de elementos por página si el cliente no envía 'limit', y máximo permitido
+PAGINACION_LIMITE_DEFECTO = int(os.getenv('PAGINACION_LIMITE_DEFECTO', '50'))
+PAGINACION_LIMITE_MAXIMO = int(os.getenv('PAGINACION_LIMITE_MAXIMO', '200'))
+
 ## Configuración CORS - Permite conexiones desde cualquier origen (para conectar con el frontend)
-CORS_ALLOW_ALL_ORIGINS = True
\ No newline at end of file
+CORS_ALLOW_ALL_ORIGINS = True
+# Cabeceras que el frontend puede leer (enlace a la siguiente página y ETag de los listados)
+CORS_EXPOSE_HEADERS = ['Link', 'X-Next-Cursor', 'ETag']
\ No newline at end of file